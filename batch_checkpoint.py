@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Checkpoints for long batch runs. Each finished chunk of output is committed
+as a part file (written to a temp name, fsynced, then renamed) before the
+checkpoint records the input byte offset it covers, so after a crash or an
+error --resume continues from the last committed chunk instead of starting
+over. The part files are merged into the output once the input is done.
+"""
+
+import json
+import os
+
+CHECKPOINT_VERSION = 1
+
+def default_checkpoint_path(output_file):
+    """Checkpoint file stored next to its output file"""
+    root, _ = os.path.splitext(output_file)
+    return f"{root}.checkpoint.json"
+
+def fsync_file(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def write_json_atomic(path, data):
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+def input_fingerprint(input_file, settings):
+    """What a checkpoint must match to be resumed: the input file and the run settings"""
+    stat = os.stat(input_file)
+    fingerprint = {
+        'input_file': os.path.abspath(input_file),
+        'input_size': stat.st_size,
+        'input_mtime_ns': stat.st_mtime_ns,
+        'settings': settings,
+    }
+    # Round-trip so tuples compare equal to the lists read back from JSON
+    return json.loads(json.dumps(fingerprint))
+
+class BatchCheckpoint:
+    """Committed progress of one batch run: part files plus the next input offset"""
+
+    def __init__(self, output_file, checkpoint_file=None):
+        self.output_file = output_file
+        self.checkpoint_file = checkpoint_file or default_checkpoint_path(output_file)
+        root, _ = os.path.splitext(self.checkpoint_file)
+        self.parts_dir = f"{root}.parts"
+        self.errors_file = os.path.join(self.parts_dir, 'errors.txt')
+        self.state = None
+
+    def exists(self):
+        return os.path.exists(self.checkpoint_file)
+
+    def start(self, fingerprint):
+        """Begin a fresh run, discarding any earlier checkpoint for this output"""
+        self.discard()
+        os.makedirs(self.parts_dir)
+        self.state = {
+            'version': CHECKPOINT_VERSION,
+            'fingerprint': fingerprint,
+            'next_offset': None,
+            'row_offset': 0,
+            'part_count': 0,
+            'processed_count': 0,
+            'total_count': 0,
+            'error_count': 0,
+        }
+        write_json_atomic(self.checkpoint_file, self.state)
+
+    def resume(self, fingerprint):
+        """Load the checkpoint and return its committed errors
+
+        Raises ValueError if the checkpoint is unreadable or was written
+        for a different input file or different settings.
+        """
+        try:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Cannot read checkpoint {self.checkpoint_file}: {e}")
+        if state.get('version') != CHECKPOINT_VERSION or not os.path.isdir(self.parts_dir):
+            raise ValueError(f"Incomplete or unsupported checkpoint: {self.checkpoint_file}")
+        if state['fingerprint'] != fingerprint:
+            raise ValueError("The input file or settings changed since the checkpoint was written; "
+                             "run again without --resume to start over")
+
+        # Parts and errors written after the last commit are discarded
+        for name in os.listdir(self.parts_dir):
+            if name.endswith('.tmp'):
+                os.remove(os.path.join(self.parts_dir, name))
+        errors = []
+        if os.path.exists(self.errors_file):
+            with open(self.errors_file, 'r', encoding='utf-8') as f:
+                errors = f.read().splitlines()[:state['error_count']]
+            with open(self.errors_file, 'w', encoding='utf-8') as f:
+                f.writelines(f"{error}\n" for error in errors)
+
+        self.state = state
+        return errors
+
+    def part_path(self, index):
+        return os.path.join(self.parts_dir, f"part_{index:06d}")
+
+    def pending_part_path(self, index):
+        """Where a worker writes a part before it is committed"""
+        return self.part_path(index) + '.tmp'
+
+    def part_files(self):
+        return [self.part_path(index) for index in range(self.state['part_count'])]
+
+    def commit(self, pending_part, has_rows, next_offset, row_offset, processed_count, total_count, errors):
+        """Make one finished chunk durable, then advance the checkpoint past it"""
+        state = self.state
+        if has_rows:
+            fsync_file(pending_part)
+            os.replace(pending_part, self.part_path(state['part_count']))
+            state['part_count'] += 1
+        elif os.path.exists(pending_part):
+            os.remove(pending_part)
+
+        if errors:
+            with open(self.errors_file, 'a', encoding='utf-8') as f:
+                f.writelines(f"{error}\n" for error in errors)
+                f.flush()
+                os.fsync(f.fileno())
+
+        state.update(next_offset=next_offset, row_offset=row_offset, processed_count=processed_count,
+                     total_count=total_count, error_count=state['error_count'] + len(errors))
+        write_json_atomic(self.checkpoint_file, state)
+
+    def discard(self):
+        """Remove the checkpoint and its part files"""
+        if os.path.isdir(self.parts_dir):
+            for name in os.listdir(self.parts_dir):
+                os.remove(os.path.join(self.parts_dir, name))
+            os.rmdir(self.parts_dir)
+        if os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
+        self.state = None
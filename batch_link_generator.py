@@ -6,18 +6,69 @@ Handles large datasets (200+ codes) with progress tracking and validation.
 
 import csv
 import os
-import sys
 import re
+import sqlite3
+import string
+import tempfile
+import time
 from pathlib import Path
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import chain, islice
+
+import csv_ingest
+from batch_checkpoint import BatchCheckpoint, input_fingerprint
+from batch_metrics import DEFAULT_INTERVAL, PROGRESS_MODES, BatchMetrics, PlainProgressSink, progress_sinks
+from bloom_filter import DEFAULT_BLOOM_FILE, RegistryFilter
+from check_digit import has_valid_check_char, verify_many
+from link_catalog import DEFAULT_CATALOG_FILE, LinkCatalog
+from link_manifest import LinkManifest
+from link_partitions import COMPRESSIONS, PartitionSpec, check_replaceable, open_output
+from link_writers import OUTPUT_FORMATS, open_writer
+from serial_registry import DEFAULT_INDEX_FILE
+from url_templates import DEFAULT_URL_TEMPLATE, compile_template, parse_named_template
+
+# Upper bound on bytes handed to a single worker in --workers mode
+CHUNK_SIZE_LIMIT = 8 * 1024 * 1024
+
+# Number of codes validated together by DynamicLinkGenerator.validate_serial_codes
+VALIDATION_BATCH_SIZE = 4096
+
+SERIAL_CODE_CHARS = string.ascii_letters + string.digits + '-_'
+SERIAL_CODE_PATTERN = re.compile(r'^[A-Za-z0-9\-_]+$')
+SERIAL_CODE_DELETE_TABLE = str.maketrans('', '', SERIAL_CODE_CHARS)
+SERIAL_CODE_INVALID_CHAR = re.compile(r'[^A-Za-z0-9\-_\n]')
 
 class DynamicLinkGenerator:
-    def __init__(self, input_file, output_file=None, url_template=None):
+    def __init__(self, input_file, output_file=None, url_template=None, manifest=None, registry=None,
+                 extra_templates=None, output_format='csv', require_check_char=False, metrics=None,
+                 partition_spec=None):
         self.input_file = input_file
         self.output_file = output_file or "dynamic_links_output.csv"
-        self.url_template = url_template or "https://{serial_code}/e3world.co.uk"
+        self.url_template = url_template or DEFAULT_URL_TEMPLATE
+        self.extra_templates = list(extra_templates or [])
+        self.output_format = output_format
+        # A PartitionSpec makes output_file a directory of compressed shards
+        self.partition_spec = partition_spec
+        self.columns = ['SerialCode', 'DynamicLink'] + [name for name, _ in self.extra_templates]
+        self.manifest = manifest
+        self.registry = registry
+        self.require_check_char = require_check_char
+        self.metrics = metrics if metrics is not None else BatchMetrics([PlainProgressSink()])
+        
+        # Templates are compiled once per run and are the only rendering path.
+        # A malformed template makes every row fail with template_error.
+        self.template_error = None
+        try:
+            self.compiled_templates = [compile_template(self.url_template)] + [
+                compile_template(template, name) for name, template in self.extra_templates]
+        except ValueError as e:
+            self.compiled_templates = None
+            self.template_error = f"Error generating link: {e}"
         self.processed_count = 0
+        self.total_count = 0
+        self.skipped_count = 0
         self.errors = []
         
     def validate_serial_code(self, serial_code):
@@ -29,125 +80,445 @@ class DynamicLinkGenerator:
         serial_code = serial_code.strip()
         
         # Check for valid characters (alphanumeric + some special chars)
-        if not re.match(r'^[A-Za-z0-9\-_]+$', serial_code):
+        if not SERIAL_CODE_PATTERN.match(serial_code):
             return False, f"Invalid characters in serial code: {serial_code}"
+        
+        if self.require_check_char and not has_valid_check_char(serial_code):
+            return False, f"Invalid check character in serial code: {serial_code}"
             
         return True, serial_code
     
+    def validate_serial_codes(self, serial_codes):
+        """Validate a chunk of serial codes in one pass
+        
+        Returns a list of (index, reason) for the rejected codes only. The
+        chunk is joined into one buffer: a single str.translate clears the
+        common all-valid case, otherwise one precompiled regex scan locates
+        the offending codes and only those go through validate_serial_code.
+        With require_check_char the remaining codes are then verified in
+        one check_digit.verify_many call.
+        """
+        if not serial_codes:
+            return []
+        
+        joined = '\n'.join(serial_codes)
+        if joined.count('\n') != len(serial_codes) - 1 or not all(serial_codes):
+            # Embedded newlines or empty codes: the buffer can't be split back
+            candidates = range(len(serial_codes))
+        elif joined.translate(SERIAL_CODE_DELETE_TABLE) == '\n' * (len(serial_codes) - 1):
+            candidates = []
+        else:
+            candidates = []
+            index = 0
+            line_start = 0
+            match = SERIAL_CODE_INVALID_CHAR.search(joined)
+            while match:
+                index += joined.count('\n', line_start, match.start())
+                candidates.append(index)
+                line_start = joined.find('\n', match.start())
+                if line_start == -1:
+                    break
+                match = SERIAL_CODE_INVALID_CHAR.search(joined, line_start)
+        
+        rejected = []
+        for index in candidates:
+            is_valid, result = self.validate_serial_code(serial_codes[index])
+            if not is_valid:
+                rejected.append((index, result))
+        
+        if self.require_check_char:
+            rejected.extend(self.check_check_chars(serial_codes, rejected))
+            rejected.sort()
+        return rejected
+    
+    def check_check_chars(self, serial_codes, rejected):
+        """Return (index, reason) for otherwise valid codes with a wrong check character"""
+        rejected_indexes = {index for index, _ in rejected}
+        candidates = [i for i in range(len(serial_codes)) if i not in rejected_indexes]
+        valid = verify_many([serial_codes[i].strip() for i in candidates])
+        return [(i, f"Invalid check character in serial code: {serial_codes[i].strip()}")
+                for i, is_valid in zip(candidates, valid) if not is_valid]
+    
+    def check_registry(self, serial_codes, rejected):
+        """Return (index, reason) for valid codes that are not in the registry"""
+        candidates = [i for i in range(len(serial_codes)) if i not in rejected]
+        registered = self.registry.contains_many([serial_codes[i] for i in candidates])
+        return [(i, f"Serial code not in registry: {serial_codes[i]}")
+                for i, is_registered in zip(candidates, registered) if not is_registered]
+    
     def generate_dynamic_link(self, serial_code):
         """Generate dynamic link from serial code"""
+        row, error = self.generate_row(serial_code)
+        if error:
+            return None, error
+        return row[1], None
+    
+    def generate_row(self, serial_code):
+        """Generate the output row (serial code, link, extra template columns)"""
+        is_valid, result = self.validate_serial_code(serial_code)
+        if not is_valid:
+            return None, result
+        if self.compiled_templates is None:
+            return None, self.template_error
+        
+        return (result, *[template.render(result) for template in self.compiled_templates]), None
+    
+    def extract_serial_codes(self, values, first_row_num):
+        """Yield (serial_code, row_number) for every non-empty first-column value"""
+        for i, serial_code in enumerate(values, first_row_num):
+            if serial_code:
+                yield serial_code, i
+    
+    def read_input_file(self):
+        """Stream (serial_code, row_number) pairs from the input CSV file"""
+        yield from csv_ingest.read_serial_codes(
+            self.input_file, on_header=lambda header: print(f"Detected header: {header}"))
+    
+    def plan_chunks(self, workers, start=None, chunk_size=None):
+        """Split the input into line-aligned byte ranges for parallel workers
+        
+        Returns (input_format, has_header, chunks) where chunks is a list of
+        (start, end) byte offsets. Assumes one CSV record per line. When
+        start is given (resuming from a checkpoint) planning begins at that
+        offset and no header is looked for.
+        """
+        if not os.path.exists(self.input_file):
+            raise FileNotFoundError(f"Input file not found: {self.input_file}")
+        
+        input_format = csv_ingest.detect_format(self.input_file)
+        has_header = False
+        if start is None:
+            values = csv_ingest.iter_first_column(self.input_file, input_format)
+            first = next(values, None)
+            second = next(values, None)
+            values.close()
+            
+            if first is None:
+                raise ValueError("Input file is empty")
+            
+            has_header = second is not None and csv_ingest.is_header(first)
+            if has_header:
+                print(f"Detected header: {first}")
+        
+        size = os.path.getsize(self.input_file)
+        chunks = []
+        with open(self.input_file, 'rb') as f:
+            if start is None:
+                start = len(f.readline()) if has_header else 0
+            # Several chunks per worker keeps the pool busy, capped so each
+            # chunk stays small enough to hold in memory
+            if chunk_size is None:
+                chunk_size = min(max((size - start) // (workers * 4), 1 << 16), CHUNK_SIZE_LIMIT)
+            while start < size:
+                f.seek(min(start + chunk_size, size))
+                f.readline()
+                end = min(f.tell(), size)
+                chunks.append((start, end))
+                start = end
+        
+        return input_format, has_header, chunks
+    
+    def process_batch_parallel(self, workers, checkpoint=None, resume=False, chunk_size=None):
+        """Process the input in line-aligned chunks across a process pool
+        
+        Part files are merged in input order, so the output is identical to
+        process_batch and error row numbers refer to the original file.
+        With a BatchCheckpoint every finished chunk is committed as it
+        completes, and resume=True continues from the last committed chunk.
+        With one worker the chunks are processed in this process.
+        """
+        print(f"Reading input file: {self.input_file}")
+        self.start_metrics()
+        
         try:
-            # Validate serial code
-            is_valid, result = self.validate_serial_code(serial_code)
-            if not is_valid:
-                return None, result
+            start = None
+            row_offset = 0
+            if checkpoint is not None:
+                fingerprint = input_fingerprint(self.input_file, self.checkpoint_settings())
+                if resume and checkpoint.exists():
+                    self.errors = checkpoint.resume(fingerprint)
+                    state = checkpoint.state
+                    start = state['next_offset']
+                    row_offset = state['row_offset']
+                    self.processed_count = state['processed_count']
+                    self.total_count = state['total_count']
+                    print(f"Resuming from checkpoint: {checkpoint.checkpoint_file} "
+                          f"({self.total_count} codes, {state['part_count']} chunks already committed)")
+                else:
+                    if resume:
+                        print(f"No checkpoint found at {checkpoint.checkpoint_file} - starting from the beginning")
+                    checkpoint.start(fingerprint)
             
-            clean_serial = result
+            if start is None:
+                input_format, has_header, chunks = self.plan_chunks(workers, chunk_size=chunk_size)
+                row_offset = 1 if has_header else 0
+            else:
+                input_format, _, chunks = self.plan_chunks(workers, start, chunk_size)
+            if workers > 1:
+                print(f"Split input into {len(chunks)} chunks across {workers} workers")
             
-            # Generate URL
-            dynamic_link = self.url_template.format(serial_code=clean_serial)
+            if checkpoint is not None:
+                self.process_chunks(workers, input_format, chunks, row_offset, checkpoint, None)
+                part_files = checkpoint.part_files()
+            else:
+                output_dir = os.path.dirname(os.path.abspath(self.output_file))
+                with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+                    part_files = self.process_chunks(workers, input_format, chunks, row_offset, None, tmp_dir)
+                    if not self.check_counts():
+                        return False
+                    with self.metrics.stage('merge'):
+                        self.merge_part_files(part_files)
+                print(f"Found {self.total_count} serial codes to process")
+                return True
             
-            return dynamic_link, None
+            if not self.check_counts():
+                checkpoint.discard()
+                return False
+            with self.metrics.stage('merge'):
+                if self.partition_spec is not None:
+                    # The partitioned writer swaps its directory into place itself
+                    self.merge_part_files(part_files)
+                else:
+                    # Merge into a temp file so a crash here leaves the parts intact
+                    tmp_output = f"{self.output_file}.tmp"
+                    self.merge_part_files(part_files, tmp_output)
+                    os.replace(tmp_output, self.output_file)
+            checkpoint.discard()
             
+            print(f"Found {self.total_count} serial codes to process")
+            return True
+        
         except Exception as e:
-            return None, f"Error generating link: {str(e)}"
+            print(f"Error processing batch: {e}")
+            if checkpoint is not None and checkpoint.state is not None:
+                print(f"Committed progress is kept in {checkpoint.checkpoint_file}; rerun with --resume to continue")
+            return False
+        
+        finally:
+            self.finish_metrics()
     
-    def read_input_file(self):
-        """Read and parse input CSV file"""
-        if not os.path.exists(self.input_file):
-            raise FileNotFoundError(f"Input file not found: {self.input_file}")
+    def checkpoint_settings(self):
+        """Settings a resumed run must share with the run that wrote the checkpoint"""
+        return {
+            'url_template': self.url_template,
+            'extra_templates': self.extra_templates,
+            'output_format': self.output_format,
+            'require_check_char': self.require_check_char,
+            'registry': list(self.registry.files) if self.registry is not None else None,
+        }
+    
+    def process_chunks(self, workers, input_format, chunks, row_offset, checkpoint, tmp_dir):
+        """Run the chunk tasks in input order and return the part files with rows
         
-        serial_codes = []
+        With a checkpoint each chunk is committed as soon as it finishes, and
+        its part files live in the checkpoint's parts directory instead.
+        """
+        registry_files = self.registry.files if self.registry is not None else None
+        settings = {
+            'input_file': self.input_file,
+            'url_template': self.url_template,
+            'extra_templates': self.extra_templates,
+            'output_format': self.output_format,
+            'require_check_char': self.require_check_char,
+        }
+        if checkpoint is not None:
+            first_part = checkpoint.state['part_count']
+            part_paths = [checkpoint.pending_part_path(first_part + i) for i in range(len(chunks))]
+        else:
+            part_paths = [os.path.join(tmp_dir, f"part_{i:06d}") for i in range(len(chunks))]
+        tasks = [(settings, registry_files, start, end, input_format, part_file)
+                 for (start, end), part_file in zip(chunks, part_paths)]
         
-        with open(self.input_file, 'r', newline='', encoding='utf-8') as csvfile:
-            # Auto-detect CSV format
-            sample = csvfile.read(1024)
-            csvfile.seek(0)
+        part_files = []
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            results = executor.map(_process_chunk_task, tasks) if executor is not None else map(_process_chunk_task, tasks)
+            for task, (rows, processed, total, errors, stages) in zip(tasks, results):
+                chunk_errors = []
+                for row_num, serial_code, error in errors:
+                    chunk_errors.append(f"Row {row_offset + row_num}: {error}")
+                    print(f"Error processing '{serial_code}': {error}")
+                self.errors.extend(chunk_errors)
+                
+                row_offset += rows
+                self.total_count += total
+                self.processed_count += processed
+                if checkpoint is not None:
+                    with self.metrics.stage('checkpoint'):
+                        checkpoint.commit(task[-1], processed > 0, task[3], row_offset,
+                                          self.processed_count, self.total_count, chunk_errors)
+                elif processed:
+                    part_files.append(task[-1])
+                # Stage times are summed across workers (CPU time, not wall time)
+                for stage, seconds in stages.items():
+                    self.metrics.add_stage_time(stage, seconds)
+                self.report_progress()
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        return part_files
+    
+    def check_counts(self):
+        """Report an input with nothing to write; returns False in that case"""
+        if self.total_count == 0:
+            print("No valid serial codes found in input file")
+            return False
+        if self.processed_count == 0:
+            print("No valid links generated")
+            return False
+        return True
+    
+    def merge_part_files(self, part_files, output_file=None):
+        """Concatenate worker part files, in order, under a single header
+        (or shard their rows into a partitioned output)"""
+        try:
+            with open_output(self.output_format, output_file or self.output_file, self.columns,
+                             self.partition_spec) as writer:
+                for part_file in part_files:
+                    writer.append_part(part_file)
             
-            try:
-                dialect = csv.Sniffer().sniff(sample)
-                delimiter = dialect.delimiter
-            except:
-                delimiter = ','
+            print(f"\nOutput saved to: {self.output_file}")
             
-            reader = csv.reader(csvfile, delimiter=delimiter)
-            rows = list(reader)
+        except Exception as e:
+            print(f"Error writing output file: {e}")
+            raise
+    
+    def generate_links(self, serial_codes):
+        """Yield output rows (serial_code, dynamic_link, extras...), recording errors as they occur
+        
+        Codes are validated and rendered VALIDATION_BATCH_SIZE at a time with
+        the precompiled templates, all templates in the same pass.
+        """
+        compiled_templates = self.compiled_templates
+        metrics = self.metrics
+        serial_codes = iter(serial_codes)
+        
+        while True:
+            with metrics.stage('read'):
+                batch = list(islice(serial_codes, VALIDATION_BATCH_SIZE))
+            if not batch:
+                break
             
-            if not rows:
-                raise ValueError("Input file is empty")
+            with metrics.stage('validate'):
+                # Codes are stripped once here; validation, rendering and the
+                # output column all use the stripped value
+                codes = [serial_code.strip() for serial_code, _ in batch]
+                rejected = dict(self.validate_serial_codes(codes))
+                if self.registry is not None:
+                    rejected.update(self.check_registry(codes, rejected))
+            self.total_count += len(batch)
             
-            # Handle header row
-            start_row = 0
-            if len(rows) > 1:
-                first_row = rows[0]
-                if any(term.lower() in str(first_row[0]).lower() 
-                      for term in ['serial', 'code', 'id', 'tag', 'number']):
-                    print(f"Detected header: {first_row[0]}")
-                    start_row = 1
+            # Rows are built inside the stage and yielded outside it, so the
+            # time the consumer spends writing is not charged to 'format'
+            with metrics.stage('format'):
+                if compiled_templates is None:
+                    # A template did not compile: every code that passed validation fails the same way
+                    rejected.update((index, self.template_error) for index in range(len(batch)) if index not in rejected)
+                for index in sorted(rejected):
+                    self.record_error(batch[index][1], codes[index], rejected[index])
+                if rejected:
+                    codes = [serial_code for index, serial_code in enumerate(codes) if index not in rejected]
+                
+                # Only the surviving codes are rendered, in bulk
+                columns = [template.render_many(codes) for template in compiled_templates or []]
+                rows = zip(codes, *columns)
+                self.processed_count += len(codes)
             
-            # Extract serial codes
-            for i, row in enumerate(rows[start_row:], start_row + 1):
-                if row and len(row) > 0:
-                    serial_code = str(row[0]).strip()
-                    if serial_code:
-                        serial_codes.append((serial_code, i))
-        
-        return serial_codes
+            self.report_progress()
+            yield from rows
+    
+    def record_error(self, row_num, serial_code, error):
+        """Record a failed row against its input row number"""
+        self.errors.append(f"Row {row_num}: {error}")
+        print(f"Error processing '{serial_code}': {error}")
+    
+    def report_progress(self):
+        """Push the current counts to the metrics sinks (rate-limited by time, not rows)"""
+        self.metrics.update(read=self.total_count, processed=self.processed_count,
+                            errors=len(self.errors), skipped=self.skipped_count)
+        self.metrics.maybe_emit()
+    
+    def start_metrics(self):
+        """Reset the metrics clock and estimate the row count for the ETA"""
+        metrics = self.metrics
+        metrics.started = metrics.last_emit = time.monotonic()
+        if metrics.expected_total is None:
+            try:
+                metrics.expected_total = csv_ingest.estimate_row_count(self.input_file)
+            except OSError:
+                pass
+    
+    def finish_metrics(self):
+        self.report_progress()
+        self.metrics.close()
+    
+    def skip_emitted(self, serial_codes):
+        """Drop codes the manifest already records for this URL template"""
+        for serial_code, row_num in serial_codes:
+            if self.manifest.is_emitted(serial_code, self.url_template):
+                self.skipped_count += 1
+                continue
+            yield serial_code, row_num
     
     def process_batch(self):
-        """Process all serial codes and generate links"""
+        """Process all serial codes and stream generated links to the output file"""
         print(f"Reading input file: {self.input_file}")
+        self.start_metrics()
         
         try:
             serial_codes = self.read_input_file()
-            print(f"Found {len(serial_codes)} serial codes to process")
-            
-            if len(serial_codes) == 0:
-                print("No valid serial codes found in input file")
-                return False
-            
-            results = []
+            if self.manifest is not None:
+                print(f"Loaded manifest: {self.manifest.manifest_file} ({len(self.manifest)} codes)")
+                serial_codes = self.skip_emitted(serial_codes)
             
-            # Process each serial code
-            for serial_code, row_num in serial_codes:
-                dynamic_link, error = self.generate_dynamic_link(serial_code)
-                
-                if error:
-                    self.errors.append(f"Row {row_num}: {error}")
-                    print(f"Error processing '{serial_code}': {error}")
-                    continue
-                
-                results.append((serial_code, dynamic_link))
-                self.processed_count += 1
-                
-                # Progress indicator for large batches
-                if self.processed_count % 50 == 0:
-                    print(f"Processed {self.processed_count} codes...")
+            results = self.generate_links(serial_codes)
             
-            # Write output file
-            if results:
-                self.write_output_file(results)
-                return True
-            else:
-                print("No valid links generated")
+            # Only create the output file once there is a valid link to write
+            first_result = next(results, None)
+            if first_result is None:
+                if self.skipped_count and self.total_count == 0:
+                    print(f"All {self.skipped_count} serial codes already in manifest - nothing to append")
+                    return True
+                if self.total_count == 0:
+                    print("No valid serial codes found in input file")
+                else:
+                    print("No valid links generated")
                 return False
+            
+            self.write_output_file(chain([first_result], results))
+            print(f"Found {self.total_count} serial codes to process")
+            return True
                 
         except Exception as e:
             print(f"Error processing batch: {e}")
             return False
+        
+        finally:
+            self.finish_metrics()
+    
+    def iter_result_chunks(self, results):
+        """Materialize results VALIDATION_BATCH_SIZE rows at a time, so writes can be timed apart from generation"""
+        while True:
+            rows = list(islice(results, VALIDATION_BATCH_SIZE))
+            if not rows:
+                return
+            yield rows
     
     def write_output_file(self, results):
-        """Write results to output CSV file"""
+        """Write results to output CSV file as they are produced"""
+        if self.manifest is not None:
+            count = 0
+            for rows in self.iter_result_chunks(results):
+                with self.metrics.stage('write'):
+                    count += self.manifest.append(rows, self.url_template)
+            print(f"\nAppended {count} new links to: {self.output_file}")
+            return
+        
         try:
-            with open(self.output_file, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                
-                # Write header
-                writer.writerow(['SerialCode', 'DynamicLink'])
-                
-                # Write data
-                for serial_code, dynamic_link in results:
-                    writer.writerow([serial_code, dynamic_link])
+            with open_output(self.output_format, self.output_file, self.columns, self.partition_spec) as writer:
+                for rows in self.iter_result_chunks(results):
+                    with self.metrics.stage('write'):
+                        writer.write_rows(rows)
             
             print(f"\nOutput saved to: {self.output_file}")
             
@@ -163,8 +534,16 @@ class DynamicLinkGenerator:
         print(f"Input file: {self.input_file}")
         print(f"Output file: {self.output_file}")
         print(f"Successfully processed: {self.processed_count} codes")
+        if self.manifest is not None:
+            print(f"Already in manifest: {self.skipped_count} codes")
         print(f"Errors encountered: {len(self.errors)}")
         
+        snapshot = self.metrics.snapshot()
+        if snapshot['elapsed'] > 0:
+            print(f"Elapsed: {snapshot['elapsed']:.2f}s ({snapshot['rows_per_s']:,.0f} codes/s)")
+        if snapshot['stages']:
+            print("Stage times: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in snapshot['stages'].items()))
+        
         if self.errors:
             print(f"\nErrors:")
             for error in self.errors[:10]:  # Show first 10 errors
@@ -174,19 +553,106 @@ class DynamicLinkGenerator:
         
         print(f"\nGenerated {self.processed_count} dynamic links successfully!")
 
+class _ChunkWorker(DynamicLinkGenerator):
+    """Generator used inside --workers processes: collects errors quietly"""
+    
+    def __init__(self, input_file, output_file=None, url_template=None, registry=None,
+                 extra_templates=None, output_format='csv', require_check_char=False):
+        super().__init__(input_file, output_file, url_template, registry=registry,
+                         extra_templates=extra_templates, output_format=output_format,
+                         require_check_char=require_check_char, metrics=BatchMetrics())
+        self.chunk_errors = []
+    
+    def record_error(self, row_num, serial_code, error):
+        self.chunk_errors.append((row_num, serial_code, error))
+    
+    def report_progress(self):
+        pass
+    
+    def process_chunk(self, start, end, input_format):
+        """Generate links for one byte range of the input into the part file
+        
+        Returns (rows, processed, total, errors, stages) where errors holds
+        (chunk_row, serial_code, message) tuples numbered from 1 within the
+        chunk and stages the time spent per stage.
+        """
+        with self.metrics.stage('read'):
+            with open(self.input_file, 'rb') as f:
+                f.seek(start)
+                data = f.read(end - start)
+            
+            if input_format.quoted:
+                values = list(csv_ingest.iter_text_first_column(data.decode('utf-8'), input_format.delimiter))
+            else:
+                values = list(csv_ingest.iter_buffer_first_column(data, 0, len(data), input_format.delimiter))
+        
+        results = self.generate_links(self.extract_serial_codes(values, 1))
+        with open_writer(self.output_format, self.output_file, self.columns, part=True) as writer:
+            for rows in self.iter_result_chunks(results):
+                with self.metrics.stage('write'):
+                    writer.write_rows(rows)
+        
+        return len(values), self.processed_count, self.total_count, self.chunk_errors, self.metrics.stages
+
+def _process_chunk_task(task):
+    """Process pool entry point for DynamicLinkGenerator.process_chunk"""
+    settings, registry_files, start, end, input_format, part_file = task
+    if registry_files is None:
+        return _ChunkWorker(output_file=part_file, **settings).process_chunk(start, end, input_format)
+    
+    with RegistryFilter.open(*registry_files) as registry:
+        worker = _ChunkWorker(output_file=part_file, registry=registry, **settings)
+        return worker.process_chunk(start, end, input_format)
+
 def main():
     parser = argparse.ArgumentParser(description='Generate dynamic links from NFT serial codes')
     parser.add_argument('input_file', nargs='?', help='Input CSV file with serial codes')
     parser.add_argument('-o', '--output', help='Output CSV file name')
     parser.add_argument('-t', '--template', help='URL template (default: https://{serial_code}/e3world.co.uk)')
+    parser.add_argument('-x', '--extra-template', action='append', default=[], metavar='NAME=TEMPLATE',
+                        help='Extra output column rendered in the same pass, e.g. QRPayload=E3:{serial_code} (repeatable)')
+    parser.add_argument('-c', '--require-check-char', action='store_true',
+                        help='Reject codes without a valid check character (see check_digit.py)')
+    parser.add_argument('--progress', choices=PROGRESS_MODES, default='auto',
+                        help='Progress output: bar on a terminal, plain lines otherwise (default: auto)')
+    parser.add_argument('--progress-interval', type=float, default=DEFAULT_INTERVAL,
+                        help=f'Seconds between progress updates (default: {DEFAULT_INTERVAL})')
+    parser.add_argument('--metrics-jsonl', metavar='PATH', help='Append progress snapshots to this JSON-lines log')
+    parser.add_argument('--metrics-prom', metavar='PATH',
+                        help='Keep a Prometheus textfile (e.g. for node_exporter) updated with run metrics')
+    parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS, default='csv',
+                        help='Output format (default: csv)')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='Number of worker processes (default: 1, single process)')
+    parser.add_argument('-i', '--incremental', action='store_true',
+                        help='Append only codes not yet recorded in the output manifest')
+    parser.add_argument('-m', '--manifest', help='Manifest file for --incremental (default: <output>.manifest.csv)')
+    parser.add_argument('-r', '--registry', action='store_true',
+                        help=f'Reject codes missing from {DEFAULT_INDEX_FILE} (uses {DEFAULT_BLOOM_FILE} as a fast path if present)')
+    parser.add_argument('-p', '--partitions', type=int,
+                        help='Write -o as a directory of N compressed shards, partitioned by hash of the serial code')
+    parser.add_argument('--shard-rows', type=int,
+                        help='Write -o as a directory of compressed shards of at most N rows each, in input order')
+    parser.add_argument('-z', '--compress', choices=COMPRESSIONS,
+                        help='Shard compression (default: gzip; on its own, writes one compressed shard)')
+    parser.add_argument('--compress-level', type=int, help='Compression level (default: gzip 6, zstd 3)')
+    parser.add_argument('--checkpoint', nargs='?', const='', metavar='PATH',
+                        help='Commit progress chunk by chunk so an interrupted run can be resumed '
+                             '(default path: <output>.checkpoint.json)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue an interrupted --checkpoint run for the same -o output')
+    parser.add_argument('--catalog', nargs='?', const=DEFAULT_CATALOG_FILE, metavar='PATH',
+                        help=f'Record the run and every code it issued in a SQLite catalog (default path: {DEFAULT_CATALOG_FILE})')
+    parser.add_argument('--checkpoint-every', type=float, default=CHUNK_SIZE_LIMIT / (1024 * 1024), metavar='MB',
+                        help=f'MB of input per committed chunk (default: {CHUNK_SIZE_LIMIT // (1024 * 1024)})')
     
     args = parser.parse_args()
     
     # Find input file
     input_file = args.input_file
     if not input_file:
-        # Look for CSV files in current directory
-        csv_files = list(Path('.').glob('*.csv'))
+        # Look for CSV files in current directory, skipping earlier outputs
+        csv_files = [f for f in sorted(Path('.').glob('*.csv')) if not csv_ingest.is_link_output(f)]
         if csv_files:
             input_file = str(csv_files[0])
             print(f"Using found CSV file: {input_file}")
@@ -195,20 +661,101 @@ def main():
             print("Usage: python3 batch_link_generator.py <input_file.csv>")
             return
     
+    partition_spec = None
+    if args.partitions is not None or args.shard_rows is not None or args.compress or args.compress_level is not None:
+        if args.partitions is not None and args.shard_rows is not None:
+            print("Use either --partitions or --shard-rows, not both")
+            return
+        if min(args.partitions or 1, args.shard_rows or 1) < 1:
+            print("--partitions and --shard-rows must be at least 1")
+            return
+        partitions = args.partitions if args.partitions is not None or args.shard_rows is not None else 1
+        partition_spec = PartitionSpec(partitions, args.shard_rows, args.compress or 'gzip', args.compress_level)
+    
     # Set up generator
-    output_file = args.output or f"dynamic_links_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    url_template = args.template or "https://{serial_code}/e3world.co.uk"
+    default_output = f"dynamic_links_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    output_file = args.output or (default_output if partition_spec is not None else f"{default_output}.csv")
+    url_template = args.template or DEFAULT_URL_TEMPLATE
+    if partition_spec is not None:
+        try:
+            check_replaceable(output_file)
+        except ValueError as e:
+            print(e)
+            return
     
-    generator = DynamicLinkGenerator(input_file, output_file, url_template)
+    try:
+        extra_templates = [parse_named_template(value) for value in args.extra_template]
+    except ValueError as e:
+        print(f"Invalid extra template: {e}")
+        return
+    
+    checkpoint = None
+    if args.checkpoint is not None or args.resume:
+        if args.resume and not args.output:
+            print("--resume needs the -o output of the run being resumed")
+            return
+        if args.incremental or args.manifest:
+            print("--checkpoint and --resume cannot be combined with --incremental")
+            return
+        if args.checkpoint_every <= 0:
+            print("--checkpoint-every must be greater than 0")
+            return
+        checkpoint = BatchCheckpoint(output_file, args.checkpoint or None)
+    
+    manifest = None
+    if args.incremental or args.manifest:
+        if args.workers > 1:
+            print("--incremental cannot be combined with --workers")
+            return
+        if extra_templates or args.format != 'csv' or partition_spec is not None:
+            print("--incremental only supports the plain SerialCode,DynamicLink CSV output")
+            return
+        if args.catalog:
+            print("--catalog cannot be combined with --incremental")
+            return
+        try:
+            manifest = LinkManifest(output_file, args.manifest)
+            manifest.seed_from_output(url_template)
+            manifest.check_template(url_template)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+    
+    registry = None
+    if args.registry:
+        if not os.path.exists(DEFAULT_INDEX_FILE):
+            print(f"Registry index not found: {DEFAULT_INDEX_FILE} (run: python3 serial_registry.py build)")
+            return
+        bloom_file = DEFAULT_BLOOM_FILE if os.path.exists(DEFAULT_BLOOM_FILE) else None
+        registry = RegistryFilter.open(DEFAULT_INDEX_FILE, bloom_file)
+    
+    metrics = BatchMetrics(progress_sinks(args.progress, args.metrics_jsonl, args.metrics_prom),
+                           interval=args.progress_interval, name=os.path.basename(input_file))
+    generator = DynamicLinkGenerator(input_file, output_file, url_template, manifest, registry,
+                                     extra_templates=extra_templates, output_format=args.format,
+                                     require_check_char=args.require_check_char, metrics=metrics,
+                                     partition_spec=partition_spec)
     
     print("NFT Dynamic Link Generator")
     print("="*60)
     print(f"URL Template: {url_template}")
+    for name, template in extra_templates:
+        print(f"Extra Template ({name}): {template}")
     print(f"Output will be saved to: {output_file}")
+    if partition_spec is not None:
+        sharding = (f"{partition_spec.partitions} partitions by serial code hash" if partition_spec.shard_rows is None
+                    else f"shards of {partition_spec.shard_rows} rows")
+        print(f"Partitioned output: {sharding}, {partition_spec.compression} compressed")
     print()
     
     # Process the batch
-    success = generator.process_batch()
+    if checkpoint is not None:
+        success = generator.process_batch_parallel(max(args.workers, 1), checkpoint, args.resume,
+                                                   int(args.checkpoint_every * 1024 * 1024))
+    elif args.workers > 1:
+        success = generator.process_batch_parallel(args.workers)
+    else:
+        success = generator.process_batch()
     
     # Print summary
     generator.print_summary()
@@ -216,8 +763,18 @@ def main():
     if success:
         print(f"\n✅ Task completed successfully!")
         
+        if args.catalog:
+            try:
+                with LinkCatalog(args.catalog) as catalog:
+                    batch_id, link_rows = catalog.record_output(
+                        output_file, url_template, input_file=input_file, extra_templates=extra_templates,
+                        total_rows=generator.total_count, error_rows=len(generator.errors))
+                print(f"Recorded as batch {batch_id} in {args.catalog} ({link_rows} links)")
+            except (OSError, sqlite3.Error) as e:
+                print(f"❌ Could not record the run in {args.catalog}: {e}")
+        
         # Show first few examples
-        if generator.processed_count > 0:
+        if generator.processed_count > 0 and args.format == 'csv' and partition_spec is None:
             print(f"\nFirst few examples:")
             try:
                 with open(output_file, 'r') as f:
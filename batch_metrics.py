@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Progress and metrics for batch runs: counters, per-stage timers, error rate
+and ETA, pushed to pluggable sinks at most once per interval (by time, not
+row count). Sinks: a TTY progress bar (rich when installed), plain progress
+lines, a JSON-lines log and a Prometheus textfile for node_exporter.
+
+snapshot() is thread-safe, so an embedding application can poll progress
+from another thread while the generator runs.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_INTERVAL = 1.0
+PROMETHEUS_PREFIX = 'e3_link_batch'
+
+try:
+    from rich.progress import BarColumn, Progress, TaskProgressColumn, TextColumn, TimeRemainingColumn
+except ImportError:
+    Progress = None
+
+class BatchMetrics:
+    """Counters and stage timers for one batch run"""
+
+    def __init__(self, sinks=None, interval=DEFAULT_INTERVAL, expected_total=None, name='batch'):
+        self.sinks = list(sinks or [])
+        self.interval = interval
+        self.expected_total = expected_total
+        self.name = name
+        self.counters = {'read': 0, 'processed': 0, 'errors': 0, 'skipped': 0}
+        self.stages = {}
+        self.started = time.monotonic()
+        self.finished = None
+        self.last_emit = self.started
+        self.lock = threading.Lock()
+
+    def update(self, **counters):
+        """Set counters to their current absolute values"""
+        with self.lock:
+            self.counters.update(counters)
+
+    def add_stage_time(self, stage, seconds):
+        with self.lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage):
+        """Time the enclosed block against a stage (read, validate, format, write...)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_time(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        """Current progress as a plain dict; safe to call from any thread"""
+        with self.lock:
+            counters = dict(self.counters)
+            stages = dict(self.stages)
+            finished = self.finished
+        elapsed = (finished or time.monotonic()) - self.started
+
+        read = counters['read']
+        # Rows skipped as already emitted still count as input consumed
+        consumed = read + counters['skipped']
+        rate = consumed / elapsed if elapsed > 0 else 0.0
+        expected = self.expected_total
+        if finished is None and expected and rate > 0:
+            eta = max(expected - consumed, 0) / rate
+        else:
+            eta = 0.0 if finished is not None else None
+
+        return {
+            'name': self.name,
+            'elapsed': elapsed,
+            **counters,
+            'expected_total': expected,
+            'rows_per_s': rate,
+            'error_rate': counters['errors'] / read if read else 0.0,
+            'eta_seconds': eta,
+            'stages': stages,
+            'done': finished is not None,
+        }
+
+    def maybe_emit(self):
+        """Emit to the sinks if the interval has passed since the last emit"""
+        if not self.sinks:
+            return
+        now = time.monotonic()
+        if now - self.last_emit >= self.interval:
+            self.last_emit = now
+            self.emit()
+
+    def emit(self):
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            sink.emit(snapshot)
+
+    def close(self):
+        """Mark the run finished, emit the final snapshot and close the sinks"""
+        if self.finished is not None:
+            return
+        with self.lock:
+            self.finished = time.monotonic()
+        self.emit()
+        for sink in self.sinks:
+            sink.close()
+
+def format_eta(seconds):
+    if seconds is None:
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+class PlainProgressSink:
+    """One 'Processed N codes...' line per emit, for logs and pipes"""
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def emit(self, snapshot):
+        if snapshot['done']:
+            return
+        eta = f", ETA {format_eta(snapshot['eta_seconds'])}" if snapshot['expected_total'] else ""
+        print(f"Processed {snapshot['processed']} codes... ({snapshot['rows_per_s']:,.0f} codes/s{eta})",
+              file=self.stream or sys.stdout)
+
+    def close(self):
+        pass
+
+class TTYProgressSink:
+    """Progress bar on a terminal: rich when installed, otherwise a plain bar"""
+
+    BAR_WIDTH = 30
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.progress = None
+        self.task = None
+        if Progress is not None:
+            self.progress = Progress(TextColumn("[bold]{task.description}"), BarColumn(), TaskProgressColumn(),
+                                     TextColumn("{task.fields[rate]}"), TimeRemainingColumn())
+            self.progress.start()
+            self.task = self.progress.add_task("Generating links", total=None, rate="")
+
+    def emit(self, snapshot):
+        expected = snapshot['expected_total']
+        if self.progress is not None:
+            consumed = snapshot['read'] + snapshot['skipped']
+            total = max(expected or 0, consumed) or None
+            self.progress.update(self.task, completed=consumed, total=total,
+                                 rate=f"{snapshot['rows_per_s']:,.0f} codes/s, {snapshot['errors']} errors")
+            return
+
+        if expected:
+            consumed = snapshot['read'] + snapshot['skipped']
+            fraction = 1.0 if snapshot['done'] else min(consumed / expected, 1.0)
+            filled = int(fraction * self.BAR_WIDTH)
+            bar = f"[{'#' * filled}{'.' * (self.BAR_WIDTH - filled)}] {fraction:4.0%}"
+        else:
+            bar = f"{snapshot['read']:,} rows"
+        eta = f" ETA {format_eta(snapshot['eta_seconds'])}" if not snapshot['done'] else ""
+        self.stream.write(f"\r{bar} {snapshot['rows_per_s']:,.0f} codes/s, {snapshot['errors']} errors{eta}   ")
+        self.stream.flush()
+
+    def close(self):
+        if self.progress is not None:
+            self.progress.stop()
+        else:
+            self.stream.write("\n")
+            self.stream.flush()
+
+class JSONLinesSink:
+    """Appends each snapshot to a JSON-lines log"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def emit(self, snapshot):
+        record = {'time': time.time(), **snapshot}
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class PrometheusTextfileSink:
+    """Rewrites a node_exporter textfile collector file (*.prom) on each emit"""
+
+    def __init__(self, path, prefix=PROMETHEUS_PREFIX):
+        self.path = path
+        self.prefix = prefix
+
+    def render(self, snapshot):
+        p = self.prefix
+        labels = f'{{name="{snapshot["name"]}"}}'
+        lines = []
+        declared = set()
+
+        def metric(name, kind, help_text, value, metric_labels=labels):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# HELP {p}_{name} {help_text}")
+                lines.append(f"# TYPE {p}_{name} {kind}")
+            lines.append(f"{p}_{name}{metric_labels} {value}")
+
+        metric('rows_read_total', 'counter', 'Serial codes read from the input', snapshot['read'])
+        metric('rows_processed_total', 'counter', 'Dynamic links generated', snapshot['processed'])
+        metric('rows_errors_total', 'counter', 'Serial codes rejected', snapshot['errors'])
+        metric('rows_skipped_total', 'counter', 'Serial codes skipped as already emitted', snapshot['skipped'])
+        metric('rows_per_second', 'gauge', 'Read throughput since the start of the run', round(snapshot['rows_per_s'], 3))
+        metric('error_ratio', 'gauge', 'Rejected share of the rows read', round(snapshot['error_rate'], 6))
+        if snapshot['eta_seconds'] is not None:
+            metric('eta_seconds', 'gauge', 'Estimated seconds until the run finishes', round(snapshot['eta_seconds'], 1))
+        metric('elapsed_seconds', 'gauge', 'Seconds since the run started', round(snapshot['elapsed'], 3))
+        metric('done', 'gauge', '1 once the run has finished', int(snapshot['done']))
+        for stage, seconds in sorted(snapshot['stages'].items()):
+            metric('stage_seconds_total', 'counter', 'Time spent per pipeline stage', round(seconds, 6),
+                   f'{{name="{snapshot["name"]}",stage="{stage}"}}')
+        return '\n'.join(lines) + '\n'
+
+    def emit(self, snapshot):
+        # node_exporter may read at any time, so replace the file atomically
+        tmp_file = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(self.render(snapshot))
+        os.replace(tmp_file, self.path)
+
+    def close(self):
+        pass
+
+PROGRESS_MODES = ['auto', 'bar', 'plain', 'none']
+
+def progress_sinks(mode='auto', jsonl_path=None, prometheus_path=None):
+    """Build the sink list for a --progress mode plus optional metrics files"""
+    if mode == 'auto':
+        mode = 'bar' if sys.stdout.isatty() else 'plain'
+    sinks = []
+    if mode == 'bar':
+        sinks.append(TTYProgressSink())
+    elif mode == 'plain':
+        sinks.append(PlainProgressSink())
+    if jsonl_path:
+        sinks.append(JSONLinesSink(jsonl_path))
+    if prometheus_path:
+        sinks.append(PrometheusTextfileSink(prometheus_path))
+    return sinks
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark CSV ingestion throughput (MB/s): the previous Sniffer + csv.reader
+path versus the csv_ingest fast path used by the link generators.
+"""
+
+import argparse
+import csv
+import os
+import random
+import string
+import tempfile
+import time
+
+import csv_ingest
+
+# Share of sample codes made invalid, so benchmarks exercise the reject path
+DEFAULT_INVALID_RATE = 0.01
+
+def invalid_rate(value):
+    """argparse type for --invalid-rate: a fraction from 0 to 1"""
+    rate = float(value)
+    if not 0 <= rate <= 1:
+        raise argparse.ArgumentTypeError(f"invalid rate must be between 0 and 1, got {value}")
+    return rate
+
+def write_sample_file(path, count, quoted=False, seed=42, invalid_rate=DEFAULT_INVALID_RATE):
+    """Write a single-column serial code CSV with a header row
+
+    A share of invalid_rate codes get a '!' in place of one character.
+    Returns the number of invalid codes written.
+    """
+    rng = random.Random(seed)
+    alphabet = string.ascii_uppercase + string.digits
+    invalid = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        f.write('SerialCode\n')
+        for _ in range(count):
+            code = 'E' + ''.join(rng.choice(alphabet) for _ in range(5))
+            if rng.random() < invalid_rate:
+                code = code[:3] + '!' + code[4:]
+                invalid += 1
+            f.write(f'"{code}"\n' if quoted else f'{code}\n')
+    return invalid
+
+def read_legacy(path):
+    """Previous reader: sniff the first 1 KB, then parse every row with csv.reader"""
+    codes = []
+    with open(path, 'r', newline='', encoding='utf-8') as csvfile:
+        sample = csvfile.read(1024)
+        csvfile.seek(0)
+        try:
+            delimiter = csv.Sniffer().sniff(sample).delimiter
+        except csv.Error:
+            delimiter = ','
+
+        reader = csv.reader(csvfile, delimiter=delimiter)
+        for i, row in enumerate(reader, 1):
+            if i == 1 and row and csv_ingest.is_header(row[0]):
+                continue
+            if row and row[0].strip():
+                codes.append((row[0].strip(), i))
+    return codes
+
+def read_fast(path):
+    """csv_ingest reader: fast path unless the file contains quotes"""
+    return list(csv_ingest.read_serial_codes(path))
+
+def read_fast_chunks(path):
+    """csv_ingest chunk iterator on its own, without building row tuples"""
+    values = []
+    for chunk in csv_ingest.iter_chunks(path):
+        values.extend(chunk)
+    return values
+
+def measure(reader, path, repeat):
+    """Best wall time over several runs"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = reader(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark serial code CSV ingestion')
+    parser.add_argument('-n', '--count', type=int, default=2_000_000, help='Number of codes (default: 2000000)')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Runs per reader, best is kept (default: 3)')
+    parser.add_argument('--invalid-rate', type=invalid_rate, default=DEFAULT_INVALID_RATE,
+                        help=f'Fraction of invalid codes (default: {DEFAULT_INVALID_RATE})')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for quoted in (False, True):
+            path = os.path.join(tmp_dir, 'codes.csv')
+            invalid = write_sample_file(path, args.count, quoted, invalid_rate=args.invalid_rate)
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+
+            label = "quoted (csv module fallback)" if quoted else "plain single column (fast path)"
+            print(f"{args.count:,} codes ({args.count - invalid:,} valid, {invalid:,} invalid), {size_mb:.1f} MB, {label}")
+            print("=" * 60)
+
+            legacy_time, legacy_rows = measure(read_legacy, path, args.repeat)
+            fast_time, fast_rows = measure(read_fast, path, args.repeat)
+            chunk_time, chunk_rows = measure(read_fast_chunks, path, args.repeat)
+
+            print(f"Sniffer + csv.reader: {legacy_time:.3f}s  {size_mb / legacy_time:7.1f} MB/s  ({legacy_rows:,} rows)")
+            print(f"csv_ingest:           {fast_time:.3f}s  {size_mb / fast_time:7.1f} MB/s  ({fast_rows:,} rows)")
+            print(f"csv_ingest chunks:    {chunk_time:.3f}s  {size_mb / chunk_time:7.1f} MB/s  ({chunk_rows:,} rows incl. header)")
+            print(f"Speedup: {legacy_time / fast_time:.1f}x\n")
+
+if __name__ == "__main__":
+    main()
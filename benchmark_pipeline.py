@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the link generation pipeline.
+Generates synthetic serial code CSVs (10^3 to 10^7 rows, 1% invalid by
+default), runs each generator path on them in a fresh process and records
+wall time, rows/s, peak RSS and the per-stage breakdown of process_batch
+(read, validate, format, write) as JSON, so runs from different commits can
+be compared with --compare.
+"""
+
+import argparse
+import contextlib
+import cProfile
+import json
+import os
+import platform
+import pstats
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from batch_link_generator import DynamicLinkGenerator
+from batch_metrics import BatchMetrics
+from benchmark_ingest import DEFAULT_INVALID_RATE, invalid_rate, write_sample_file
+from generate_dynamic_links import generate_dynamic_links
+from link_partitions import PartitionSpec
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_RESULTS_DIR = 'benchmark_results'
+
+# A case slower than this much of its baseline is flagged by --compare
+REGRESSION_THRESHOLD = 1.10
+
+def run_simple(input_file, output_file, workers):
+    """generate_dynamic_links.py: read everything, then write everything"""
+    generate_dynamic_links(input_file, output_file)
+
+def run_batch(input_file, output_file, workers):
+    """DynamicLinkGenerator.process_batch, streaming CSV"""
+    DynamicLinkGenerator(input_file, output_file).process_batch()
+
+def run_batch_parallel(input_file, output_file, workers):
+    """DynamicLinkGenerator.process_batch_parallel over --workers processes"""
+    DynamicLinkGenerator(input_file, output_file).process_batch_parallel(workers)
+
+def run_batch_columnar(input_file, output_file, workers):
+    """process_batch writing the binary columnar format"""
+    DynamicLinkGenerator(input_file, output_file, output_format='columnar').process_batch()
+
+def run_batch_gzip(input_file, output_file, workers):
+    """process_batch writing one gzip-compressed shard (compare with batch for the compression cost)"""
+    DynamicLinkGenerator(input_file, output_file, partition_spec=PartitionSpec(1, None, 'gzip', None)).process_batch()
+
+def run_batch_zstd(input_file, output_file, workers):
+    """process_batch writing one zstd-compressed shard"""
+    DynamicLinkGenerator(input_file, output_file, partition_spec=PartitionSpec(1, None, 'zstd', None)).process_batch()
+
+def run_batch_partitioned(input_file, output_file, workers):
+    """process_batch writing 8 gzip shards partitioned by serial code hash"""
+    DynamicLinkGenerator(input_file, output_file, partition_spec=PartitionSpec(8, None, 'gzip', None)).process_batch()
+
+def run_stages(input_file, output_file, workers):
+    """process_batch itself, with the stage times its BatchMetrics recorded"""
+    generator = DynamicLinkGenerator(input_file, output_file, metrics=BatchMetrics())
+    generator.process_batch()
+    return dict(generator.metrics.stages)
+
+CASES = {
+    'simple': run_simple,
+    'batch': run_batch,
+    'batch_parallel': run_batch_parallel,
+    'batch_columnar': run_batch_columnar,
+    'batch_gzip': run_batch_gzip,
+    'batch_zstd': run_batch_zstd,
+    'batch_partitioned': run_batch_partitioned,
+    'stages': run_stages,
+}
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its reaped children, in MB"""
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / scale
+
+def output_size_mb(path):
+    """Size of an output file, or of every file in a partitioned output directory"""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / (1024 * 1024)
+    return os.path.getsize(path) / (1024 * 1024) if os.path.exists(path) else 0
+
+def run_case(case, input_file, rows, workers, result_file, profile_file=None, invalid_rows=0):
+    """Child process entry point: run one case and write its result as JSON"""
+    output_file = os.path.join(os.path.dirname(result_file), f"{case}.out")
+    profiler = cProfile.Profile() if profile_file else None
+
+    # The generators print per row or every 50 rows; keep that out of the timing
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        stages = CASES[case](input_file, output_file, workers)
+        if profiler is not None:
+            profiler.disable()
+        wall_time = time.perf_counter() - start
+
+    if profiler is not None:
+        profiler.dump_stats(profile_file)
+
+    result = {
+        'case': case,
+        'rows': rows,
+        'invalid_rows': invalid_rows,
+        'wall_time': round(wall_time, 6),
+        'rows_per_s': round(rows / wall_time, 1) if wall_time else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'output_mb': round(output_size_mb(output_file), 2),
+    }
+    if case == 'batch_parallel':
+        result['workers'] = workers
+    if stages:
+        result['stages'] = {name: round(seconds, 6) for name, seconds in stages.items()}
+
+    with open(result_file, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_sizes(value):
+    """Parse '1e3,1e4,250000' into a list of row counts"""
+    return [int(float(size)) for size in value.split(',') if size.strip()]
+
+def run_in_child(case, input_file, rows, invalid_rows, workers, tmp_dir, profile):
+    """Run a case in a fresh interpreter so peak RSS is per case"""
+    case_dir = tempfile.mkdtemp(dir=tmp_dir)
+    result_file = os.path.join(case_dir, 'result.json')
+    command = [sys.executable, os.path.abspath(__file__), '--run-case', case,
+               '--input', input_file, '--rows', str(rows), '--invalid-rows', str(invalid_rows),
+               '--workers', str(workers),
+               '--result-file', result_file]
+
+    profile_path = None
+    if profile == 'cprofile':
+        profile_path = os.path.abspath(f"profile_{case}_{rows}.prof")
+        command += ['--profile-file', profile_path]
+    elif profile == 'py-spy':
+        profile_path = os.path.abspath(f"profile_{case}_{rows}.svg")
+        command = ['py-spy', 'record', '--subprocesses', '-o', profile_path, '--'] + command
+
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0 or not os.path.exists(result_file):
+        raise RuntimeError(f"{case} at {rows} rows failed:\n{completed.stderr.strip()}")
+
+    with open(result_file, 'r', encoding='utf-8') as f:
+        result = json.load(f)
+    shutil.rmtree(case_dir, ignore_errors=True)
+    if profile_path:
+        result['profile'] = profile_path
+    return result
+
+def print_result(result):
+    line = (f"  {result['case']:<18} {result['rows']:>10,} rows  {result['wall_time']:8.3f}s  "
+            f"{result['rows_per_s']:>12,.0f} rows/s  {result['peak_rss_mb']:7.1f} MB peak")
+    print(line)
+    if 'stages' in result:
+        print("    " + "  ".join(f"{name} {seconds:.3f}s" for name, seconds in result['stages'].items()))
+
+def compare(baseline_file, results):
+    """Print the rows/s of each case against a baseline results file"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    # Results on inputs with a different share of invalid rows are not comparable
+    previous = {(r['case'], r['rows'], r.get('invalid_rows', 0)): r for r in baseline['results']}
+
+    print(f"\nCompared with {baseline_file} (commit {baseline.get('commit') or 'unknown'})")
+    print("=" * 60)
+    regressions = 0
+    for result in results:
+        old = previous.get((result['case'], result['rows'], result['invalid_rows']))
+        if old is None or not old.get('rows_per_s') or not result.get('rows_per_s'):
+            continue
+        ratio = old['rows_per_s'] / result['rows_per_s']
+        flag = "  ⚠️ slower" if ratio > REGRESSION_THRESHOLD else ""
+        regressions += bool(flag)
+        print(f"  {result['case']:<18} {result['rows']:>10,} rows  "
+              f"{old['rows_per_s']:>12,.0f} -> {result['rows_per_s']:>12,.0f} rows/s  "
+              f"({result['rows_per_s'] / old['rows_per_s']:.2f}x){flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the link generation pipeline')
+    parser.add_argument('--sizes', type=parse_sizes, default=DEFAULT_SIZES,
+                        help='Comma-separated row counts (default: 1e3,1e4,1e5,1e6; up to 1e7)')
+    parser.add_argument('--cases', default=','.join(CASES),
+                        help=f"Comma-separated cases (default: {','.join(CASES)})")
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 2,
+                        help='Workers for batch_parallel (default: CPU count)')
+    parser.add_argument('--invalid-rate', type=invalid_rate, default=DEFAULT_INVALID_RATE,
+                        help=f'Fraction of invalid codes in the generated input (default: {DEFAULT_INVALID_RATE})')
+    parser.add_argument('-o', '--output', help=f'Results JSON (default: {DEFAULT_RESULTS_DIR}/<commit>_<time>.json)')
+    parser.add_argument('--compare', help='Earlier results JSON to compare rows/s against')
+    parser.add_argument('--profile', choices=['cprofile', 'py-spy'],
+                        help='Profile each case: cProfile .prof files, or py-spy flame graphs (py-spy must be installed)')
+    # Internal: used when the harness runs a single case in a child process
+    parser.add_argument('--run-case', choices=list(CASES), help=argparse.SUPPRESS)
+    parser.add_argument('--input', help=argparse.SUPPRESS)
+    parser.add_argument('--rows', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--invalid-rows', type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    parser.add_argument('--profile-file', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.run_case:
+        run_case(args.run_case, args.input, args.rows, args.workers, args.result_file, args.profile_file,
+                 args.invalid_rows)
+        return
+
+    cases = [case.strip() for case in args.cases.split(',') if case.strip()]
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        print(f"Unknown cases: {', '.join(unknown)} (choose from {', '.join(CASES)})")
+        sys.exit(1)
+    if args.profile == 'py-spy' and shutil.which('py-spy') is None:
+        print("py-spy is not installed (pip install py-spy)")
+        sys.exit(1)
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'invalid_rate': args.invalid_rate,
+        'results': [],
+    }
+
+    print(f"Pipeline benchmark (commit {commit or 'unknown'}, Python {report['python']})")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in args.sizes:
+            input_file = os.path.join(tmp_dir, f"codes_{rows}.csv")
+            invalid_rows = write_sample_file(input_file, rows, invalid_rate=args.invalid_rate)
+            print(f"{rows:,} rows ({rows - invalid_rows:,} valid, {invalid_rows:,} invalid; "
+                  f"{os.path.getsize(input_file) / (1024 * 1024):.1f} MB input)")
+            for case in cases:
+                try:
+                    result = run_in_child(case, input_file, rows, invalid_rows, args.workers, tmp_dir, args.profile)
+                except RuntimeError as e:
+                    print(f"  ❌ {e}")
+                    continue
+                report['results'].append(result)
+                print_result(result)
+            os.remove(input_file)
+
+    output_file = args.output
+    if not output_file:
+        os.makedirs(DEFAULT_RESULTS_DIR, exist_ok=True)
+        output_file = os.path.join(DEFAULT_RESULTS_DIR,
+                                   f"{commit or 'nocommit'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+    print(f"\nResults saved to: {output_file}")
+
+    if args.profile == 'cprofile':
+        for result in report['results']:
+            print(f"\nTop functions for {result['case']} at {result['rows']:,} rows ({result['profile']}):")
+            pstats.Stats(result['profile']).sort_stats('cumulative').print_stats(8)
+
+    if args.compare:
+        regressions = compare(args.compare, report['results'])
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Load-test client for link_service.py: keeps N keep-alive connections busy
+with single-code or bulk requests and reports throughput (requests/s and
+codes/s) and latency percentiles. With --spawn it starts its own service on
+a temporary Unix socket, so a run needs no other setup.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+from link_service import DEFAULT_HOST, DEFAULT_PORT
+
+MODES = ['single', 'bulk', 'validate']
+SPAWN_TIMEOUT = 10.0
+
+# Checked before every run: padded codes must be answered as the stripped
+# code, and a malformed one rejected
+CHECK_CODE = 'EAVO53'
+PADDED_CODES = [f' {CHECK_CODE} ', f'{CHECK_CODE}\t', f'\n{CHECK_CODE}']
+MALFORMED_CODE = 'EAV O53'
+
+def sample_codes(count, seed=42):
+    rng = random.Random(seed)
+    alphabet = string.ascii_uppercase + string.digits
+    return ['E' + ''.join(rng.choice(alphabet) for _ in range(5)) for _ in range(count)]
+
+async def open_connection(target):
+    if target.startswith('unix:'):
+        return await asyncio.open_unix_connection(target[len('unix:'):])
+    address = urlsplit(target)
+    return await asyncio.open_connection(address.hostname or DEFAULT_HOST, address.port or DEFAULT_PORT)
+
+async def request(reader, writer, method, path, payload=None):
+    """Send one request on a keep-alive connection; returns (status, body)"""
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n"
+    if body:
+        head += "Content-Type: application/json\r\n"
+    writer.write((head + "\r\n").encode('latin-1') + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+class LoadTest:
+    def __init__(self, target, mode, codes, bulk_size, concurrency, total_requests):
+        self.target = target
+        self.mode = mode
+        self.codes = codes
+        self.bulk_size = bulk_size
+        self.concurrency = concurrency
+        self.total_requests = total_requests
+        self.issued = 0
+        self.latencies = []
+        self.statuses = {}
+        self.code_count = 0
+
+    def next_request(self):
+        """(method, path, payload, codes in request) for the next request"""
+        start = (self.issued * self.bulk_size) % len(self.codes)
+        if self.mode == 'single':
+            return 'GET', f"/link/{self.codes[self.issued % len(self.codes)]}", None, 1
+        batch = self.codes[start:start + self.bulk_size] or self.codes[:self.bulk_size]
+        path = '/links' if self.mode == 'bulk' else '/validate'
+        return 'POST', path, {'serial_codes': batch}, len(batch)
+
+    async def worker(self):
+        reader, writer = await open_connection(self.target)
+        try:
+            while self.issued < self.total_requests:
+                method, path, payload, count = self.next_request()
+                self.issued += 1
+                start = time.perf_counter()
+                status, _ = await request(reader, writer, method, path, payload)
+                self.latencies.append(time.perf_counter() - start)
+                self.statuses[status] = self.statuses.get(status, 0) + 1
+                if status == 200:
+                    self.code_count += count
+        finally:
+            writer.close()
+
+    async def run(self):
+        start = time.perf_counter()
+        await asyncio.gather(*(self.worker() for _ in range(self.concurrency)))
+        return time.perf_counter() - start
+
+async def fetch_stats(target):
+    reader, writer = await open_connection(target)
+    try:
+        _, body = await request(reader, writer, 'GET', '/stats')
+        return json.loads(body)
+    finally:
+        writer.close()
+
+async def check_service(target):
+    """Problems found sending padded and malformed codes to the service"""
+    problems = []
+    reader, writer = await open_connection(target)
+    try:
+        _, body = await request(reader, writer, 'POST', '/links',
+                                {'serial_codes': [CHECK_CODE] + PADDED_CODES + [MALFORMED_CODE]})
+        expected, *padded, malformed = json.loads(body)['results']
+        for serial_code, record in zip(PADDED_CODES, padded):
+            if record != expected:
+                problems.append(f"POST /links {serial_code!r}: {record} instead of {expected}")
+        if 'error' not in malformed:
+            problems.append(f"POST /links {MALFORMED_CODE!r} was not rejected")
+
+        status, body = await request(reader, writer, 'GET', f"/link/%20{CHECK_CODE}%20")
+        if json.loads(body) != expected:
+            problems.append(f"GET /link/%20{CHECK_CODE}%20: {status} {body.decode('utf-8')}")
+    finally:
+        writer.close()
+    return problems
+
+def spawn_service(socket_path, extra_args):
+    """Start link_service.py on a Unix socket and wait until it answers"""
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'link_service.py'),
+               '--unix', socket_path] + extra_args
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    deadline = time.monotonic() + SPAWN_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"link_service.py exited: {process.stderr.read().strip()}")
+        if os.path.exists(socket_path):
+            return process
+        time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError("link_service.py did not start in time")
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the link service')
+    parser.add_argument('--url', default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}",
+                        help=f'Service address: http://host:port or unix:/path (default: http://{DEFAULT_HOST}:{DEFAULT_PORT})')
+    parser.add_argument('--spawn', action='store_true', help='Start a service on a temporary Unix socket for the run')
+    parser.add_argument('--service-args', default='', help='Extra link_service.py arguments for --spawn, as one string')
+    parser.add_argument('-m', '--mode', choices=MODES, default='single',
+                        help='GET /link/<code>, POST /links or POST /validate (default: single)')
+    parser.add_argument('-c', '--concurrency', type=int, default=32, help='Concurrent connections (default: 32)')
+    parser.add_argument('-n', '--requests', type=int, default=20_000, help='Total requests (default: 20000)')
+    parser.add_argument('-b', '--bulk-size', type=int, default=100, help='Codes per bulk request (default: 100)')
+    parser.add_argument('--codes', type=int, default=100_000, help='Distinct sample codes to cycle through (default: 100000)')
+
+    args = parser.parse_args()
+
+    if min(args.concurrency, args.requests, args.bulk_size, args.codes) < 1:
+        print("--concurrency, --requests, --bulk-size and --codes must be at least 1")
+        sys.exit(1)
+
+    process = None
+    target = args.url
+    tmp_dir = None
+    if args.spawn:
+        tmp_dir = tempfile.TemporaryDirectory()
+        socket_path = os.path.join(tmp_dir.name, 'links.sock')
+        try:
+            process = spawn_service(socket_path, args.service_args.split())
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        target = f"unix:{socket_path}"
+
+    load_test = LoadTest(target, args.mode, sample_codes(args.codes), args.bulk_size,
+                         args.concurrency, args.requests)
+    print(f"Load test: {args.requests} {args.mode} requests over {args.concurrency} connections to {target}")
+    print("=" * 60)
+    try:
+        problems = asyncio.run(check_service(target))
+        if problems:
+            print("❌ Service check failed:")
+            for problem in problems:
+                print(f"  - {problem}")
+            sys.exit(1)
+        print("✅ Padded codes are stripped and malformed codes rejected")
+        elapsed = asyncio.run(load_test.run())
+        stats = asyncio.run(fetch_stats(target))
+    except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+        print(f"❌ Load test failed: {e}")
+        sys.exit(1)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+            tmp_dir.cleanup()
+
+    latencies = sorted(load_test.latencies)
+    print(f"Elapsed: {elapsed:.2f}s")
+    print(f"Throughput: {len(latencies) / elapsed:,.0f} requests/s, {load_test.code_count / elapsed:,.0f} codes/s")
+    print(f"Latency: p50 {percentile(latencies, 0.50) * 1000:.2f} ms, p95 {percentile(latencies, 0.95) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+    print("Status codes: " + ", ".join(f"{status} x{count}" for status, count in sorted(load_test.statuses.items())))
+    print(f"Service: {stats['batches']} batches, {stats['average_batch_size']} codes per batch on average, "
+          f"{stats['overloaded']} requests turned away")
+
+if __name__ == "__main__":
+    main()
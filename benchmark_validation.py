@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark serial code validation: per-row validate_serial_code versus the
+batched validate_serial_codes used by DynamicLinkGenerator.process_batch,
+and per-code versus vectorized check character verification.
+"""
+
+import argparse
+import random
+import string
+import time
+
+from batch_link_generator import DynamicLinkGenerator, VALIDATION_BATCH_SIZE
+from benchmark_ingest import DEFAULT_INVALID_RATE, invalid_rate
+from check_digit import append_check_chars, has_valid_check_char, verify_many
+
+def make_codes(count, invalid_rate, seed=42):
+    """Build synthetic 6-character E-serials with a share of invalid codes"""
+    rng = random.Random(seed)
+    alphabet = string.ascii_uppercase + string.digits
+    codes = []
+    for _ in range(count):
+        code = 'E' + ''.join(rng.choice(alphabet) for _ in range(5))
+        if rng.random() < invalid_rate:
+            code = code[:3] + ' ' + code[4:]
+        codes.append(code)
+    return codes
+
+def time_per_row(generator, codes):
+    """Current path: one validate_serial_code call per code"""
+    start = time.perf_counter()
+    rejected = 0
+    for serial_code in codes:
+        is_valid, _ = generator.validate_serial_code(serial_code)
+        if not is_valid:
+            rejected += 1
+    return time.perf_counter() - start, rejected
+
+def time_batched(generator, codes):
+    """Batched path: validate_serial_codes over VALIDATION_BATCH_SIZE chunks"""
+    start = time.perf_counter()
+    rejected = 0
+    for offset in range(0, len(codes), VALIDATION_BATCH_SIZE):
+        rejected += len(generator.validate_serial_codes(codes[offset:offset + VALIDATION_BATCH_SIZE]))
+    return time.perf_counter() - start, rejected
+
+def time_check_per_code(codes):
+    """has_valid_check_char on one code at a time"""
+    start = time.perf_counter()
+    rejected = sum(not has_valid_check_char(serial_code) for serial_code in codes)
+    return time.perf_counter() - start, rejected
+
+def time_check_vectorized(codes):
+    """verify_many over VALIDATION_BATCH_SIZE chunks"""
+    start = time.perf_counter()
+    rejected = 0
+    for offset in range(0, len(codes), VALIDATION_BATCH_SIZE):
+        rejected += verify_many(codes[offset:offset + VALIDATION_BATCH_SIZE]).count(False)
+    return time.perf_counter() - start, rejected
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark serial code validation')
+    parser.add_argument('-n', '--count', type=int, default=1_000_000, help='Number of codes (default: 1000000)')
+    parser.add_argument('--invalid-rate', type=invalid_rate, default=DEFAULT_INVALID_RATE,
+                        help=f'Fraction of invalid codes (default: {DEFAULT_INVALID_RATE})')
+    args = parser.parse_args()
+
+    codes = make_codes(args.count, args.invalid_rate)
+    generator = DynamicLinkGenerator(input_file=None)
+
+    print(f"Validating {len(codes):,} codes (invalid rate {args.invalid_rate})")
+    print("=" * 60)
+
+    per_row_time, per_row_rejected = time_per_row(generator, codes)
+    batched_time, batched_rejected = time_batched(generator, codes)
+
+    if per_row_rejected != batched_rejected:
+        print(f"❌ Mismatch: per-row rejected {per_row_rejected}, batched rejected {batched_rejected}")
+        return
+
+    print(f"Per-row validate_serial_code:  {per_row_time:.3f}s  ({len(codes) / per_row_time:,.0f} codes/s)")
+    print(f"Batched validate_serial_codes: {batched_time:.3f}s  ({len(codes) / batched_time:,.0f} codes/s)")
+    print(f"Valid codes: {len(codes) - batched_rejected:,}  Rejected codes: {batched_rejected:,}")
+    print(f"Speedup: {per_row_time / batched_time:.1f}x")
+
+    # Check characters: codes with one in 1,000 mistyped in the last place
+    checked = append_check_chars(make_codes(args.count, 0.0))
+    for i in range(0, len(checked), 1000):
+        checked[i] = checked[i][:-1] + ('0' if checked[i][-1] != '0' else '1')
+
+    print(f"\nVerifying check characters on {len(checked):,} codes")
+    print("=" * 60)
+    check_time, check_rejected = time_check_per_code(checked)
+    vector_time, vector_rejected = time_check_vectorized(checked)
+    if check_rejected != vector_rejected:
+        print(f"❌ Mismatch: per-code rejected {check_rejected}, vectorized rejected {vector_rejected}")
+        return
+    print(f"Per-code has_valid_check_char: {check_time:.3f}s  ({len(checked) / check_time:,.0f} codes/s)")
+    print(f"Vectorized verify_many:        {vector_time:.3f}s  ({len(checked) / vector_time:,.0f} codes/s)")
+    print(f"Rejected codes: {vector_rejected}")
+    print(f"Speedup: {check_time / vector_time:.1f}x")
+
+if __name__ == "__main__":
+    main()
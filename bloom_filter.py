@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Bloom filter fast path for serial code membership checks.
+Most lookups during a drop are mistyped or forged codes; the filter rejects
+those without touching the registry index, which is only consulted for
+codes the filter says might be present.
+"""
+
+import argparse
+import hashlib
+import math
+import mmap
+import os
+import struct
+
+from serial_registry import (
+    DEFAULT_INDEX_FILE,
+    REGISTRY_SOURCES,
+    SerialRegistry,
+    codes_fingerprint,
+    load_source_codes,
+    normalize_serial_code,
+)
+
+DEFAULT_BLOOM_FILE = 'serial_registry.bloom'
+DEFAULT_FP_RATE = 0.001
+
+BLOOM_MAGIC = b'E3BF'
+BLOOM_VERSION = 2
+# magic, version, hashes, bits, count, fp rate, fingerprint of the codes
+# (serial_registry.codes_fingerprint, so it can be matched against the index)
+BLOOM_HEADER = struct.Struct('<4sHHQQd16s')
+# Version 1 filters have no fingerprint; they are loaded but never trusted
+BLOOM_HEADER_V1 = struct.Struct('<4sHHQQd')
+
+def bloom_parameters(count, fp_rate):
+    """Optimal (bits, hashes) for count items at the target false-positive rate"""
+    if not 0 < fp_rate < 1:
+        raise ValueError(f"False-positive rate must be between 0 and 1 (exclusive), got {fp_rate}")
+    count = max(count, 1)
+    bits = max(8, math.ceil(-count * math.log(fp_rate) / (math.log(2) ** 2)))
+    hashes = max(1, round(bits / count * math.log(2)))
+    return bits, hashes
+
+def fp_rate_argument(value):
+    """argparse type for --fp-rate"""
+    try:
+        fp_rate = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid false-positive rate: {value}")
+    if not 0 < fp_rate < 1:
+        raise argparse.ArgumentTypeError(f"false-positive rate must be between 0 and 1 (exclusive), got {value}")
+    return fp_rate
+
+def _hash_pair(serial_code):
+    """Two 64-bit hashes of a normalized code, combined by double hashing"""
+    digest = hashlib.blake2b(serial_code.encode('utf-8'), digest_size=16).digest()
+    h1, h2 = struct.unpack('<QQ', digest)
+    return h1, h2 | 1
+
+class BloomFilter:
+    """Bloom filter over normalized serial codes
+
+    Build one in memory with BloomFilter(count, fp_rate) and add(), or map
+    a saved filter with BloomFilter.load(). A negative answer is always
+    correct; a positive answer is wrong at about the configured rate.
+    """
+
+    def __init__(self, count, fp_rate=DEFAULT_FP_RATE, bits=None, hashes=None, data=None, fingerprint=None):
+        if bits is None or hashes is None:
+            bits, hashes = bloom_parameters(count, fp_rate)
+        self.count = count
+        self.fingerprint = fingerprint
+        self.fp_rate = fp_rate
+        self.bits = bits
+        self.hashes = hashes
+        self.data = data if data is not None else bytearray((bits + 7) // 8)
+        self._file = None
+
+    @classmethod
+    def from_codes(cls, codes, fp_rate=DEFAULT_FP_RATE):
+        """Build a filter sized for the given codes"""
+        codes = list(codes)
+        bloom = cls(len(codes), fp_rate, fingerprint=codes_fingerprint(codes))
+        for serial_code in codes:
+            bloom.add(serial_code)
+        return bloom
+
+    @classmethod
+    def load(cls, path=DEFAULT_BLOOM_FILE):
+        """Memory-map a filter written by save()"""
+        f = open(path, 'rb')
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = struct.unpack_from('<4sH', data, 0) if len(data) >= 6 else (None, None)
+        if magic != BLOOM_MAGIC or version not in (1, BLOOM_VERSION):
+            data.close()
+            f.close()
+            raise ValueError(f"Not a serial code Bloom filter: {path}")
+
+        if version == 1:
+            header = BLOOM_HEADER_V1
+            _, _, hashes, bits, count, fp_rate = header.unpack_from(data, 0)
+            fingerprint = None
+        else:
+            header = BLOOM_HEADER
+            _, _, hashes, bits, count, fp_rate, fingerprint = header.unpack_from(data, 0)
+        bloom = cls(count, fp_rate, bits, hashes, memoryview(data)[header.size:], fingerprint)
+        bloom._file = (f, data)
+        return bloom
+
+    def save(self, path=DEFAULT_BLOOM_FILE):
+        """Write the filter as a compact binary file, replacing any previous one atomically"""
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(BLOOM_HEADER.pack(BLOOM_MAGIC, BLOOM_VERSION, self.hashes, self.bits,
+                                      self.count, self.fp_rate, self.fingerprint or bytes(16)))
+            f.write(self.data)
+        os.replace(tmp_file, path)
+
+    def close(self):
+        if self._file is not None:
+            f, data = self._file
+            self.data.release()
+            data.close()
+            f.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _positions(self, serial_code):
+        h1, h2 = _hash_pair(normalize_serial_code(serial_code))
+        bits = self.bits
+        return [(h1 + i * h2) % bits for i in range(self.hashes)]
+
+    def add(self, serial_code):
+        for position in self._positions(serial_code):
+            self.data[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, serial_code):
+        """False means definitely not registered; True means check the registry"""
+        data = self.data
+        for position in self._positions(serial_code):
+            if not data[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def might_contain_many(self, serial_codes):
+        """Batch version of might_contain, returning a list of booleans"""
+        return [self.might_contain(serial_code) for serial_code in serial_codes]
+
+class RegistryFilter:
+    """Registry membership with an optional Bloom filter in front
+
+    contains()/contains_many() only probe the registry index for codes
+    the filter lets through, so forged or mistyped codes are rejected
+    without touching the index. A filter built from other codes than the
+    index holds is not used (see open()).
+    """
+
+    def __init__(self, registry, bloom=None, bloom_file=None):
+        self.registry = registry
+        self.bloom = bloom
+        # Files needed to reopen the same filter in another process
+        self.files = (registry.index_file, bloom_file)
+
+    @classmethod
+    def open(cls, index_file=DEFAULT_INDEX_FILE, bloom_file=None):
+        """Open the registry index and, if given, the Bloom filter
+
+        A filter whose code count or fingerprint does not match the index
+        (e.g. the index was rebuilt with new codes since) would reject
+        registered codes, so it is dropped with a warning and the index is
+        used on its own.
+        """
+        registry = SerialRegistry(index_file)
+        bloom = BloomFilter.load(bloom_file) if bloom_file else None
+        if bloom is not None and (bloom.count != registry.count or bloom.fingerprint != registry.fingerprint()):
+            print(f"⚠️ {bloom_file} was not built from the codes in {index_file}; "
+                  f"using the index alone (rebuild with: python3 bloom_filter.py build)")
+            bloom.close()
+            bloom = bloom_file = None
+        return cls(registry, bloom, bloom_file)
+
+    def close(self):
+        self.registry.close()
+        if self.bloom is not None:
+            self.bloom.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def might_contain(self, serial_code):
+        return self.bloom is None or self.bloom.might_contain(serial_code)
+
+    def contains(self, serial_code):
+        return self.might_contain(serial_code) and serial_code in self.registry
+
+    def might_contain_many(self, serial_codes):
+        if self.bloom is None:
+            return [True] * len(serial_codes)
+        return self.bloom.might_contain_many(serial_codes)
+
+    def contains_many(self, serial_codes):
+        """Exact membership for a batch of codes, returning a list of booleans"""
+        registry = self.registry
+        return [maybe and serial_code in registry
+                for serial_code, maybe in zip(serial_codes, self.might_contain_many(serial_codes))]
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and query the serial code Bloom filter')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Build the Bloom filter from CSV sources')
+    build_parser.add_argument('sources', nargs='*', help=f"CSV sources (default: {', '.join(REGISTRY_SOURCES)})")
+    build_parser.add_argument('-o', '--output', default=DEFAULT_BLOOM_FILE, help=f'Filter file (default: {DEFAULT_BLOOM_FILE})')
+    build_parser.add_argument('-p', '--fp-rate', type=fp_rate_argument, default=DEFAULT_FP_RATE,
+                              help=f'Target false-positive rate (default: {DEFAULT_FP_RATE})')
+
+    check_parser = subparsers.add_parser('check', help='Check serial codes against the filter')
+    check_parser.add_argument('codes', nargs='+', help='Serial codes to check')
+    check_parser.add_argument('-f', '--filter', default=DEFAULT_BLOOM_FILE, help=f'Filter file (default: {DEFAULT_BLOOM_FILE})')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        bloom = BloomFilter.from_codes(load_source_codes(args.sources or None), args.fp_rate)
+        bloom.save(args.output)
+        print(f"Bloom filter: {args.output}")
+        print(f"Codes: {bloom.count}, bits: {bloom.bits} ({len(bloom.data):,} bytes), hashes: {bloom.hashes}")
+        print(f"Target false-positive rate: {bloom.fp_rate}")
+    else:
+        with BloomFilter.load(args.filter) as bloom:
+            for serial_code in args.codes:
+                status = "might be registered" if bloom.might_contain(serial_code) else "NOT registered"
+                print(f"  {serial_code}: {status}")
+
+if __name__ == "__main__":
+    main()
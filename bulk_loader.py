@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Load generated serial codes and dynamic links into the profiles table
+(shared/schema.ts) that storage.getProfileBySerialCode queries.
+
+Reads any batch_link_generator.py output (CSV, JSONL or columnar) and
+streams it into Postgres over a small asyncpg connection pool, using COPY
+or multi-row inserts. A SQLite file can stand in for Postgres for local
+runs. Loads are idempotent: codes already in the table only have their
+dynamic link updated, so a rerun inserts nothing new.
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+from itertools import islice
+
+from link_writers import iter_link_rows
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_POOL_SIZE = 4
+LOAD_METHODS = ['copy', 'insert']
+
+# profiles has no unique constraint on serial_code, so ON CONFLICT is not
+# available: each batch goes through a staging table and is merged with an
+# UPDATE of existing codes plus an INSERT of the missing ones.
+STAGING_TABLE = 'serial_load_staging'
+
+# Columns the loader fills in; everything else NOT NULL gets a placeholder
+# until the owner completes the profile. e_number keeps its '' default,
+# which the server reads as "unclaimed": lookups skip the row and
+# registering the serial fills it in (server/register-profile.ts).
+PROFILE_PLACEHOLDERS = {
+    'name': "''",
+    'bio': "''",
+    'profile_image': "''",
+    'relationship_status': "''",
+    'job_title': "''",
+    'area': "''",
+    'email': "''",
+    'links': "'[]'",
+}
+
+PLACEHOLDER_COLUMNS = ', '.join(PROFILE_PLACEHOLDERS)
+PLACEHOLDER_VALUES = ', '.join(PROFILE_PLACEHOLDERS.values())
+
+SERIAL_CODE_INDEX = 'CREATE INDEX IF NOT EXISTS profiles_serial_code_idx ON profiles (serial_code)'
+
+# SQLite stand-in for the Drizzle profiles table
+SQLITE_PROFILES_TABLE = """
+CREATE TABLE IF NOT EXISTS profiles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    e_number TEXT NOT NULL DEFAULT '',
+    name TEXT NOT NULL,
+    bio TEXT NOT NULL,
+    profile_image TEXT NOT NULL,
+    relationship_status TEXT NOT NULL,
+    job_title TEXT NOT NULL,
+    area TEXT NOT NULL,
+    email TEXT NOT NULL,
+    phone TEXT,
+    hide_personal_info INTEGER DEFAULT 0,
+    links TEXT NOT NULL,
+    accepted_terms INTEGER DEFAULT 0,
+    serial_code TEXT NOT NULL,
+    dynamic_link TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+def is_sqlite_url(database_url):
+    """SQLite stand-in: sqlite:///path, or a plain path to a .db/.sqlite file"""
+    return database_url.startswith('sqlite:') or database_url.endswith(('.db', '.sqlite', '.sqlite3'))
+
+def sqlite_path(database_url):
+    if database_url.startswith('sqlite:///'):
+        return database_url[len('sqlite:///'):]
+    if database_url.startswith('sqlite:'):
+        return database_url[len('sqlite:'):]
+    return database_url
+
+def status_count(status):
+    """Row count from a Postgres command status such as 'INSERT 0 250'"""
+    try:
+        return int(status.rsplit(' ', 1)[-1])
+    except (AttributeError, ValueError):
+        return 0
+
+class PostgresTarget:
+    """profiles table in Postgres, loaded through an asyncpg pool"""
+
+    def __init__(self, database_url, pool_size=DEFAULT_POOL_SIZE, method='copy'):
+        self.database_url = database_url
+        self.pool_size = pool_size
+        self.method = method
+        self.pool = None
+
+    async def open(self, init=False):
+        try:
+            import asyncpg
+        except ImportError:
+            raise RuntimeError("asyncpg is required for Postgres loads (pip install asyncpg)")
+
+        self.pool = await asyncpg.create_pool(self.database_url, min_size=1, max_size=self.pool_size)
+        if init:
+            await self.pool.execute(SERIAL_CODE_INDEX)
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+
+    async def load_batch(self, rows):
+        """Merge one batch; returns (inserted, updated)"""
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                if self.method == 'copy':
+                    await conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} "
+                                       f"(serial_code text, dynamic_link text) ON COMMIT DELETE ROWS")
+                    await conn.copy_records_to_table(STAGING_TABLE, records=rows,
+                                                     columns=['serial_code', 'dynamic_link'])
+                    source = STAGING_TABLE
+                    args = ()
+                else:
+                    source = "unnest($1::text[], $2::text[])"
+                    args = ([row[0] for row in rows], [row[1] for row in rows])
+
+                updated = await conn.execute(
+                    f"UPDATE profiles p SET dynamic_link = s.dynamic_link "
+                    f"FROM {source} AS s(serial_code, dynamic_link) "
+                    f"WHERE p.serial_code = s.serial_code AND p.dynamic_link IS DISTINCT FROM s.dynamic_link",
+                    *args)
+                inserted = await conn.execute(
+                    f"INSERT INTO profiles (serial_code, dynamic_link, {PLACEHOLDER_COLUMNS}) "
+                    f"SELECT s.serial_code, s.dynamic_link, {PLACEHOLDER_VALUES} "
+                    f"FROM {source} AS s(serial_code, dynamic_link) "
+                    f"WHERE NOT EXISTS (SELECT 1 FROM profiles p WHERE p.serial_code = s.serial_code)",
+                    *args)
+
+        return status_count(inserted), status_count(updated)
+
+class SQLiteTarget:
+    """profiles table in a SQLite file, for local runs without Postgres
+
+    sqlite3 is blocking and SQLite serialises writers anyway, so batches run
+    one at a time on a worker thread over a single connection.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+        self.lock = asyncio.Lock()
+
+    async def open(self, init=False):
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (serial_code TEXT, dynamic_link TEXT)")
+        if init:
+            self.conn.execute(SQLITE_PROFILES_TABLE)
+            self.conn.execute(SERIAL_CODE_INDEX)
+            self.conn.commit()
+
+    async def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+    def _load_batch(self, rows):
+        conn = self.conn
+        with conn:
+            conn.execute(f"DELETE FROM {STAGING_TABLE}")
+            conn.executemany(f"INSERT INTO {STAGING_TABLE} VALUES (?, ?)", rows)
+            updated = conn.execute(
+                f"UPDATE profiles SET dynamic_link = s.dynamic_link FROM {STAGING_TABLE} AS s "
+                f"WHERE profiles.serial_code = s.serial_code AND profiles.dynamic_link IS NOT s.dynamic_link"
+            ).rowcount
+            inserted = conn.execute(
+                f"INSERT INTO profiles (serial_code, dynamic_link, {PLACEHOLDER_COLUMNS}) "
+                f"SELECT s.serial_code, s.dynamic_link, {PLACEHOLDER_VALUES} FROM {STAGING_TABLE} AS s "
+                f"WHERE NOT EXISTS (SELECT 1 FROM profiles p WHERE p.serial_code = s.serial_code)"
+            ).rowcount
+        return inserted, updated
+
+    async def load_batch(self, rows):
+        async with self.lock:
+            return await asyncio.to_thread(self._load_batch, rows)
+
+def open_target(database_url, pool_size=DEFAULT_POOL_SIZE, method='copy'):
+    if is_sqlite_url(database_url):
+        return SQLiteTarget(sqlite_path(database_url))
+    return PostgresTarget(database_url, pool_size, method)
+
+class BulkLoader:
+    """Streams rows from a generator output file into a target in batches
+
+    One producer reads batches into a bounded queue and pool_size consumers
+    load them concurrently, so reading, network and database work overlap
+    without holding the whole file in memory.
+    """
+
+    def __init__(self, target, batch_size=DEFAULT_BATCH_SIZE, pool_size=DEFAULT_POOL_SIZE):
+        self.target = target
+        self.batch_size = batch_size
+        self.pool_size = pool_size
+        self.read_count = 0
+        self.duplicate_count = 0
+        self.inserted_count = 0
+        self.updated_count = 0
+        self.batch_count = 0
+        self.elapsed = 0.0
+
+    def iter_batches(self, path):
+        """Batches of (serial_code, dynamic_link), each code only once
+
+        Repeated codes are dropped here: two concurrent batches holding the
+        same code could otherwise both see it missing and insert it twice.
+        """
+        seen = set()
+        rows = iter_link_rows(path)
+        while True:
+            chunk = list(islice(rows, self.batch_size))
+            if not chunk:
+                return
+            self.read_count += len(chunk)
+
+            batch = []
+            for serial_code, dynamic_link in chunk:
+                serial_code = serial_code.strip()
+                if not serial_code or serial_code in seen:
+                    self.duplicate_count += 1
+                    continue
+                seen.add(serial_code)
+                batch.append((serial_code, dynamic_link))
+            if batch:
+                yield batch
+
+    async def produce(self, path, queue, consumer_count):
+        for batch in self.iter_batches(path):
+            await queue.put(batch)
+        for _ in range(consumer_count):
+            await queue.put(None)
+
+    async def consume(self, queue):
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            inserted, updated = await self.target.load_batch(batch)
+            self.inserted_count += inserted
+            self.updated_count += updated
+            self.batch_count += 1
+            if self.batch_count % 20 == 0:
+                print(f"Loaded {self.batch_count} batches ({self.inserted_count + self.updated_count} rows changed)...")
+
+    async def run(self, path):
+        queue = asyncio.Queue(maxsize=self.pool_size * 2)
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(self.consume(queue)) for _ in range(self.pool_size)]
+        tasks.append(asyncio.create_task(self.produce(path, queue, self.pool_size)))
+        try:
+            # Stop everything on the first failure, otherwise the producer
+            # would block forever on a queue nobody is reading
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task in done:
+                task.result()
+        finally:
+            self.elapsed = time.perf_counter() - start
+
+    @property
+    def rows_per_second(self):
+        return self.read_count / self.elapsed if self.elapsed else 0.0
+
+    def print_summary(self):
+        print("\n" + "=" * 60)
+        print("BULK LOAD SUMMARY")
+        print("=" * 60)
+        print(f"Rows read: {self.read_count}")
+        print(f"Duplicate/blank rows skipped: {self.duplicate_count}")
+        print(f"Profiles inserted: {self.inserted_count}")
+        print(f"Dynamic links updated: {self.updated_count}")
+        print(f"Batches: {self.batch_count}")
+        print(f"Elapsed: {self.elapsed:.2f}s ({self.rows_per_second:,.0f} rows/s)")
+
+async def load(args):
+    target = open_target(args.database, args.pool_size, args.method)
+    # SQLite has a single writer, so extra consumers would only queue on its lock
+    pool_size = 1 if isinstance(target, SQLiteTarget) else args.pool_size
+    loader = BulkLoader(target, args.batch_size, pool_size)
+
+    await target.open(init=args.init)
+    try:
+        await loader.run(args.input_file)
+    finally:
+        await target.close()
+    return loader
+
+def main():
+    parser = argparse.ArgumentParser(description='Load generated serial codes and dynamic links into the profiles table')
+    parser.add_argument('input_file', help='batch_link_generator.py output (CSV, JSONL or columnar)')
+    parser.add_argument('-d', '--database', default=os.environ.get('DATABASE_URL'),
+                        help='Postgres URL or SQLite file (default: $DATABASE_URL)')
+    parser.add_argument('-b', '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Rows per batch (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('-p', '--pool-size', type=int, default=DEFAULT_POOL_SIZE,
+                        help=f'Postgres connections loading in parallel (default: {DEFAULT_POOL_SIZE})')
+    parser.add_argument('--method', choices=LOAD_METHODS, default='copy',
+                        help='Postgres load method: COPY into a staging table or multi-row INSERT (default: copy)')
+    parser.add_argument('--init', action='store_true',
+                        help='Create the serial_code index (and the profiles table for SQLite) if missing')
+
+    args = parser.parse_args()
+
+    if not args.database:
+        print("No database given: pass --database or set DATABASE_URL")
+        sys.exit(1)
+    if not os.path.exists(args.input_file):
+        print(f"Input file not found: {args.input_file}")
+        sys.exit(1)
+    if args.batch_size < 1 or args.pool_size < 1:
+        print("--batch-size and --pool-size must be at least 1")
+        sys.exit(1)
+
+    print(f"Loading {args.input_file} into profiles")
+    try:
+        loader = asyncio.run(load(args))
+    except (RuntimeError, sqlite3.Error, ValueError) as e:
+        print(f"❌ Load failed: {e}")
+        sys.exit(1)
+
+    loader.print_summary()
+    print(f"\n✅ Load completed successfully!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Check characters for serial codes: Luhn mod N over the base-36 alphabet
+(0-9A-Z). The last character of a checked code is computed from the rest,
+so single-character typos and most adjacent swaps are rejected locally,
+before any registry lookup. Truncated codes such as EAVO5 for EAVO53 pass
+only by chance (1 in 36).
+"""
+
+import argparse
+import csv
+import string
+import sys
+from collections import defaultdict
+
+from serial_registry import normalize_serial_code, read_serial_code_rows
+
+CHECK_ALPHABET = string.digits + string.ascii_uppercase
+CHECK_BASE = len(CHECK_ALPHABET)
+CHECK_ALPHABET_BYTES = CHECK_ALPHABET.encode('ascii')
+
+CODE_POINTS = {char: i for i, char in enumerate(CHECK_ALPHABET)}
+
+def _doubled(code_point):
+    """Luhn mod N addend for a doubled position: digits of 2 * cp in base N, summed"""
+    return (2 * code_point) // CHECK_BASE + (2 * code_point) % CHECK_BASE
+
+# bytes.translate tables from a character to its addend at a plain or a
+# doubled position, so whole columns of codes are converted in one call
+PLAIN_TABLE = bytes(CODE_POINTS.get(chr(byte), 0) for byte in range(256))
+DOUBLED_TABLE = bytes(_doubled(CODE_POINTS.get(chr(byte), 0)) for byte in range(256))
+
+REPORT_HEADER = ['SerialCode', 'File', 'Row', 'SuggestedCode']
+
+def check_char(payload):
+    """Check character for a payload (the code without its check character)"""
+    payload = normalize_serial_code(payload)
+    total = 0
+    doubled = True
+    for char in reversed(payload):
+        code_point = CODE_POINTS.get(char)
+        if code_point is None:
+            raise ValueError(f"Cannot add a check character to {payload}: only 0-9 and A-Z are allowed")
+        total += _doubled(code_point) if doubled else code_point
+        doubled = not doubled
+    return CHECK_ALPHABET[-total % CHECK_BASE]
+
+def append_check_char(payload):
+    return normalize_serial_code(payload) + check_char(payload)
+
+def has_valid_check_char(serial_code):
+    """True if the last character of the code is the check character of the rest"""
+    serial_code = normalize_serial_code(serial_code)
+    if len(serial_code) < 2:
+        return False
+    try:
+        return check_char(serial_code[:-1]) == serial_code[-1]
+    except ValueError:
+        return False
+
+def _column_sums(data, length, doubled_first):
+    """Luhn sums for equal-length codes packed back to back in data
+
+    Each character position is one strided slice of the buffer, mapped to
+    its addends with a single translate; the per-code sum is then one
+    zip over the columns instead of a Python loop per character.
+    """
+    columns = []
+    for position in range(length):
+        doubled = (length - 1 - position) % 2 == (0 if doubled_first else 1)
+        columns.append(data[position::length].translate(DOUBLED_TABLE if doubled else PLAIN_TABLE))
+    return map(sum, zip(*columns))
+
+def _grouped_by_length(serial_codes):
+    """Normalized codes grouped by length: {length: (indexes, packed ASCII bytes)}
+
+    Codes with characters outside the check alphabet are left out.
+    """
+    lengths = set(map(len, serial_codes))
+    if len(lengths) == 1:
+        # Usual case: one code format, so no per-code grouping is needed
+        groups = {lengths.pop(): range(len(serial_codes))}
+    else:
+        groups = defaultdict(list)
+        for index, serial_code in enumerate(serial_codes):
+            groups[len(serial_code)].append(index)
+
+    packed = {}
+    for length, indexes in groups.items():
+        codes = serial_codes if len(groups) == 1 else [serial_codes[i] for i in indexes]
+        data = ''.join(codes).encode('ascii', 'replace')
+        if data.translate(None, CHECK_ALPHABET_BYTES):
+            # Some codes have other characters: drop just those
+            allowed = set(CHECK_ALPHABET)
+            kept = [(i, code) for i, code in zip(indexes, codes) if set(code) <= allowed]
+            indexes = [i for i, _ in kept]
+            data = ''.join(code for _, code in kept).encode('ascii')
+        if indexes:
+            packed[length] = (indexes, data)
+    return packed
+
+def verify_many(serial_codes):
+    """has_valid_check_char() for a whole list of codes, returning a list of booleans"""
+    serial_codes = list(map(normalize_serial_code, serial_codes))
+    results = [False] * len(serial_codes)
+    for length, (indexes, data) in _grouped_by_length(serial_codes).items():
+        if length < 2:
+            continue
+        for index, total in zip(indexes, _column_sums(data, length, doubled_first=False)):
+            results[index] = total % CHECK_BASE == 0
+    return results
+
+def check_chars_many(payloads):
+    """check_char() for a list of payloads; raises ValueError on characters outside 0-9A-Z"""
+    payloads = [normalize_serial_code(payload) for payload in payloads]
+    results = [None] * len(payloads)
+    for length, (indexes, data) in _grouped_by_length(payloads).items():
+        for index, total in zip(indexes, _column_sums(data, length, doubled_first=True)):
+            results[index] = CHECK_ALPHABET[-total % CHECK_BASE]
+    if None in results:
+        payload = payloads[results.index(None)]
+        raise ValueError(f"Cannot add a check character to {payload}: only 0-9 and A-Z are allowed")
+    return results
+
+def append_check_chars(payloads):
+    """append_check_char() for a list of payloads"""
+    return [normalize_serial_code(payload) + char
+            for payload, char in zip(payloads, check_chars_many(payloads))]
+
+def migrate(paths, report_writer=None):
+    """Report codes in the given CSVs that lack a valid check character
+
+    Writes one report row per such code with the code it would become with
+    a check character appended (blank if it has characters outside 0-9A-Z).
+    Returns (codes scanned, codes lacking a check character).
+    """
+    scanned = 0
+    missing = 0
+    for path in paths:
+        rows = list(read_serial_code_rows(path))
+        codes = [serial_code for _, serial_code in rows]
+        scanned += len(codes)
+        for (row_num, serial_code), valid in zip(rows, verify_many(codes)):
+            if valid:
+                continue
+            missing += 1
+            if report_writer is not None:
+                try:
+                    suggested = append_check_char(serial_code)
+                except ValueError:
+                    suggested = ''
+                report_writer.writerow([serial_code, path, row_num, suggested])
+    return scanned, missing
+
+def main():
+    parser = argparse.ArgumentParser(description='Add and verify serial code check characters (Luhn mod 36)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    add_parser = subparsers.add_parser('add', help='Print codes with their check character appended')
+    add_parser.add_argument('codes', nargs='+', help='Codes without a check character')
+
+    verify_parser = subparsers.add_parser('verify', help='Verify the check character of codes')
+    verify_parser.add_argument('codes', nargs='+', help='Codes to verify')
+
+    migrate_parser = subparsers.add_parser('migrate', help='Report legacy codes that lack a valid check character')
+    migrate_parser.add_argument('files', nargs='+', help='CSV files with serial codes in the first column')
+    migrate_parser.add_argument('-o', '--output', help='Write the report to this CSV (default: stdout)')
+
+    args = parser.parse_args()
+
+    if args.command == 'add':
+        for serial_code in args.codes:
+            try:
+                print(f"  {serial_code}: {append_check_char(serial_code)}")
+            except ValueError as e:
+                print(f"  {serial_code}: {e}")
+        return
+
+    if args.command == 'verify':
+        results = verify_many(args.codes)
+        for serial_code, valid in zip(args.codes, results):
+            print(f"  {serial_code}: {'valid' if valid else 'INVALID check character'}")
+        sys.exit(0 if all(results) else 1)
+
+    output = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        writer = csv.writer(output)
+        writer.writerow(REPORT_HEADER)
+        scanned, missing = migrate(args.files, writer)
+    finally:
+        if args.output:
+            output.close()
+
+    # Summary goes to stderr so the report can be piped
+    summary = sys.stderr
+    print("=" * 60, file=summary)
+    print("CHECK CHARACTER MIGRATION", file=summary)
+    print("=" * 60, file=summary)
+    print(f"Files scanned: {len(args.files)}", file=summary)
+    print(f"Codes scanned: {scanned}", file=summary)
+    print(f"Codes without a valid check character: {missing}", file=summary)
+    if args.output:
+        print(f"Report saved to: {args.output}", file=summary)
+
+    sys.exit(1 if missing else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,687 @@
+#!/usr/bin/env python3
+"""
+Reachability checker for generated links. Reads any SerialCode,DynamicLink
+file (CSV, JSON Lines or columnar) and requests every link with bounded
+concurrency over pooled keep-alive connections, with a per-host connection
+cap and request rate, timeouts and retries with backoff. Writes a status
+report CSV and prints throughput (links/s, requests/s) and latency
+percentiles.
+
+A malformed template such as https://{serial_code}/e3world.co.uk shows up
+as one DNS failure per code instead of shipping unnoticed.
+
+The stub subcommand runs an offline stand-in for the profile site, and
+--connect-to (or --stub) sends requests for chosen hosts to it, so a check
+can be exercised without network access.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import random
+import signal
+import socket
+import ssl
+import sys
+import time
+from array import array
+from collections import OrderedDict, namedtuple
+from itertools import chain, islice
+from urllib.parse import unquote, urlsplit
+
+import csv_ingest
+from batch_metrics import DEFAULT_INTERVAL, PROGRESS_MODES, BatchMetrics, progress_sinks
+from link_writers import iter_link_rows
+from url_templates import compile_template
+
+DEFAULT_REPORT_FILE = 'link_check_report.csv'
+DEFAULT_CONCURRENCY = 64
+DEFAULT_PER_HOST = 8
+DEFAULT_RATE = 20.0
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+
+STUB_HOST = '127.0.0.1'
+STUB_PORT = 8788
+STUB_PROFILE_PREFIX = '/api/profiles/serial/'
+
+# Longest Retry-After honoured, and bodies larger than this close the
+# connection instead of being read to keep it alive
+MAX_RETRY_AFTER = 30.0
+MAX_DRAIN_BYTES = 1024 * 1024
+
+# Host limiters kept before idle ones are dropped
+MAX_TRACKED_HOSTS = 10_000
+
+USER_AGENT = 'e3-link-checker/1.0'
+
+REPORT_HEADER = ['SerialCode', 'DynamicLink', 'Result', 'HTTPStatus', 'Attempts', 'LatencyMs', 'Detail']
+
+OK = 'ok'
+HTTP_ERROR = 'http_error'
+NO_PROFILE = 'no_profile'
+TIMEOUT = 'timeout'
+CONNECT_ERROR = 'connect_error'
+INVALID_URL = 'invalid_url'
+RESULTS = [OK, HTTP_ERROR, NO_PROFILE, TIMEOUT, CONNECT_ERROR, INVALID_URL]
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+STATUS_TEXT = {
+    200: 'OK',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    503: 'Service Unavailable',
+}
+
+Link = namedtuple('Link', 'scheme host port target host_header')
+
+CheckResult = namedtuple('CheckResult', 'result status attempts latency detail')
+
+def parse_link(link):
+    """Split an http(s) link into a Link; raises ValueError if it is not one"""
+    parts = urlsplit(link.strip())
+    if parts.scheme not in ('http', 'https'):
+        raise ValueError(f"Not an http(s) link: {link!r}")
+    if not parts.hostname:
+        raise ValueError(f"No host in link: {link!r}")
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+    return Link(parts.scheme, parts.hostname, port, target, parts.netloc.rpartition('@')[2])
+
+def parse_connect_to(value):
+    """Parse HOST=ADDRESS:PORT (HOST may be *) into (host, (address, port))"""
+    host, sep, address = value.partition('=')
+    address, _, port = address.rpartition(':')
+    if not sep or not host or not address or not port.isdigit():
+        raise ValueError(f"Expected HOST=ADDRESS:PORT, got: {value}")
+    return host.lower(), (address, int(port))
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+class Connection:
+    def __init__(self, key, reader, writer):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+
+    def close(self):
+        self.writer.close()
+
+class ConnectionPool:
+    """Idle keep-alive connections per (scheme, host, port), at most max_idle in total
+
+    Hosts listed in connect_to (or '*') are dialled at the given address
+    over plain HTTP, keeping the original Host header, like curl --connect-to.
+    """
+
+    def __init__(self, max_idle, connect_to=None, ssl_context=None):
+        self.max_idle = max_idle
+        self.connect_to = dict(connect_to or {})
+        self.ssl_context = ssl_context
+        self.idle = OrderedDict()
+        self.idle_count = 0
+        self.opened_count = 0
+        self.reused_count = 0
+
+    def route(self, host):
+        return self.connect_to.get(host.lower()) or self.connect_to.get('*')
+
+    async def acquire(self, link):
+        key = (link.scheme, link.host, link.port)
+        connections = self.idle.get(key)
+        while connections:
+            connection = connections.pop()
+            self.idle_count -= 1
+            if not connections:
+                del self.idle[key]
+            # The server may have closed it while it sat idle
+            if connection.reader.at_eof():
+                connection.close()
+                continue
+            connection.reused = True
+            self.reused_count += 1
+            return connection
+
+        address = self.route(link.host)
+        if address is not None:
+            reader, writer = await asyncio.open_connection(*address)
+        else:
+            reader, writer = await asyncio.open_connection(
+                link.host, link.port, ssl=self.ssl_context if link.scheme == 'https' else None)
+        self.opened_count += 1
+        return Connection(key, reader, writer)
+
+    def release(self, connection):
+        self.idle.setdefault(connection.key, []).append(connection)
+        self.idle.move_to_end(connection.key)
+        self.idle_count += 1
+        while self.idle_count > self.max_idle:
+            key, oldest = next(iter(self.idle.items()))
+            oldest.pop(0).close()
+            self.idle_count -= 1
+            if not oldest:
+                del self.idle[key]
+
+    def close(self):
+        for connections in self.idle.values():
+            for connection in connections:
+                connection.close()
+        self.idle.clear()
+        self.idle_count = 0
+
+class HostLimiter:
+    """Connection cap and request spacing for one host"""
+
+    def __init__(self, connections, rate):
+        self.slots = asyncio.Semaphore(connections)
+        self.interval = 1 / rate if rate else 0.0
+        self.next_slot = 0.0
+        self.active = 0
+
+    async def wait_turn(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class LinkChecker:
+    """Checks links with a shared connection pool and per-host limits"""
+
+    def __init__(self, method='HEAD', concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST,
+                 rate=DEFAULT_RATE, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 connect_to=None, verify_tls=True, profile_api=None, report_writer=None,
+                 failures_only=False, metrics=None):
+        self.method = method
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.rate = rate
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.profile_api = compile_template(profile_api) if profile_api else None
+        self.report_writer = report_writer
+        self.failures_only = failures_only
+        self.metrics = metrics if metrics is not None else BatchMetrics()
+
+        ssl_context = ssl.create_default_context()
+        if not verify_tls:
+            ssl_context.check_hostname = False
+            ssl_context.verify_mode = ssl.CERT_NONE
+        self.pool = ConnectionPool(concurrency, connect_to, ssl_context)
+        self.hosts = {}
+
+        self.read_count = 0
+        self.checked_count = 0
+        self.request_count = 0
+        self.counts = dict.fromkeys(RESULTS, 0)
+        self.latencies = array('d')
+
+    def host_limiter(self, host):
+        limiter = self.hosts.get(host)
+        if limiter is None:
+            if len(self.hosts) >= MAX_TRACKED_HOSTS:
+                now = time.monotonic()
+                for name in [name for name, idle in self.hosts.items()
+                             if not idle.active and idle.next_slot <= now]:
+                    del self.hosts[name]
+            limiter = self.hosts[host] = HostLimiter(self.per_host, self.rate)
+        return limiter
+
+    async def exchange(self, method, link):
+        """One request and response on a pooled connection; returns (status, reason, headers)"""
+        connection = await self.pool.acquire(link)
+        try:
+            try:
+                response = await self.send(connection, method, link)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if not connection.reused:
+                    raise
+                # A kept-alive connection went stale; retry once on a fresh one
+                connection.close()
+                connection = await self.pool.acquire(link)
+                response = await self.send(connection, method, link)
+        except BaseException:
+            connection.close()
+            raise
+
+        status, reason, headers, keep_alive = response
+        if keep_alive:
+            self.pool.release(connection)
+        else:
+            connection.close()
+        return status, reason, headers
+
+    async def send(self, connection, method, link):
+        reader, writer = connection.reader, connection.writer
+        writer.write((f"{method} {link.target} HTTP/1.1\r\nHost: {link.host_header}\r\n"
+                      f"User-Agent: {USER_AGENT}\r\nAccept: */*\r\n\r\n").encode('latin-1'))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed before a response")
+        parts = status_line.decode('latin-1').split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith('HTTP/') or not parts[1].isdigit():
+            raise ValueError(f"Malformed status line: {status_line[:80]!r}")
+        version, status = parts[0], int(parts[1])
+        reason = parts[2].strip() if len(parts) > 2 else ''
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n'):
+                break
+            if not line:
+                raise asyncio.IncompleteReadError(b'', None)
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        connection_header = headers.get('connection', '').lower()
+        keep_alive = connection_header != 'close' if version == 'HTTP/1.1' else connection_header == 'keep-alive'
+
+        # The body is read and dropped so the connection can be reused
+        if method == 'HEAD' or status in (204, 304) or status < 200:
+            pass
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            drained = 0
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                drained += size
+                if size == 0 or drained > MAX_DRAIN_BYTES:
+                    break
+                await reader.readexactly(size + 2)
+            if size == 0:
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+            else:
+                keep_alive = False
+        elif 'content-length' in headers:
+            length = int(headers['content-length'])
+            if length > MAX_DRAIN_BYTES:
+                keep_alive = False
+            else:
+                await reader.readexactly(length)
+        else:
+            # Body runs to the end of the connection
+            keep_alive = False
+        return status, reason, headers, keep_alive
+
+    async def attempt(self, method, link):
+        """One rate-limited, timed exchange with a host"""
+        limiter = self.host_limiter(link.host)
+        limiter.active += 1
+        try:
+            async with limiter.slots:
+                await limiter.wait_turn()
+                self.request_count += 1
+                start = time.perf_counter()
+                status, reason, headers = await asyncio.wait_for(self.exchange(method, link), self.timeout)
+                latency = time.perf_counter() - start
+                self.latencies.append(latency)
+                return status, reason, headers, latency
+        finally:
+            limiter.active -= 1
+
+    async def request(self, link):
+        """Request a link with retries; returns a CheckResult"""
+        method = self.method
+        attempts = 0
+        status = None
+        latency = None
+        while True:
+            attempts += 1
+            retry_after = None
+            try:
+                status, reason, headers, latency = await self.attempt(method, link)
+            except asyncio.TimeoutError:
+                result, detail = TIMEOUT, f"No response within {self.timeout:g}s"
+            except socket.gaierror as e:
+                # A host that does not resolve will not resolve on a retry either
+                return CheckResult(CONNECT_ERROR, None, attempts, None, f"DNS lookup failed for {link.host}: {e.strerror or e}")
+            except ssl.SSLError as e:
+                return CheckResult(CONNECT_ERROR, None, attempts, None, f"TLS error: {e.reason or e}")
+            except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+                result, detail = CONNECT_ERROR, str(e) or type(e).__name__
+            else:
+                if method == 'HEAD' and status in (405, 501):
+                    # Some servers only answer GET; this does not count as an attempt
+                    method = 'GET'
+                    attempts -= 1
+                    continue
+                if status < 400:
+                    location = headers.get('location')
+                    return CheckResult(OK, status, attempts, latency, f"-> {location}" if location else '')
+                result, detail = HTTP_ERROR, f"{status} {reason}".strip()
+                if status not in RETRY_STATUSES:
+                    return CheckResult(result, status, attempts, latency, detail)
+                value = headers.get('retry-after', '')
+                if value.isdigit():
+                    retry_after = min(float(value), MAX_RETRY_AFTER)
+
+            if attempts > self.retries:
+                return CheckResult(result, status, attempts, latency, detail)
+            await asyncio.sleep(retry_after if retry_after is not None else self.backoff * 2 ** (attempts - 1))
+
+    async def check(self, serial_code, dynamic_link):
+        try:
+            link = parse_link(dynamic_link)
+        except ValueError as e:
+            return CheckResult(INVALID_URL, None, 0, None, str(e))
+
+        checked = await self.request(link)
+        if checked.result != OK or self.profile_api is None:
+            return checked
+
+        profile = await self.request(parse_link(self.profile_api.render(serial_code.strip())))
+        attempts = checked.attempts + profile.attempts
+        if profile.status == 404:
+            return CheckResult(NO_PROFILE, checked.status, attempts, checked.latency,
+                               f"No profile for {serial_code.strip()}")
+        if profile.result != OK:
+            return profile._replace(attempts=attempts, detail=f"Profile API: {profile.detail}")
+        return checked._replace(attempts=attempts)
+
+    async def worker(self, queue):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            serial_code, dynamic_link = item
+            checked = await self.check(serial_code, dynamic_link)
+            self.checked_count += 1
+            self.counts[checked.result] += 1
+            if self.report_writer is not None and not (self.failures_only and checked.result == OK):
+                latency = f"{checked.latency * 1000:.1f}" if checked.latency is not None else ''
+                self.report_writer.writerow([serial_code, dynamic_link, checked.result, checked.status or '',
+                                             checked.attempts, latency, checked.detail])
+            self.report_progress()
+
+    async def feed(self, rows, queue):
+        for serial_code, dynamic_link in rows:
+            self.read_count += 1
+            await queue.put((serial_code, dynamic_link))
+        for _ in range(self.concurrency):
+            await queue.put(None)
+
+    async def run(self, rows):
+        """Check every (serial_code, dynamic_link) row; returns the number of failed links"""
+        queue = asyncio.Queue(self.concurrency * 2)
+        tasks = [asyncio.create_task(self.feed(rows, queue))]
+        tasks += [asyncio.create_task(self.worker(queue)) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.pool.close()
+            self.report_progress()
+            self.metrics.close()
+        return self.checked_count - self.counts[OK]
+
+    def report_progress(self):
+        self.metrics.update(read=self.read_count, processed=self.checked_count,
+                            errors=self.checked_count - self.counts[OK])
+        self.metrics.maybe_emit()
+
+class StubProfileServer:
+    """Offline stand-in for the profile site
+
+    Answers every path with a small HTML page, as the single-page app does,
+    except STUB_PROFILE_PREFIX<code>, which is 200 with a JSON profile when
+    the code is known (every code when no profiles are given) and 404
+    otherwise. Optional latency and a share of 503 answers exercise
+    timeouts and retries.
+    """
+
+    def __init__(self, profiles=None, latency=0.0, error_rate=0.0, seed=None):
+        self.profiles = profiles
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.request_count = 0
+        self.connections = set()
+
+    def respond(self, target):
+        path = unquote(target.partition('?')[0])
+        if self.error_rate and self.random.random() < self.error_rate:
+            return 503, 'application/json', b'{"message": "Try again"}', {'Retry-After': '0'}
+        if path.startswith(STUB_PROFILE_PREFIX):
+            serial_code = path[len(STUB_PROFILE_PREFIX):]
+            if self.profiles is not None and serial_code not in self.profiles:
+                return 404, 'application/json', b'{"message": "Profile not found for this serial code"}', {}
+            return 200, 'application/json', json.dumps({'serialCode': serial_code}).encode('utf-8'), {}
+        return 200, 'text/html', b'<!DOCTYPE html><html><body><div id="root"></div></body></html>', {}
+
+    async def handle_connection(self, reader, writer):
+        """Serve keep-alive HTTP/1.1 requests on one connection"""
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    break
+                method, target, version = parts
+
+                request_headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    request_headers[name.strip().lower()] = value.strip()
+                length = int(request_headers.get('content-length', 0))
+                if length:
+                    await reader.readexactly(length)
+
+                self.request_count += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                if method.upper() in ('GET', 'HEAD'):
+                    status, content_type, body, headers = self.respond(target)
+                else:
+                    status, content_type, body, headers = 405, 'application/json', b'{}', {'Allow': 'GET, HEAD'}
+
+                connection = request_headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+                lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                         f"Content-Type: {content_type}",
+                         f"Content-Length: {len(body)}",
+                         f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                lines += [f"{name}: {value}" for name, value in headers.items()]
+                writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+                             + (body if method.upper() != 'HEAD' else b''))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            self.connections.discard(task)
+
+    async def wait_closed(self):
+        """Wait for connections the clients have closed to finish"""
+        if self.connections:
+            await asyncio.wait(self.connections)
+
+async def run_check(checker, rows, stub=None):
+    """Run a check, first starting the in-process stub server when one is given"""
+    if stub is None:
+        return await checker.run(rows)
+    server = await asyncio.start_server(stub.handle_connection, STUB_HOST, 0)
+    checker.pool.connect_to['*'] = server.sockets[0].getsockname()[:2]
+    async with server:
+        failures = await checker.run(rows)
+        await stub.wait_closed()
+    return failures
+
+async def serve_stub(stub, host, port):
+    server = await asyncio.start_server(stub.handle_connection, host, port)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    print(f"✅ Stub profile server listening on http://{host}:{port}")
+    async with server:
+        await stop.wait()
+        print("\nShutting down...")
+
+def load_profiles(path):
+    return {serial_code.strip() for serial_code, _ in csv_ingest.read_serial_codes(path) if serial_code.strip()}
+
+def print_summary(checker, files, elapsed, report_file):
+    print("\n" + "=" * 60)
+    print("LINK CHECK SUMMARY")
+    print("=" * 60)
+    print(f"Input files: {', '.join(files)}")
+    print(f"Links checked: {checker.checked_count}")
+    print(f"Reachable: {checker.counts[OK]}")
+    print(f"HTTP errors: {checker.counts[HTTP_ERROR]}")
+    if checker.profile_api is not None:
+        print(f"No profile: {checker.counts[NO_PROFILE]}")
+    print(f"Timeouts: {checker.counts[TIMEOUT]}")
+    print(f"Connection errors: {checker.counts[CONNECT_ERROR]}")
+    print(f"Invalid URLs: {checker.counts[INVALID_URL]}")
+    print(f"Requests: {checker.request_count} "
+          f"({checker.pool.opened_count} connections opened, {checker.pool.reused_count} reuses)")
+    if elapsed > 0:
+        print(f"Elapsed: {elapsed:.2f}s ({checker.checked_count / elapsed:,.0f} links/s, "
+              f"{checker.request_count / elapsed:,.0f} requests/s)")
+    if checker.latencies:
+        latencies = sorted(checker.latencies)
+        print(f"Latency: p50 {percentile(latencies, 0.50) * 1000:.2f} ms, "
+              f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+    if report_file:
+        print(f"Report saved to: {report_file}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that generated dynamic links are reachable')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    check_parser = subparsers.add_parser('check', help='Request every link of SerialCode,DynamicLink files')
+    check_parser.add_argument('files', nargs='+', help='Link files: generator output (CSV, JSONL or columnar)')
+    check_parser.add_argument('-o', '--output', default=DEFAULT_REPORT_FILE,
+                              help=f'Status report CSV (default: {DEFAULT_REPORT_FILE})')
+    check_parser.add_argument('--failures-only', action='store_true', help='Only write links that failed to the report')
+    check_parser.add_argument('-m', '--method', choices=['HEAD', 'GET'], default='HEAD',
+                              help='HTTP method; HEAD falls back to GET when a server refuses it (default: HEAD)')
+    check_parser.add_argument('-c', '--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                              help=f'Links checked at once (default: {DEFAULT_CONCURRENCY})')
+    check_parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST,
+                              help=f'Connections per host (default: {DEFAULT_PER_HOST})')
+    check_parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                              help=f'Requests per second per host, 0 for no limit (default: {DEFAULT_RATE:g})')
+    check_parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                              help=f'Seconds allowed per request, connecting included (default: {DEFAULT_TIMEOUT:g})')
+    check_parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                              help=f'Retries after timeouts, connection errors, 429 and 5xx (default: {DEFAULT_RETRIES})')
+    check_parser.add_argument('--backoff', type=float, default=DEFAULT_BACKOFF,
+                              help=f'Seconds before the first retry, doubled each time (default: {DEFAULT_BACKOFF:g})')
+    check_parser.add_argument('--profile-api', metavar='TEMPLATE',
+                              help='Also require a profile at this URL template, e.g. '
+                                   f'https://e3world.co.uk{STUB_PROFILE_PREFIX}{{serial_code}}')
+    check_parser.add_argument('-n', '--limit', type=int, help='Check only the first N links')
+    check_parser.add_argument('--connect-to', action='append', default=[], metavar='HOST=ADDRESS:PORT',
+                              help='Send requests for HOST (or * for every host) to ADDRESS:PORT over plain HTTP (repeatable)')
+    check_parser.add_argument('--stub', action='store_true',
+                              help='Answer every request from an in-process stub server (offline test run)')
+    check_parser.add_argument('--insecure', action='store_true', help='Do not verify TLS certificates')
+    check_parser.add_argument('--progress', choices=PROGRESS_MODES, default='auto',
+                              help='Progress output: bar on a terminal, plain lines otherwise (default: auto)')
+    check_parser.add_argument('--progress-interval', type=float, default=DEFAULT_INTERVAL,
+                              help=f'Seconds between progress updates (default: {DEFAULT_INTERVAL})')
+
+    stub_parser = subparsers.add_parser('stub', help='Run the offline stub profile server')
+    stub_parser.add_argument('--host', default=STUB_HOST, help=f'Address to listen on (default: {STUB_HOST})')
+    stub_parser.add_argument('--port', type=int, default=STUB_PORT, help=f'Port to listen on (default: {STUB_PORT})')
+    for stub_options in (stub_parser, check_parser):
+        stub_options.add_argument('--stub-profiles', metavar='CSV',
+                                  help='Serial codes that have a profile on the stub (default: every code)')
+        stub_options.add_argument('--stub-latency-ms', type=float, default=0.0,
+                                  help='Delay before each stub response, in ms (default: 0)')
+        stub_options.add_argument('--stub-error-rate', type=float, default=0.0,
+                                  help='Share of stub responses that are 503, from 0 to 1 (default: 0)')
+
+    args = parser.parse_args()
+
+    if not 0 <= args.stub_error_rate <= 1 or args.stub_latency_ms < 0:
+        print("--stub-error-rate must be between 0 and 1 and --stub-latency-ms at least 0")
+        sys.exit(2)
+    try:
+        profiles = load_profiles(args.stub_profiles) if args.stub_profiles else None
+    except OSError as e:
+        print(f"❌ Could not read stub profiles: {e}")
+        sys.exit(2)
+    stub = StubProfileServer(profiles, args.stub_latency_ms / 1000, args.stub_error_rate)
+
+    if args.command == 'stub':
+        try:
+            asyncio.run(serve_stub(stub, args.host, args.port))
+        except OSError as e:
+            print(f"❌ Could not start the stub server: {e}")
+            sys.exit(1)
+        print(f"Served {stub.request_count} requests")
+        return
+
+    if min(args.concurrency, args.per_host) < 1 or args.timeout <= 0 or args.retries < 0 \
+            or args.rate < 0 or args.backoff < 0 or (args.limit is not None and args.limit < 0):
+        print("--concurrency and --per-host must be at least 1, --timeout above 0, "
+              "and --retries, --rate, --backoff and --limit not negative")
+        sys.exit(2)
+    try:
+        connect_to = dict(parse_connect_to(value) for value in args.connect_to)
+        if args.profile_api:
+            compile_template(args.profile_api)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+    rows = chain.from_iterable(iter_link_rows(path) for path in args.files)
+    if args.limit is not None:
+        rows = islice(rows, args.limit)
+
+    print("NFT Link Reachability Check")
+    print("=" * 60)
+    print(f"Concurrency: {args.concurrency} ({args.per_host} connections per host, "
+          f"{f'{args.rate:g} requests/s per host' if args.rate else 'no rate limit'})")
+    if args.stub:
+        print("Target: in-process stub server")
+    for host, (address, port) in connect_to.items():
+        print(f"Connect to: {host} -> {address}:{port}")
+    print()
+
+    with open(args.output, 'w', newline='', encoding='utf-8') as report:
+        writer = csv.writer(report)
+        writer.writerow(REPORT_HEADER)
+        metrics = BatchMetrics(progress_sinks(args.progress), interval=args.progress_interval, name='check_links')
+        checker = LinkChecker(args.method, args.concurrency, args.per_host, args.rate, args.timeout, args.retries,
+                              args.backoff, connect_to, not args.insecure, args.profile_api, writer,
+                              args.failures_only, metrics)
+        start = time.perf_counter()
+        try:
+            failures = asyncio.run(run_check(checker, rows, stub if args.stub else None))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ Link check failed: {e}")
+            sys.exit(2)
+        elapsed = time.perf_counter() - start
+
+    print_summary(checker, args.files, elapsed, args.output)
+    if failures:
+        print(f"\n❌ {failures} links failed the check - see {args.output}")
+        sys.exit(1)
+    print(f"\n✅ All {checker.checked_count} links reachable")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Fast ingestion of serial code CSV files.
+Serial code files are almost always a single short column, one code per
+line. Those are memory-mapped and split on newlines directly; the csv module
+is only used when the file actually contains quoting.
+"""
+
+import csv
+import io
+import mmap
+import os
+from collections import namedtuple
+from itertools import chain, islice
+
+# First-row terms that mark a header rather than a serial code
+HEADER_TERMS = ['serial', 'code', 'id', 'tag', 'number']
+
+# Delimiters considered for multi-column files, in order of preference.
+# Restricting the choice stops csv.Sniffer from picking letters or digits
+# that appear in every code (e.g. '3' in EAVO53), which truncated codes.
+CANDIDATE_DELIMITERS = ',\t;|'
+
+SAMPLE_SIZE = 64 * 1024
+CHUNK_SIZE = 1024 * 1024
+CHUNK_ROWS = 65536
+
+InputFormat = namedtuple('InputFormat', ['delimiter', 'quoted'])
+
+def is_header(value):
+    """Check whether a first-column value looks like a header rather than a serial code"""
+    return any(term in str(value).lower() for term in HEADER_TERMS)
+
+def is_link_output(path):
+    """Check whether a CSV file is generator output (a ...,DynamicLink header) rather than serial codes"""
+    with open(path, 'rb') as f:
+        first_line = f.readline(SAMPLE_SIZE)
+    return b'DynamicLink' in first_line
+
+def _open_map(path):
+    """Memory-map a file for reading; empty files map to an empty bytes object"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def detect_format(path):
+    """Work out the delimiter and whether quoting is present
+
+    The quote check is a single find over the mapped file, so a quote
+    anywhere in the file routes it to the csv module.
+    """
+    buf = _open_map(path)
+    try:
+        quoted = buf.find(b'"') != -1
+        sample = bytes(buf[:SAMPLE_SIZE])
+    finally:
+        if isinstance(buf, mmap.mmap):
+            buf.close()
+
+    first_line = sample.split(b'\n', 1)[0]
+    delimiter = ','
+    for candidate in CANDIDATE_DELIMITERS:
+        if candidate.encode() in first_line:
+            delimiter = candidate
+            break
+    else:
+        for candidate in CANDIDATE_DELIMITERS:
+            if candidate.encode() in sample:
+                delimiter = candidate
+                break
+
+    return InputFormat(delimiter, quoted)
+
+def estimate_row_count(path):
+    """Rough row count from the file size and the average line length of the first 64 KB"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return 0
+    with open(path, 'rb') as f:
+        sample = f.read(SAMPLE_SIZE)
+    lines = sample.count(b'\n')
+    if len(sample) == size:
+        return lines + (0 if sample.endswith(b'\n') else 1)
+    return max(int(size * lines / len(sample)), 1) if lines else 1
+
+def iter_buffer_chunks(buf, start, end, delimiter):
+    """Yield lists of stripped first fields for the lines in buf[start:end]
+
+    Fast path for unquoted data: each ~1 MB chunk is decoded once and split
+    on newlines, and only split on the delimiter when the chunk contains
+    one. Blank lines give '' so row numbers match csv.reader.
+    """
+    pos = start
+    while pos < end:
+        chunk_end = min(pos + CHUNK_SIZE, end)
+        if chunk_end < end:
+            newline = buf.find(b'\n', chunk_end, end)
+            chunk_end = end if newline == -1 else newline + 1
+
+        text = bytes(buf[pos:chunk_end]).decode('utf-8')
+        lines = text.split('\n')
+        if lines[-1] == '':
+            lines.pop()
+        if delimiter in text:
+            yield [line.split(delimiter, 1)[0].strip() for line in lines]
+        else:
+            yield [line.strip() for line in lines]
+
+        pos = chunk_end
+
+def iter_buffer_first_column(buf, start, end, delimiter):
+    """Yield the stripped first field of every line in buf[start:end]"""
+    for values in iter_buffer_chunks(buf, start, end, delimiter):
+        yield from values
+
+def iter_text_first_column(text, delimiter):
+    """Yield the stripped first field of every row using the csv module"""
+    for row in csv.reader(io.StringIO(text, newline=''), delimiter=delimiter):
+        yield row[0].strip() if row else ''
+
+def iter_chunks(path, input_format=None):
+    """Yield lists of stripped first fields, one list per chunk of the file"""
+    input_format = input_format or detect_format(path)
+
+    if input_format.quoted:
+        with open(path, 'r', newline='', encoding='utf-8') as csvfile:
+            reader = csv.reader(csvfile, delimiter=input_format.delimiter)
+            while True:
+                values = [row[0].strip() if row else '' for row in islice(reader, CHUNK_ROWS)]
+                if not values:
+                    break
+                yield values
+        return
+
+    buf = _open_map(path)
+    try:
+        yield from iter_buffer_chunks(buf, 0, len(buf), input_format.delimiter)
+    finally:
+        if isinstance(buf, mmap.mmap):
+            buf.close()
+
+def iter_first_column(path, input_format=None):
+    """Yield the stripped first field of every row of a CSV file"""
+    for values in iter_chunks(path, input_format):
+        yield from values
+
+def read_serial_codes(path, on_header=None, input_format=None):
+    """Yield (serial_code, row_number) for every non-empty first column
+
+    The first row is treated as a header when it matches HEADER_TERMS and
+    more rows follow it; on_header is called with its value. Raises
+    ValueError if the file has no rows at all.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Input file not found: {path}")
+
+    chunks = iter_chunks(path, input_format)
+    first_chunk = next(chunks, None)
+    if not first_chunk:
+        raise ValueError("Input file is empty")
+
+    # The header check needs to know whether a second row exists
+    if len(first_chunk) == 1:
+        second_chunk = next(chunks, None)
+        if second_chunk:
+            first_chunk = first_chunk + second_chunk
+
+    row_num = 1
+    if len(first_chunk) > 1 and is_header(first_chunk[0]):
+        if on_header is not None:
+            on_header(first_chunk[0])
+        first_chunk = first_chunk[1:]
+        row_num = 2
+
+    for values in chain([first_chunk], chunks):
+        yield from [(value, i) for i, value in enumerate(values, row_num) if value]
+        row_num += len(values)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Detect duplicate and near-duplicate serial codes across any number of CSVs.
+Reports exact duplicates, case-fold collisions (EAVO53 vs eavo53) and
+prefix/truncation collisions (EAVO5 vs EAVO53), such as the truncated codes
+shipped in nft_dynamic_links.csv.
+"""
+
+import argparse
+import csv
+import sys
+
+from serial_registry import read_serial_code_rows
+
+REPORT_HEADER = ['Type', 'SerialCode', 'File', 'Row', 'OtherCode', 'OtherFile', 'OtherRow']
+
+EXACT_DUPLICATE = 'exact_duplicate'
+CASE_COLLISION = 'case_collision'
+PREFIX_COLLISION = 'prefix_collision'
+
+# Shorter codes are too generic to call a truncation of anything
+DEFAULT_MIN_PREFIX_LENGTH = 4
+
+# Locations are packed into one int per code: file index in the high bits
+ROW_BITS = 40
+
+class SerialDeduper:
+    """Single streaming pass over the inputs plus one sort for prefixes
+
+    Each code is hashed by its upper-cased key into a dict holding the
+    packed location of its first occurrence, so exact and case-fold
+    duplicates are found as the rows stream past. Prefix collisions come
+    from sorting the unique keys once: every key that extends another key
+    sorts directly after it, so no pairwise comparison is needed.
+    """
+
+    def __init__(self, report_writer=None, min_prefix_length=DEFAULT_MIN_PREFIX_LENGTH):
+        self.report_writer = report_writer
+        self.min_prefix_length = min_prefix_length
+        self.files = []
+        self.first_seen = {}
+        # First spelling of a key, kept only when it differs from the key itself
+        self.spellings = {}
+        self.row_count = 0
+        self.counts = {EXACT_DUPLICATE: 0, CASE_COLLISION: 0, PREFIX_COLLISION: 0}
+
+    def location(self, packed):
+        return self.files[packed >> ROW_BITS], packed & ((1 << ROW_BITS) - 1)
+
+    def spelling(self, key):
+        return self.spellings.get(key, key)
+
+    def report(self, kind, serial_code, packed, other_code, other_packed):
+        self.counts[kind] += 1
+        if self.report_writer is not None:
+            self.report_writer.writerow([kind, serial_code, *self.location(packed),
+                                         other_code, *self.location(other_packed)])
+
+    def add_file(self, path):
+        """Stream one CSV, reporting exact and case-fold duplicates as they appear"""
+        file_index = len(self.files)
+        self.files.append(path)
+        first_seen = self.first_seen
+
+        for row_num, serial_code in read_serial_code_rows(path):
+            self.row_count += 1
+            key = serial_code.upper()
+            packed = (file_index << ROW_BITS) | row_num
+
+            previous = first_seen.get(key)
+            if previous is None:
+                first_seen[key] = packed
+                if serial_code != key:
+                    self.spellings[key] = serial_code
+                continue
+
+            original = self.spelling(key)
+            kind = EXACT_DUPLICATE if serial_code == original else CASE_COLLISION
+            self.report(kind, serial_code, packed, original, previous)
+
+    def find_prefix_collisions(self):
+        """Report every key that is a strict prefix of another key"""
+        keys = sorted(self.first_seen)
+        first_seen = self.first_seen
+
+        for i, key in enumerate(keys):
+            if len(key) < self.min_prefix_length:
+                continue
+            j = i + 1
+            while j < len(keys) and keys[j].startswith(key):
+                self.report(PREFIX_COLLISION, self.spelling(key), first_seen[key],
+                            self.spelling(keys[j]), first_seen[keys[j]])
+                j += 1
+
+    def run(self, paths):
+        for path in paths:
+            self.add_file(path)
+        self.find_prefix_collisions()
+        return sum(self.counts.values())
+
+def main():
+    parser = argparse.ArgumentParser(description='Find duplicate and near-duplicate serial codes across CSV files')
+    parser.add_argument('files', nargs='+', help='CSV files with serial codes in the first column')
+    parser.add_argument('-o', '--output', help='Write the collision report to this CSV (default: stdout)')
+    parser.add_argument('--min-prefix', type=int, default=DEFAULT_MIN_PREFIX_LENGTH,
+                        help=f'Shortest code checked as a truncated prefix (default: {DEFAULT_MIN_PREFIX_LENGTH})')
+
+    args = parser.parse_args()
+
+    output = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        writer = csv.writer(output)
+        writer.writerow(REPORT_HEADER)
+        deduper = SerialDeduper(writer, args.min_prefix)
+        total = deduper.run(args.files)
+    finally:
+        if args.output:
+            output.close()
+
+    # Summary goes to stderr so the report can be piped
+    summary = sys.stderr
+    print("=" * 60, file=summary)
+    print("DEDUPE SUMMARY", file=summary)
+    print("=" * 60, file=summary)
+    print(f"Files scanned: {len(deduper.files)}", file=summary)
+    print(f"Rows scanned: {deduper.row_count}", file=summary)
+    print(f"Unique codes: {len(deduper.first_seen)}", file=summary)
+    print(f"Exact duplicates: {deduper.counts[EXACT_DUPLICATE]}", file=summary)
+    print(f"Case-fold collisions: {deduper.counts[CASE_COLLISION]}", file=summary)
+    print(f"Prefix/truncation collisions: {deduper.counts[PREFIX_COLLISION]}", file=summary)
+    if args.output:
+        print(f"Report saved to: {args.output}", file=summary)
+
+    sys.exit(1 if total else 0)
+
+if __name__ == "__main__":
+    main()
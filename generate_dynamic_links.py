@@ -6,9 +6,11 @@ Reads serial codes and creates unique URLs in the format: https://SerialCode/e3w
 
 import csv
 import os
-import sys
 from pathlib import Path
 
+import csv_ingest
+from url_templates import DEFAULT_URL_TEMPLATE, compile_template
+
 def generate_dynamic_links(input_csv_path, output_csv_path):
     """
     Read serial codes from CSV and generate dynamic links.
@@ -25,46 +27,21 @@ def generate_dynamic_links(input_csv_path, output_csv_path):
     
     serial_codes = []
     dynamic_links = []
+    url_template = compile_template(DEFAULT_URL_TEMPLATE)
     
     try:
-        # Read the input CSV file
-        with open(input_csv_path, 'r', newline='', encoding='utf-8') as csvfile:
-            # Try to detect if there's a header and what the delimiter is
-            sample = csvfile.read(1024)
-            csvfile.seek(0)
-            
-            # Detect dialect
-            try:
-                dialect = csv.Sniffer().sniff(sample)
-                delimiter = dialect.delimiter
-            except:
-                delimiter = ','
-            
-            reader = csv.reader(csvfile, delimiter=delimiter)
-            
-            # Read all rows
-            rows = list(reader)
+        # Read the input CSV file (header detection shared with batch_link_generator.py)
+        def on_header(header):
+            print(f"Detected header row: {header}")
+        
+        for serial_code, _ in csv_ingest.read_serial_codes(input_csv_path, on_header=on_header):
+            # Generate dynamic link
+            dynamic_link = url_template.render(serial_code)
             
-            # Check if first row looks like a header
-            if rows and len(rows) > 1:
-                first_row = rows[0]
-                # If first row contains common header terms, skip it
-                if any(term.lower() in str(first_row[0]).lower() for term in ['serial', 'code', 'id', 'tag']):
-                    print(f"Detected header row: {first_row}")
-                    rows = rows[1:]
+            serial_codes.append(serial_code)
+            dynamic_links.append(dynamic_link)
             
-            # Process each row
-            for i, row in enumerate(rows):
-                if row and len(row) > 0:
-                    serial_code = str(row[0]).strip()
-                    if serial_code:  # Only process non-empty serial codes
-                        # Generate dynamic link
-                        dynamic_link = f"https://{serial_code}/e3world.co.uk"
-                        
-                        serial_codes.append(serial_code)
-                        dynamic_links.append(dynamic_link)
-                        
-                        print(f"Processed: {serial_code} -> {dynamic_link}")
+            print(f"Processed: {serial_code} -> {dynamic_link}")
     
     except Exception as e:
         print(f"Error reading input file: {e}")
@@ -109,8 +86,8 @@ def main():
     if not os.path.exists(input_file):
         print(f"Looking for CSV file with serial codes...")
         
-        # Look for any CSV files in the current directory
-        csv_files = list(Path('.').glob('*.csv'))
+        # Look for CSV files in the current directory, skipping generated link files
+        csv_files = [f for f in sorted(Path('.').glob('*.csv')) if not csv_ingest.is_link_output(f)]
         
         if csv_files:
             print(f"Found CSV files: {[f.name for f in csv_files]}")
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+SQLite catalog of generator runs. Every recorded batch keeps its input file
+hash, URL templates and row counts, plus one row per serial code it issued.
+Those rows are clustered by serial code (a WITHOUT ROWID table, so there is
+no separate index to keep up to date), which makes finding the batches that
+issued a code, and the template they used, a B-tree lookup instead of
+grepping every CSV.
+
+A batch is recorded in a single transaction. Links that are exactly the
+batch's URL template rendered for the code are stored as NULL and rendered
+again on lookup, which keeps a catalog of tens of millions of rows small.
+Earlier output files can be backfilled with the import command. A file with
+the same contents as a recorded batch (such as a timestamped copy of
+dynamic_links.csv) is added to that batch's output_files instead of
+storing its serial rows a second time.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from itertools import chain
+from pathlib import Path
+
+import csv_ingest
+from link_writers import iter_link_rows
+from url_templates import compile_template
+
+DEFAULT_CATALOG_FILE = 'link_catalog.db'
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    batch_id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    source TEXT NOT NULL,
+    input_file TEXT,
+    input_sha256 TEXT,
+    output_file TEXT NOT NULL,
+    output_sha256 TEXT,
+    url_template TEXT,
+    extra_templates TEXT NOT NULL DEFAULT '[]',
+    total_rows INTEGER NOT NULL DEFAULT 0,
+    link_rows INTEGER NOT NULL DEFAULT 0,
+    error_rows INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS batches_output_sha256 ON batches (output_sha256);
+CREATE TABLE IF NOT EXISTS batch_serials (
+    serial_code TEXT NOT NULL COLLATE NOCASE,
+    batch_id INTEGER NOT NULL REFERENCES batches (batch_id),
+    position INTEGER NOT NULL,
+    dynamic_link TEXT,
+    PRIMARY KEY (serial_code, batch_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS output_files (
+    batch_id INTEGER NOT NULL REFERENCES batches (batch_id),
+    output_file TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (batch_id, output_file)
+) WITHOUT ROWID;
+"""
+
+# Output files named like dynamic_links_20250711_162740.csv carry their run time
+FILE_TIMESTAMP = re.compile(r'(\d{8}_\d{6})')
+
+def file_sha256(path):
+    """SHA-256 of a file, or of the manifest of a partitioned output directory"""
+    if os.path.isdir(path):
+        path = os.path.join(path, 'manifest.json')
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def infer_template(serial_code, dynamic_link):
+    """Guess the URL template an imported link was rendered from, or None"""
+    if not serial_code or serial_code not in dynamic_link or '{' in dynamic_link or '}' in dynamic_link:
+        return None
+    return dynamic_link.replace(serial_code, '{serial_code}', 1)
+
+def file_timestamp(path):
+    """Run time from a timestamped output name, else the file's modification time"""
+    match = FILE_TIMESTAMP.search(os.path.basename(path.rstrip(os.sep)))
+    if match:
+        try:
+            return datetime.strptime(match.group(1), '%Y%m%d_%H%M%S').isoformat(sep=' ')
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(os.path.getmtime(path)).isoformat(sep=' ', timespec='seconds')
+
+class LinkCatalog:
+    """Batches and the serial codes each one issued, in one SQLite file"""
+
+    def __init__(self, path=DEFAULT_CATALOG_FILE):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        # WAL lets lookups run while a long batch is being recorded
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        # Index inserts for a big batch stay in memory instead of re-reading pages
+        self.connection.execute('PRAGMA cache_size=-262144')
+        self.connection.executescript(CATALOG_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def record_batch(self, rows, output_file, url_template=None, source='batch_link_generator', input_file=None,
+                     extra_templates=(), total_rows=None, error_rows=0, created_at=None, output_sha256=None,
+                     input_sha256=None):
+        """Record one batch and its (serial_code, dynamic_link) rows in a single transaction
+
+        Returns (batch_id, link_rows). Without a url_template the template is
+        inferred from the first row; without input_sha256 the whole input
+        file is hashed.
+        """
+        rows = iter(rows)
+        first = next(rows, None)
+        if url_template is None and first is not None:
+            url_template = infer_template(first[0], first[1])
+        render = None
+        if url_template is not None:
+            try:
+                render = compile_template(url_template).render
+            except ValueError:
+                pass
+
+        def serial_rows(batch_id):
+            if first is None:
+                return
+            for position, (serial_code, dynamic_link, *_) in enumerate(chain([first], rows), 1):
+                yield (serial_code, batch_id, position,
+                       None if render is not None and render(serial_code) == dynamic_link else dynamic_link)
+
+        if input_sha256 is None and input_file is not None:
+            input_sha256 = file_sha256(input_file)
+        with self.connection:
+            batch_id = self.connection.execute(
+                "INSERT INTO batches (created_at, source, input_file, input_sha256, output_file, output_sha256, "
+                "url_template, extra_templates, error_rows) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (created_at or datetime.now().isoformat(sep=' ', timespec='seconds'), source,
+                 os.path.abspath(input_file) if input_file is not None else None, input_sha256,
+                 os.path.abspath(output_file), output_sha256, url_template,
+                 json.dumps([list(extra) for extra in extra_templates]), error_rows)).lastrowid
+            link_rows = self.connection.executemany(
+                "INSERT INTO batch_serials (serial_code, batch_id, position, dynamic_link) VALUES (?, ?, ?, ?)",
+                serial_rows(batch_id)).rowcount
+            link_rows = max(link_rows, 0)
+            self.connection.execute(
+                "UPDATE batches SET link_rows = ?, total_rows = ? WHERE batch_id = ?",
+                (link_rows, total_rows if total_rows is not None else link_rows, batch_id))
+        return batch_id, link_rows
+
+    def record_output(self, output_file, url_template=None, source='batch_link_generator', **kwargs):
+        """Record every row of a generator output file (or partitioned directory) as one batch"""
+        return self.record_batch(iter_link_rows(output_file), output_file, url_template, source,
+                                 output_sha256=file_sha256(output_file), **kwargs)
+
+    def find_output(self, output_sha256):
+        """batch_id of an earlier batch with the same output file contents, or None"""
+        row = self.connection.execute(
+            "SELECT batch_id FROM batches WHERE output_sha256 = ? LIMIT 1", (output_sha256,)).fetchone()
+        return row[0] if row else None
+
+    def add_output_file(self, batch_id, output_file, created_at=None):
+        """Record another file holding a batch's output; False if the batch already lists it"""
+        output_file = os.path.abspath(output_file)
+        if output_file in self.output_files(batch_id):
+            return False
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO output_files (batch_id, output_file, created_at) VALUES (?, ?, ?)",
+                (batch_id, output_file, created_at or datetime.now().isoformat(sep=' ', timespec='seconds')))
+        return True
+
+    def output_files(self, batch_id):
+        """The batch's own output file, then any files recorded with the same contents"""
+        own = self.connection.execute("SELECT output_file FROM batches WHERE batch_id = ?", (batch_id,)).fetchall()
+        copies = self.connection.execute(
+            "SELECT output_file FROM output_files WHERE batch_id = ? ORDER BY created_at, output_file", (batch_id,))
+        return [row[0] for row in chain(own, copies)]
+
+    def find_serial(self, serial_code):
+        """Every time a code was issued (case-insensitive), oldest batch first, as dicts"""
+        rows = self.connection.execute(
+            "SELECT b.batch_id, b.created_at, b.source, b.output_file, b.url_template, s.serial_code, "
+            "s.position, s.dynamic_link FROM batch_serials AS s JOIN batches AS b USING (batch_id) "
+            "WHERE s.serial_code = ? ORDER BY b.batch_id, s.position", (serial_code.strip(),))
+        results = []
+        for batch_id, created_at, source, output_file, url_template, code, position, dynamic_link in rows.fetchall():
+            if dynamic_link is None:
+                dynamic_link = compile_template(url_template).render(code)
+            results.append({'batch_id': batch_id, 'created_at': created_at, 'source': source,
+                            'output_file': output_file, 'output_files': self.output_files(batch_id),
+                            'url_template': url_template, 'serial_code': code,
+                            'position': position, 'dynamic_link': dynamic_link})
+        return results
+
+    def list_batches(self, limit=None):
+        """Recorded batches, newest first, as dicts"""
+        cursor = self.connection.execute(
+            "SELECT batch_id, created_at, source, input_file, input_sha256, output_file, url_template, "
+            "extra_templates, total_rows, link_rows, error_rows FROM batches ORDER BY batch_id DESC LIMIT ?",
+            (limit if limit is not None else -1,))
+        columns = [description[0] for description in cursor.description]
+        batches = [dict(zip(columns, row)) for row in cursor]
+        for batch in batches:
+            batch['output_files'] = self.output_files(batch['batch_id'])
+        return batches
+
+    def stats(self):
+        batches, links = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(link_rows), 0) FROM batches").fetchone()
+        codes = self.connection.execute(
+            "SELECT COUNT(*) FROM (SELECT DISTINCT serial_code FROM batch_serials)").fetchone()[0]
+        copies = self.connection.execute("SELECT COUNT(*) FROM output_files").fetchone()[0]
+        return {'batches': batches, 'links': links, 'distinct_codes': codes, 'output_files': batches + copies}
+
+    def close(self):
+        self.connection.close()
+
+def import_files(catalog, paths, force=False):
+    """Backfill earlier output files
+
+    A file with the same contents as a cataloged batch is added to that
+    batch's output files without storing its serial rows again (unless
+    force); a file the batch already lists is skipped.
+    """
+    imported = 0
+    for path in paths:
+        try:
+            output_sha256 = file_sha256(path)
+            existing = catalog.find_output(output_sha256)
+            if existing is not None and not force:
+                if catalog.add_output_file(existing, path, file_timestamp(path)):
+                    print(f"✅ {path}: same contents as batch {existing}, recorded as another of its output files")
+                    imported += 1
+                else:
+                    print(f"  {path}: already in the catalog as batch {existing}, skipped")
+                continue
+            start = time.perf_counter()
+            batch_id, link_rows = catalog.record_batch(
+                iter_link_rows(path), path, source='import', created_at=file_timestamp(path),
+                output_sha256=output_sha256)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ {path}: {e}")
+            continue
+        elapsed = time.perf_counter() - start
+        print(f"✅ {path}: batch {batch_id}, {link_rows:,} links ({elapsed:.2f}s)")
+        imported += 1
+    return imported
+
+def main():
+    parser = argparse.ArgumentParser(description='Catalog of generator runs: which batch issued which serial code')
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG_FILE,
+                        help=f'Catalog database (default: {DEFAULT_CATALOG_FILE})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='Backfill earlier generator output files')
+    import_parser.add_argument('files', nargs='*',
+                               help='Output files or partitioned directories (default: every link CSV in the current directory)')
+    import_parser.add_argument('--force', action='store_true', help='Import files whose contents are already cataloged')
+
+    find_parser = subparsers.add_parser('find', help='Batches that issued a serial code, with the template used')
+    find_parser.add_argument('serial_codes', nargs='+', help='Serial codes to look up (case-insensitive)')
+
+    batches_parser = subparsers.add_parser('batches', help='List recorded batches, newest first')
+    batches_parser.add_argument('-n', '--limit', type=int, default=20, help='How many to show (default: 20)')
+
+    subparsers.add_parser('info', help='Batch, link and distinct code counts')
+
+    args = parser.parse_args()
+
+    if args.command != 'import' and not os.path.exists(args.catalog):
+        print(f"Catalog not found: {args.catalog} (record a run with batch_link_generator.py --catalog, "
+              f"or backfill with: python3 link_catalog.py import)")
+        sys.exit(2)
+
+    try:
+        with LinkCatalog(args.catalog) as catalog:
+            if args.command == 'import':
+                paths = args.files or [str(path) for path in sorted(Path('.').glob('*.csv'))
+                                       if csv_ingest.is_link_output(path)]
+                if not paths:
+                    print("No generator output files found")
+                    sys.exit(2)
+                print(f"Importing {len(paths)} files into {args.catalog}")
+                imported = import_files(catalog, paths, args.force)
+                print(f"Imported {imported} of {len(paths)} files")
+                return
+
+            if args.command == 'find':
+                missing = 0
+                for serial_code in args.serial_codes:
+                    start = time.perf_counter()
+                    results = catalog.find_serial(serial_code)
+                    elapsed = (time.perf_counter() - start) * 1000
+                    if not results:
+                        print(f"❌ {serial_code}: not in any batch ({elapsed:.2f} ms)")
+                        missing += 1
+                        continue
+                    print(f"✅ {serial_code}: {len(results)} issue(s) ({elapsed:.2f} ms)")
+                    for result in results:
+                        print(f"  batch {result['batch_id']} ({result['created_at']}, {result['source']}) "
+                              f"row {result['position']} of {result['output_file']}")
+                        for output_file in result['output_files'][1:]:
+                            print(f"    same rows in {output_file}")
+                        print(f"    template {result['url_template'] or '(none)'} -> {result['dynamic_link']}")
+                if missing:
+                    sys.exit(1)
+                return
+
+            if args.command == 'batches':
+                for batch in catalog.list_batches(args.limit):
+                    print(f"Batch {batch['batch_id']}: {batch['created_at']} {batch['source']}, "
+                          f"{batch['link_rows']:,} links of {batch['total_rows']:,} codes, {batch['error_rows']:,} errors")
+                    print(f"  output:   {batch['output_file']}")
+                    for output_file in batch['output_files'][1:]:
+                        print(f"  copy:     {output_file}")
+                    if batch['input_file']:
+                        print(f"  input:    {batch['input_file']} (sha256 {batch['input_sha256'][:16]}...)")
+                    print(f"  template: {batch['url_template'] or '(mixed)'}")
+                    for name, template in json.loads(batch['extra_templates']):
+                        print(f"  extra:    {name}={template}")
+                return
+
+            stats = catalog.stats()
+            print(f"Catalog: {args.catalog} ({os.path.getsize(args.catalog) / (1024 * 1024):.1f} MB)")
+            print(f"Batches: {stats['batches']:,} ({stats['output_files']:,} output files)")
+            print(f"Links: {stats['links']:,} ({stats['distinct_codes']:,} distinct serial codes)")
+    except sqlite3.Error as e:
+        print(f"❌ Catalog error: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Persistent manifest of serial codes already written to a dynamic link CSV.
+Lets the generators append only new codes instead of regenerating every link.
+"""
+
+import csv
+import hashlib
+import os
+
+from url_templates import compile_template
+
+MANIFEST_HEADER = ['SerialCode', 'Template', 'LinkHash']
+OUTPUT_HEADER = ['SerialCode', 'DynamicLink']
+
+# Manifest rows are written only after the matching output rows are flushed
+FLUSH_EVERY = 4096
+
+def link_hash(serial_code, dynamic_link):
+    """Short content hash of an emitted SerialCode,DynamicLink row"""
+    return hashlib.sha256(f"{serial_code},{dynamic_link}".encode('utf-8')).hexdigest()[:16]
+
+def default_manifest_path(output_file):
+    """Manifest file stored next to its output CSV"""
+    root, _ = os.path.splitext(output_file)
+    return f"{root}.manifest.csv"
+
+class LinkManifest:
+    """Record of every serial code emitted to one output CSV
+
+    Entries are held in a dict keyed by serial code, so checking whether a
+    code was already emitted is O(1). If the output is missing, the next
+    append starts both files from scratch; an output without a manifest has
+    to be seeded with seed_from_output before anything is appended to it.
+    An output holds links from one URL template only: appending under
+    another template is refused rather than adding a second row for its codes.
+    """
+
+    def __init__(self, output_file, manifest_file=None):
+        self.output_file = output_file
+        self.manifest_file = manifest_file or default_manifest_path(output_file)
+        self.entries = {}
+        self.templates = set()
+        self.resumed = os.path.exists(self.output_file) and os.path.exists(self.manifest_file)
+        if self.resumed:
+            self.load()
+
+    def load(self):
+        """Load manifest entries from disk"""
+        with open(self.manifest_file, 'r', newline='', encoding='utf-8') as csvfile:
+            reader = csv.reader(csvfile)
+            header = next(reader, None)
+            if header != MANIFEST_HEADER:
+                raise ValueError(f"Not a link manifest: {self.manifest_file}")
+
+            for row in reader:
+                if len(row) == 3:
+                    serial_code, url_template, content_hash = row
+                    self.entries[serial_code] = (url_template, content_hash)
+                    self.templates.add(url_template)
+
+    def seed_from_output(self, url_template):
+        """Build a missing manifest from the rows already in the output
+
+        Does nothing unless the output exists without a manifest. Raises
+        ValueError if the output is not a SerialCode,DynamicLink CSV or holds
+        a link the template would not produce, since appending to it under
+        this template would mix links from two templates.
+        """
+        if self.resumed or not os.path.exists(self.output_file):
+            return 0
+
+        compiled = compile_template(url_template)
+        rows = []
+        with open(self.output_file, 'r', newline='', encoding='utf-8') as csvfile:
+            reader = csv.reader(csvfile)
+            if next(reader, None) != OUTPUT_HEADER:
+                raise ValueError(f"{self.output_file} has no manifest and is not a SerialCode,DynamicLink CSV; "
+                                 f"refusing to overwrite it")
+            for row in reader:
+                if len(row) != 2:
+                    continue
+                serial_code, dynamic_link = row
+                if dynamic_link != compiled.render(serial_code):
+                    raise ValueError(f"{self.output_file} has no manifest and holds {dynamic_link!r}, which "
+                                     f"template {url_template!r} does not produce; write to a new output file")
+                rows.append([serial_code, url_template, link_hash(serial_code, dynamic_link)])
+
+        tmp_file = f"{self.manifest_file}.tmp"
+        with open(tmp_file, 'w', newline='', encoding='utf-8') as manifest_csv:
+            manifest_writer = csv.writer(manifest_csv)
+            manifest_writer.writerow(MANIFEST_HEADER)
+            manifest_writer.writerows(rows)
+        os.replace(tmp_file, self.manifest_file)
+
+        for serial_code, _, content_hash in rows:
+            self.entries[serial_code] = (url_template, content_hash)
+        if rows:
+            self.templates.add(url_template)
+        self.resumed = True
+        return len(rows)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, serial_code):
+        return serial_code in self.entries
+
+    def is_emitted(self, serial_code, url_template):
+        """Check whether a code was already emitted with the same template"""
+        entry = self.entries.get(serial_code)
+        return entry is not None and entry[0] == url_template
+
+    def check_template(self, url_template):
+        """Raise ValueError if the output holds links from a different template"""
+        others = self.templates - {url_template}
+        if others:
+            raise ValueError(f"{self.output_file} holds links from template {sorted(others)[0]!r}; "
+                             f"write links for {url_template!r} to a new output file")
+
+    def append(self, results, url_template):
+        """Append (serial_code, dynamic_link) rows to the output and the manifest
+
+        Returns the number of rows written. Rows are streamed, and the
+        manifest never records a row before it has been flushed to the output.
+        Raises ValueError if the output was written with another template,
+        or exists without a manifest.
+        """
+        self.check_template(url_template)
+        if not self.resumed and os.path.exists(self.output_file):
+            raise ValueError(f"{self.output_file} exists without its manifest {self.manifest_file}; "
+                             f"refusing to overwrite it")
+        mode = 'a' if self.resumed else 'w'
+        count = 0
+        pending = []
+
+        with open(self.manifest_file, mode, newline='', encoding='utf-8') as manifest_csv:
+            manifest_writer = csv.writer(manifest_csv)
+            if not self.resumed:
+                manifest_writer.writerow(MANIFEST_HEADER)
+
+            with open(self.output_file, mode, newline='', encoding='utf-8') as csvfile:
+                writer = csv.writer(csvfile)
+                if not self.resumed:
+                    writer.writerow(OUTPUT_HEADER)
+
+                for serial_code, dynamic_link in results:
+                    writer.writerow([serial_code, dynamic_link])
+                    content_hash = link_hash(serial_code, dynamic_link)
+                    self.entries[serial_code] = (url_template, content_hash)
+                    self.templates.add(url_template)
+                    pending.append([serial_code, url_template, content_hash])
+                    count += 1
+
+                    if len(pending) >= FLUSH_EVERY:
+                        csvfile.flush()
+                        manifest_writer.writerows(pending)
+                        pending = []
+
+                csvfile.flush()
+
+            manifest_writer.writerows(pending)
+
+        self.resumed = True
+        return count
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""
+Partitioned, compressed output for generated link batches. Rows are split
+into shards, either a fixed number of partitions by a hash of the serial
+code or consecutive shards of at most N rows, and each shard is compressed
+(gzip or zstd) as it streams. A manifest.json lists every shard with its
+row count, size and SHA-256.
+
+Each shard is a complete file in the chosen output format, so a print
+vendor or loader can fetch and read one shard without touching the rest,
+and with hash partitioning shard_for_code() says which shard holds a code.
+
+    output_dir/
+        manifest.json
+        part-00000.csv.gz
+        part-00001.csv.gz
+        ...
+"""
+
+import argparse
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import secrets
+import shutil
+import sys
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime
+from itertools import chain, islice
+
+from link_writers import (OUTPUT_FORMATS, detect_output_format, iter_link_rows, iter_part_rows, iter_stream_rows,
+                          open_writer, read_columnar_header)
+from serial_registry import normalize_serial_code
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+COMPRESSIONS = ['gzip', 'zstd', 'none']
+COMPRESSION_EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst', 'none': ''}
+DEFAULT_LEVELS = {'gzip': 6, 'zstd': 3}
+FORMAT_EXTENSIONS = {'csv': '.csv', 'jsonl': '.jsonl', 'columnar': '.e3lc'}
+
+# Rows buffered per shard by hash partitioning before they are written
+WRITE_BATCH_SIZE = 4096
+SHARD_BUFFER_SIZE = 256 * 1024
+
+PartitionSpec = namedtuple('PartitionSpec', 'partitions shard_rows compression level')
+PartitionSpec.__doc__ = """How to shard output: partitions (by hash) or shard_rows (by size), plus compression"""
+
+def load_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstandard is required for zstd compression (pip install zstandard)")
+    return zstandard
+
+def make_compressor(compression, level=None):
+    """A compressobj-style object (compress/flush) for a compression, or None for 'none'"""
+    if compression == 'none':
+        return None
+    if level is None:
+        level = DEFAULT_LEVELS[compression]
+    if compression == 'gzip':
+        # wbits 31: gzip header and trailer, readable by gzip.open and zcat
+        return zlib.compressobj(level, zlib.DEFLATED, 31)
+    if compression == 'zstd':
+        return load_zstandard().ZstdCompressor(level=level).compressobj()
+    raise ValueError(f"Unknown compression: {compression}")
+
+def open_decompressed(path, compression):
+    """Binary stream of a shard's decompressed contents"""
+    if compression == 'gzip':
+        return gzip.open(path, 'rb')
+    if compression == 'zstd':
+        return io.BufferedReader(load_zstandard().ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True))
+    return open(path, 'rb')
+
+def shard_for_code(serial_code, partitions):
+    """Shard index of a code under hash partitioning (CRC-32 of the normalized code)"""
+    return zlib.crc32(normalize_serial_code(serial_code).encode('utf-8')) % partitions
+
+def shard_file_name(index, output_format, compression):
+    return f"part-{index:05d}{FORMAT_EXTENSIONS[output_format]}{COMPRESSION_EXTENSIONS[compression]}"
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class CompressedStream(io.RawIOBase):
+    """Write-only stream that compresses into a file, hashing what is stored"""
+
+    def __init__(self, path, compression, level=None):
+        self.file = open(path, 'wb')
+        self.compressor = make_compressor(compression, level)
+        self.sha256 = hashlib.sha256()
+        self.uncompressed_bytes = 0
+        self.stored_bytes = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.uncompressed_bytes += len(data)
+        self.store(self.compressor.compress(data) if self.compressor is not None else data)
+        return len(data)
+
+    def store(self, chunk):
+        if chunk:
+            self.sha256.update(chunk)
+            self.file.write(chunk)
+            self.stored_bytes += len(chunk)
+
+    def close(self):
+        if not self.closed:
+            if self.compressor is not None:
+                self.store(self.compressor.flush())
+            self.file.close()
+        super().close()
+
+class Shard:
+    """One compressed output file and the format writer streaming into it"""
+
+    def __init__(self, index, path, output_format, columns, compression, level=None):
+        self.index = index
+        self.path = path
+        self.stream = CompressedStream(path, compression, level)
+        self.writer = open_writer(output_format, path, columns,
+                                  raw=io.BufferedWriter(self.stream, SHARD_BUFFER_SIZE))
+
+    def close(self):
+        self.writer.close()
+        return {
+            'index': self.index,
+            'file': os.path.basename(self.path),
+            'rows': self.writer.row_count,
+            'bytes': self.stream.stored_bytes,
+            'uncompressed_bytes': self.stream.uncompressed_bytes,
+            'sha256': self.stream.sha256.hexdigest(),
+        }
+
+class PartitionedLinkWriter:
+    """Writer with the LinkWriter interface that shards rows into a directory
+
+    Shards are written to a temporary directory next to output_dir, which
+    is swapped into place when the writer closes, so readers never see a
+    half-written set of shards. Only a missing path or an earlier
+    partitioned output (one with a readable manifest) is replaced. If the
+    with-block raises, the temporary directory is removed and any earlier
+    output is left as it was.
+    """
+
+    def __init__(self, output_dir, columns, output_format='csv', partitions=None, shard_rows=None,
+                 compression='gzip', level=None):
+        if (partitions is None) == (shard_rows is None):
+            raise ValueError("Give either partitions or shard_rows")
+        if (partitions or shard_rows) < 1:
+            raise ValueError("partitions and shard_rows must be at least 1")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}")
+        if compression == 'zstd':
+            load_zstandard()
+
+        self.output_dir = output_dir.rstrip(os.sep) or output_dir
+        self.columns = list(columns)
+        self.output_format = output_format
+        self.partitions = partitions
+        self.shard_rows = shard_rows
+        self.compression = compression
+        self.level = level
+        self.row_count = 0
+        self.shards = []
+        self.closed_shards = []
+        self.closed = False
+
+        check_replaceable(self.output_dir)
+        # A fresh name each time, so nothing that happens to sit next to the output is ever removed
+        self.tmp_dir = sibling_path(self.output_dir, 'tmp')
+        os.makedirs(self.tmp_dir)
+        if partitions is not None:
+            self.shards = [self.open_shard(index) for index in range(partitions)]
+        else:
+            self.shards = [self.open_shard(0)]
+
+    @classmethod
+    def from_spec(cls, output_dir, columns, output_format, spec):
+        return cls(output_dir, columns, output_format, spec.partitions, spec.shard_rows, spec.compression, spec.level)
+
+    def open_shard(self, index):
+        path = os.path.join(self.tmp_dir, shard_file_name(index, self.output_format, self.compression))
+        return Shard(index, path, self.output_format, self.columns, self.compression, self.level)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write_rows(self, rows):
+        """Write an iterable of row tuples; returns the number written"""
+        start = self.row_count
+        rows = iter(rows)
+        if self.partitions is not None:
+            partitions = self.partitions
+            crc32 = zlib.crc32
+            while True:
+                batch = list(islice(rows, WRITE_BATCH_SIZE))
+                if not batch:
+                    break
+                buckets = [[] for _ in range(partitions)]
+                appends = [bucket.append for bucket in buckets]
+                for row, index in zip(batch, [crc32(row[0].strip().upper().encode('utf-8')) % partitions
+                                              for row in batch]):
+                    appends[index](row)
+                for shard, bucket in zip(self.shards, buckets):
+                    if bucket:
+                        shard.writer.write_rows(bucket)
+                self.row_count += len(batch)
+        else:
+            while True:
+                shard = self.shards[-1]
+                room = self.shard_rows - shard.writer.row_count
+                if room == 0:
+                    # Only start the next shard once there is a row for it
+                    first = next(rows, None)
+                    if first is None:
+                        break
+                    rows = chain([first], rows)
+                    self.closed_shards.append(shard.close())
+                    self.shards[-1] = self.open_shard(shard.index + 1)
+                    continue
+                written = shard.writer.write_rows(islice(rows, room))
+                self.row_count += written
+                if written < room:
+                    break
+        return self.row_count - start
+
+    def append_part(self, part_path):
+        """Shard the rows of a part file written with part=True"""
+        self.write_rows(iter_part_rows(self.output_format, part_path, self.columns))
+
+    def flush(self):
+        for shard in self.shards:
+            shard.writer.flush()
+
+    def manifest(self):
+        return {
+            'version': MANIFEST_VERSION,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'format': self.output_format,
+            'compression': self.compression,
+            'columns': self.columns,
+            'partitioning': 'hash' if self.partitions is not None else 'size',
+            'partitions': self.partitions,
+            'shard_rows': self.shard_rows,
+            'total_rows': self.row_count,
+            'shards': self.closed_shards,
+        }
+
+    def close(self):
+        """Finish every shard, write the manifest and move the directory into place"""
+        if self.closed:
+            return
+        self.closed = True
+        self.closed_shards += [shard.close() for shard in self.shards]
+        with open(os.path.join(self.tmp_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(self.manifest(), f, indent=2)
+            f.write('\n')
+
+        check_replaceable(self.output_dir)
+        if not os.path.exists(self.output_dir):
+            os.replace(self.tmp_dir, self.output_dir)
+            return
+        # Move the earlier output aside, swap the new one in, then remove the old one
+        old_dir = sibling_path(self.output_dir, 'old')
+        os.rename(self.output_dir, old_dir)
+        try:
+            os.replace(self.tmp_dir, self.output_dir)
+        except OSError:
+            os.rename(old_dir, self.output_dir)
+            raise
+        shutil.rmtree(old_dir)
+
+    def abort(self):
+        if self.closed:
+            return
+        self.closed = True
+        for shard in self.shards:
+            try:
+                shard.close()
+            except (OSError, ValueError):
+                pass
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+def open_output(output_format, path, columns, spec=None):
+    """open_writer for a plain file, or a PartitionedLinkWriter directory when spec is given"""
+    if spec is None:
+        return open_writer(output_format, path, columns)
+    return PartitionedLinkWriter.from_spec(path, columns, output_format, spec)
+
+def sibling_path(path, tag):
+    """An unused name next to path, e.g. links_out.tmp-1234-9f3c0a1b"""
+    return f"{path}.{tag}-{os.getpid()}-{secrets.token_hex(4)}"
+
+def check_replaceable(output_dir):
+    """Raise ValueError unless output_dir is missing or an earlier partitioned output
+
+    Writing a partitioned output replaces the whole directory, so anything
+    else found at that path is refused rather than deleted.
+    """
+    if not os.path.exists(output_dir):
+        return
+    if not os.path.isdir(output_dir):
+        raise ValueError(f"{output_dir} exists and is not a partitioned link output; refusing to replace it")
+    try:
+        read_manifest(output_dir)
+    except ValueError:
+        raise ValueError(f"{output_dir} is not a partitioned link output (no readable {MANIFEST_NAME}); "
+                         f"refusing to replace it")
+
+def read_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Not a partitioned link output (no readable {MANIFEST_NAME}): {output_dir}: {e}")
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version in {path}")
+    return manifest
+
+def verify_shard(output_dir, shard):
+    """True if a shard file is present with the size and SHA-256 the manifest lists"""
+    path = os.path.join(output_dir, shard['file'])
+    return (os.path.exists(path) and os.path.getsize(path) == shard['bytes']
+            and file_sha256(path) == shard['sha256'])
+
+def iter_shard_rows(output_dir, index, columns=None, manifest=None, verify=False):
+    """Yield the rows of one shard, decompressing only that shard
+
+    Raises ValueError if verify is set and the shard does not match its checksum.
+    """
+    manifest = manifest or read_manifest(output_dir)
+    shard = manifest['shards'][index]
+    if verify and not verify_shard(output_dir, shard):
+        raise ValueError(f"Checksum mismatch for {shard['file']} in {output_dir}")
+    path = os.path.join(output_dir, shard['file'])
+    with open_decompressed(path, manifest['compression']) as stream:
+        yield from iter_stream_rows(manifest['format'], stream, columns or manifest['columns'], path)
+
+def iter_partitioned_rows(output_dir, columns=('SerialCode', 'DynamicLink')):
+    """Yield the rows of every shard, in shard order"""
+    manifest = read_manifest(output_dir)
+    for index in range(len(manifest['shards'])):
+        yield from iter_shard_rows(output_dir, index, columns, manifest)
+
+def read_columns(path):
+    """Column names of a generator output file or partitioned directory"""
+    if os.path.isdir(path):
+        return read_manifest(path)['columns']
+    output_format = detect_output_format(path)
+    if output_format == 'csv':
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            return next(csv.reader(f), [])
+    if output_format == 'jsonl':
+        with open(path, 'r', encoding='utf-8') as f:
+            return list(json.loads(f.readline()))
+    with open(path, 'rb') as f:
+        return read_columnar_header(f.read(64 * 1024), path)[0]
+
+def print_manifest(output_dir, manifest):
+    print(f"Output: {output_dir}")
+    print(f"Format: {manifest['format']} ({manifest['compression']}), columns: {', '.join(manifest['columns'])}")
+    if manifest['partitioning'] == 'hash':
+        print(f"Partitioning: {manifest['partitions']} partitions by hash of SerialCode")
+    else:
+        print(f"Partitioning: at most {manifest['shard_rows']} rows per shard")
+    stored = sum(shard['bytes'] for shard in manifest['shards'])
+    uncompressed = sum(shard['uncompressed_bytes'] for shard in manifest['shards'])
+    ratio = f", {uncompressed / stored:.1f}x compression" if stored else ""
+    print(f"Rows: {manifest['total_rows']:,} in {len(manifest['shards'])} shards, {stored:,} bytes{ratio}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Write, inspect and read partitioned, compressed link output')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    split_parser = subparsers.add_parser('split', help='Partition existing link files into compressed shards')
+    split_parser.add_argument('files', nargs='+', help='Generator output files (CSV, JSONL, columnar or partitioned)')
+    split_parser.add_argument('-o', '--output', required=True, help='Output directory')
+    sharding = split_parser.add_mutually_exclusive_group()
+    sharding.add_argument('-p', '--partitions', type=int, help='Number of partitions by hash of the serial code')
+    sharding.add_argument('--shard-rows', type=int, help='Rows per shard, in input order')
+    split_parser.add_argument('-z', '--compress', choices=COMPRESSIONS, default='gzip',
+                              help='Shard compression (default: gzip)')
+    split_parser.add_argument('--level', type=int, help='Compression level (default: gzip 6, zstd 3)')
+    split_parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS, default='csv',
+                              help='Shard file format (default: csv)')
+
+    info_parser = subparsers.add_parser('info', help='Show the manifest of a partitioned output')
+    info_parser.add_argument('output', help='Partitioned output directory')
+    info_parser.add_argument('--shards', action='store_true', help='List every shard')
+
+    verify_parser = subparsers.add_parser('verify', help='Check every shard against its checksum and row count')
+    verify_parser.add_argument('output', help='Partitioned output directory')
+
+    cat_parser = subparsers.add_parser('cat', help='Write rows of a partitioned output as CSV')
+    cat_parser.add_argument('output', help='Partitioned output directory')
+    selection = cat_parser.add_mutually_exclusive_group()
+    selection.add_argument('-s', '--shard', type=int, help='Only this shard')
+    selection.add_argument('--code', help='Only the shard that holds this serial code (hash partitioning)')
+    cat_parser.add_argument('-o', '--csv-output', help='CSV file to write (default: stdout)')
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'split':
+            columns = read_columns(args.files[0])
+            spec = PartitionSpec(args.partitions if args.partitions or args.shard_rows else 1,
+                                 args.shard_rows, args.compress, args.level)
+            start = time.perf_counter()
+            with PartitionedLinkWriter.from_spec(args.output, columns, args.format, spec) as writer:
+                rows = chain.from_iterable(iter_link_rows(path, columns) for path in args.files)
+                while writer.write_rows(islice(rows, WRITE_BATCH_SIZE)):
+                    pass
+            elapsed = time.perf_counter() - start
+            manifest = read_manifest(args.output)
+            print_manifest(args.output, manifest)
+            print(f"Written in {elapsed:.2f}s ({manifest['total_rows'] / elapsed if elapsed else 0:,.0f} rows/s)")
+            return
+
+        manifest = read_manifest(args.output)
+        shards = manifest['shards']
+        if args.command == 'info':
+            print_manifest(args.output, manifest)
+            if args.shards:
+                for shard in shards:
+                    print(f"  {shard['file']}: {shard['rows']:,} rows, {shard['bytes']:,} bytes, sha256 {shard['sha256'][:16]}...")
+            return
+
+        if args.command == 'verify':
+            bad = []
+            for index, shard in enumerate(shards):
+                if not verify_shard(args.output, shard):
+                    bad.append(f"{shard['file']}: missing, or size or checksum differs")
+                    continue
+                rows = sum(1 for _ in iter_shard_rows(args.output, index, manifest=manifest))
+                if rows != shard['rows']:
+                    bad.append(f"{shard['file']}: {rows} rows, manifest says {shard['rows']}")
+            if bad:
+                print(f"❌ {len(bad)} of {len(shards)} shards failed verification:")
+                for line in bad:
+                    print(f"  - {line}")
+                sys.exit(1)
+            print(f"✅ All {len(shards)} shards match the manifest ({manifest['total_rows']:,} rows)")
+            return
+
+        # cat
+        if args.code is not None:
+            if manifest['partitioning'] != 'hash':
+                raise ValueError("--code needs hash partitioning; this output is split by size")
+            indexes = [shard_for_code(args.code, manifest['partitions'])]
+        elif args.shard is not None:
+            if not 0 <= args.shard < len(shards):
+                raise ValueError(f"No shard {args.shard}: the output has shards 0-{len(shards) - 1}")
+            indexes = [args.shard]
+        else:
+            indexes = range(len(shards))
+
+        output = open(args.csv_output, 'w', newline='', encoding='utf-8') if args.csv_output else sys.stdout
+        try:
+            writer = csv.writer(output)
+            writer.writerow(manifest['columns'])
+            rows = chain.from_iterable(iter_shard_rows(args.output, index, manifest=manifest) for index in indexes)
+            if args.code is not None:
+                code = normalize_serial_code(args.code)
+                rows = (row for row in rows if normalize_serial_code(row[0]) == code)
+            writer.writerows(rows)
+        finally:
+            if args.csv_output:
+                output.close()
+    except (OSError, ValueError, RuntimeError, KeyError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Long-running link generation service with a small HTTP API, over TCP or a
+Unix socket. Keeps the registry, the Bloom filter and the compiled URL
+templates loaded between requests, and coalesces concurrent requests into
+batches for the same validate-and-render pass batch_link_generator.py uses.
+
+Endpoints (JSON in and out):
+  GET  /health              liveness and configuration
+  GET  /stats               request, batch and latency counters
+  GET  /link/<serial_code>  link for one code
+  POST /links               {"serial_codes": [...]} -> a link or error per code
+  POST /validate            {"serial_codes": [...]} -> valid/error per code
+
+Codes are stripped of surrounding whitespace as requests are read, and
+responses echo the stripped code.
+
+Pending work is bounded: when more codes are queued than --max-pending,
+requests are answered 503 with Retry-After instead of being buffered.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from collections import deque
+from urllib.parse import unquote, urlsplit
+
+from batch_link_generator import VALIDATION_BATCH_SIZE, DynamicLinkGenerator
+from batch_metrics import BatchMetrics
+from bloom_filter import DEFAULT_BLOOM_FILE, RegistryFilter
+from serial_registry import DEFAULT_INDEX_FILE
+from url_templates import DEFAULT_URL_TEMPLATE, parse_named_template
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8787
+
+DEFAULT_MAX_BATCH = VALIDATION_BATCH_SIZE
+DEFAULT_MAX_DELAY_MS = 2.0
+DEFAULT_MAX_PENDING = 16 * VALIDATION_BATCH_SIZE
+DEFAULT_MAX_REQUEST_CODES = 10_000
+
+MAX_BODY_BYTES = 4 * 1024 * 1024
+LATENCY_WINDOW = 10_000
+
+STATUS_TEXT = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    422: 'Unprocessable Entity',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+class Overloaded(Exception):
+    """Raised when accepting a request would exceed the pending code limit"""
+
+class ServiceGenerator(DynamicLinkGenerator):
+    """Generator kept warm by the service: errors are returned per code, not printed"""
+
+    def __init__(self, url_template=None, registry=None, extra_templates=None, require_check_char=False):
+        super().__init__(None, url_template=url_template, registry=registry, extra_templates=extra_templates,
+                         require_check_char=require_check_char, metrics=BatchMetrics())
+        self.batch_errors = {}
+
+    def record_error(self, row_num, serial_code, error):
+        self.batch_errors[row_num] = error
+
+    def report_progress(self):
+        pass
+
+    def generate_batch(self, serial_codes):
+        """(row, None) or (None, error) for each code, in order"""
+        self.batch_errors = {}
+        rows = iter(list(self.generate_links((serial_code, i) for i, serial_code in enumerate(serial_codes))))
+        errors = self.batch_errors
+        return [(None, errors[i]) if i in errors else (next(rows), None) for i in range(len(serial_codes))]
+
+class LinkBatcher:
+    """Coalesces concurrent requests into batches of up to max_batch codes
+
+    A batch is started as soon as max_batch codes are waiting, or max_delay
+    seconds after the first request arrives, whichever comes first.
+    """
+
+    def __init__(self, generator, max_batch=DEFAULT_MAX_BATCH, max_delay=DEFAULT_MAX_DELAY_MS / 1000,
+                 max_pending=DEFAULT_MAX_PENDING):
+        self.generator = generator
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.queue = deque()
+        self.pending_codes = 0
+        self.wakeup = asyncio.Event()
+        self.batch_count = 0
+        self.batched_codes = 0
+
+    async def submit(self, serial_codes):
+        """Queue codes and wait for their (row, error) results"""
+        if self.pending_codes + len(serial_codes) > self.max_pending:
+            raise Overloaded()
+        future = asyncio.get_running_loop().create_future()
+        self.queue.append((serial_codes, future))
+        self.pending_codes += len(serial_codes)
+        self.wakeup.set()
+        return await future
+
+    def take_batch(self):
+        """Pop whole requests off the queue until the batch is full"""
+        requests = []
+        size = 0
+        while self.queue and (not requests or size + len(self.queue[0][0]) <= self.max_batch):
+            serial_codes, future = self.queue.popleft()
+            requests.append((serial_codes, future))
+            size += len(serial_codes)
+        self.pending_codes -= size
+        return requests
+
+    async def run(self):
+        while True:
+            await self.wakeup.wait()
+            if self.pending_codes < self.max_batch:
+                # Give concurrent requests a moment to join this batch
+                await asyncio.sleep(self.max_delay)
+
+            requests = self.take_batch()
+            if not self.queue:
+                self.wakeup.clear()
+            requests = [(codes, future) for codes, future in requests if not future.cancelled()]
+            if not requests:
+                continue
+
+            serial_codes = [code for codes, _ in requests for code in codes]
+            try:
+                results = self.generator.generate_batch(serial_codes)
+            except Exception as e:
+                for _, future in requests:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batch_count += 1
+            self.batched_codes += len(serial_codes)
+            offset = 0
+            for codes, future in requests:
+                if not future.done():
+                    future.set_result(results[offset:offset + len(codes)])
+                offset += len(codes)
+            # Let the waiting handlers write their responses before the next batch
+            await asyncio.sleep(0)
+
+class LinkService:
+    """HTTP/1.1 front end for a LinkBatcher"""
+
+    def __init__(self, generator, batcher, max_request_codes=DEFAULT_MAX_REQUEST_CODES):
+        self.generator = generator
+        self.batcher = batcher
+        self.max_request_codes = max_request_codes
+        self.started = time.monotonic()
+        self.request_count = 0
+        self.code_count = 0
+        self.overloaded_count = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def link_record(self, serial_code, row, error):
+        if error:
+            return {'serial_code': serial_code, 'error': error}
+        record = {'serial_code': serial_code, 'dynamic_link': row[1]}
+        for name, value in zip(self.generator.columns[2:], row[2:]):
+            record[name] = value
+        return record
+
+    def read_codes(self, body):
+        """serial_codes from a JSON request body, or raise ValueError"""
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            raise ValueError("Request body is not valid JSON")
+        serial_codes = payload.get('serial_codes') if isinstance(payload, dict) else None
+        if not isinstance(serial_codes, list) or not all(isinstance(code, str) for code in serial_codes):
+            raise ValueError('Expected {"serial_codes": ["...", ...]}')
+        if len(serial_codes) > self.max_request_codes:
+            raise OverflowError(f"At most {self.max_request_codes} serial codes per request")
+        return [serial_code.strip() for serial_code in serial_codes]
+
+    async def generate(self, serial_codes):
+        self.code_count += len(serial_codes)
+        if not serial_codes:
+            return []
+        return await self.batcher.submit(serial_codes)
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction):
+            if not latencies:
+                return None
+            return round(latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000, 3)
+
+        batcher = self.batcher
+        return {
+            'uptime_seconds': round(time.monotonic() - self.started, 3),
+            'requests': self.request_count,
+            'codes': self.code_count,
+            'overloaded': self.overloaded_count,
+            'batches': batcher.batch_count,
+            'average_batch_size': round(batcher.batched_codes / batcher.batch_count, 1) if batcher.batch_count else 0,
+            'pending_codes': batcher.pending_codes,
+            'latency_ms': {'p50': percentile(0.50), 'p95': percentile(0.95), 'p99': percentile(0.99)},
+        }
+
+    async def dispatch(self, method, path, body):
+        """Return (status, payload) for one request"""
+        if path == '/health':
+            return 200, {'status': 'ok', 'url_template': self.generator.url_template,
+                         'columns': self.generator.columns, 'registry': self.generator.registry is not None,
+                         'require_check_char': self.generator.require_check_char}
+        if path == '/stats':
+            return 200, self.stats()
+
+        if path.startswith('/link/'):
+            if method != 'GET':
+                return 405, {'error': 'Use GET'}
+            serial_code = unquote(path[len('/link/'):]).strip()
+            (row, error), = await self.generate([serial_code])
+            return (422 if error else 200), self.link_record(serial_code, row, error)
+
+        if path in ('/links', '/validate'):
+            if method != 'POST':
+                return 405, {'error': 'Use POST'}
+            serial_codes = self.read_codes(body)
+            results = await self.generate(serial_codes)
+            if path == '/links':
+                records = [self.link_record(code, row, error) for code, (row, error) in zip(serial_codes, results)]
+            else:
+                records = [{'serial_code': code, 'valid': True} if error is None else
+                           {'serial_code': code, 'valid': False, 'error': error}
+                           for code, (_, error) in zip(serial_codes, results)]
+            errors = sum(1 for _, error in results if error)
+            return 200, {'results': records, 'valid': len(results) - errors, 'errors': errors}
+
+        return 404, {'error': f'Unknown endpoint: {path}'}
+
+    async def respond(self, method, target, body):
+        start = time.perf_counter()
+        self.request_count += 1
+        headers = {}
+        try:
+            status, payload = await self.dispatch(method, urlsplit(target).path, body)
+        except ValueError as e:
+            status, payload = 400, {'error': str(e)}
+        except OverflowError as e:
+            status, payload = 413, {'error': str(e)}
+        except Overloaded:
+            self.overloaded_count += 1
+            status, payload = 503, {'error': 'Too many pending serial codes, retry shortly'}
+            headers['Retry-After'] = '1'
+        except Exception as e:
+            status, payload = 500, {'error': f"Error generating links: {e}"}
+        self.latencies.append(time.perf_counter() - start)
+        return status, payload, headers
+
+    async def handle_connection(self, reader, writer):
+        """Serve keep-alive HTTP/1.1 requests on one connection"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    await self.write_response(writer, 400, {'error': 'Malformed request line'}, keep_alive=False)
+                    break
+                method, target, version = parts
+
+                request_headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    request_headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(request_headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                if length < 0 or length > MAX_BODY_BYTES:
+                    await self.write_response(writer, 413, {'error': f'Body must be at most {MAX_BODY_BYTES} bytes'},
+                                              keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                connection = request_headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+                status, payload, headers = await self.respond(method.upper(), target, body)
+                await self.write_response(writer, status, payload, keep_alive, headers)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    async def write_response(writer, status, payload, keep_alive=True, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                 "Content-Type: application/json",
+                 f"Content-Length: {len(body)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+async def serve(args, generator):
+    batcher = LinkBatcher(generator, args.max_batch, args.max_delay_ms / 1000, args.max_pending)
+    service = LinkService(generator, batcher, args.max_request_codes)
+
+    if args.unix:
+        if os.path.exists(args.unix):
+            os.remove(args.unix)
+        server = await asyncio.start_unix_server(service.handle_connection, path=args.unix)
+        address = f"unix:{args.unix}"
+    else:
+        server = await asyncio.start_server(service.handle_connection, args.host, args.port)
+        address = f"http://{args.host}:{args.port}"
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    batch_task = asyncio.create_task(batcher.run())
+    print(f"✅ Link service listening on {address}")
+    async with server:
+        await stop.wait()
+        print("\nShutting down...")
+    batch_task.cancel()
+    if args.unix and os.path.exists(args.unix):
+        os.remove(args.unix)
+    return service
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve dynamic link generation over HTTP or a Unix socket')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'Address to listen on (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--unix', metavar='PATH', help='Listen on this Unix socket instead of TCP')
+    parser.add_argument('-t', '--template', help=f'URL template (default: {DEFAULT_URL_TEMPLATE})')
+    parser.add_argument('-x', '--extra-template', action='append', default=[], metavar='NAME=TEMPLATE',
+                        help='Extra link field rendered from another template (repeatable)')
+    parser.add_argument('-c', '--require-check-char', action='store_true',
+                        help='Reject codes without a valid Luhn mod 36 check character')
+    parser.add_argument('-r', '--registry', action='store_true',
+                        help=f'Reject codes missing from {DEFAULT_INDEX_FILE} (uses {DEFAULT_BLOOM_FILE} as a fast path if present)')
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH,
+                        help=f'Codes per generation batch (default: {DEFAULT_MAX_BATCH})')
+    parser.add_argument('--max-delay-ms', type=float, default=DEFAULT_MAX_DELAY_MS,
+                        help=f'How long a batch waits for more requests, in ms (default: {DEFAULT_MAX_DELAY_MS})')
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                        help=f'Queued codes before requests get 503 (default: {DEFAULT_MAX_PENDING})')
+    parser.add_argument('--max-request-codes', type=int, default=DEFAULT_MAX_REQUEST_CODES,
+                        help=f'Codes allowed in one bulk request (default: {DEFAULT_MAX_REQUEST_CODES})')
+
+    args = parser.parse_args()
+
+    if args.max_batch < 1 or args.max_pending < 1 or args.max_request_codes < 1 or args.max_delay_ms < 0:
+        print("--max-batch, --max-pending and --max-request-codes must be at least 1")
+        sys.exit(1)
+    if args.max_request_codes > args.max_pending:
+        print("--max-request-codes cannot be larger than --max-pending")
+        sys.exit(1)
+
+    try:
+        extra_templates = [parse_named_template(value) for value in args.extra_template]
+    except ValueError as e:
+        print(f"Invalid extra template: {e}")
+        sys.exit(1)
+
+    registry = None
+    if args.registry:
+        if not os.path.exists(DEFAULT_INDEX_FILE):
+            print(f"Registry index not found: {DEFAULT_INDEX_FILE} (run: python3 serial_registry.py build)")
+            sys.exit(1)
+        bloom_file = DEFAULT_BLOOM_FILE if os.path.exists(DEFAULT_BLOOM_FILE) else None
+        registry = RegistryFilter.open(DEFAULT_INDEX_FILE, bloom_file)
+
+    generator = ServiceGenerator(args.template, registry, extra_templates, args.require_check_char)
+    print("NFT Dynamic Link Service")
+    print("=" * 60)
+    print(f"URL Template: {generator.url_template}")
+    for name, template in extra_templates:
+        print(f"Extra Template ({name}): {template}")
+    if registry is not None:
+        print(f"Registry: {DEFAULT_INDEX_FILE} ({len(registry.registry)} codes)")
+
+    try:
+        service = asyncio.run(serve(args, generator))
+    except OSError as e:
+        print(f"❌ Could not start the service: {e}")
+        sys.exit(1)
+    finally:
+        if registry is not None:
+            registry.close()
+
+    stats = service.stats()
+    print(f"Served {stats['requests']} requests ({stats['codes']} codes in {stats['batches']} batches)")
+
+if __name__ == "__main__":
+    main()
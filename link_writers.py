@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Output writers for generated link batches: CSV, JSON Lines and a binary
+columnar format that downstream loaders can read without parsing CSV.
+
+All writers stream rows. With part=True a writer leaves out the header
+(and the columnar end marker), so part files from --workers runs can be
+appended to a full writer with append_part(). CSV and JSON Lines parts are
+copied byte for byte; columnar parts are re-read and their rows regrouped,
+so the row groups match a single-process run. A writer can
+also be given an open binary stream instead of opening its path, which is
+how link_partitions.py compresses shards as they are written.
+"""
+
+import csv
+import io
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+from array import array
+from itertools import islice
+
+OUTPUT_FORMATS = ['csv', 'jsonl', 'columnar']
+
+# Columnar layout (all integers little-endian):
+#   header:    magic, version, column count, then per column a u16 length + UTF-8 name
+#   row group: u32 row count, then per column (row count + 1) u32 end offsets
+#              followed by the column's UTF-8 data
+#   end:       a row group with row count 0
+COLUMNAR_MAGIC = b'E3LC'
+COLUMNAR_VERSION = 1
+COLUMNAR_HEADER = struct.Struct('<4sHH')
+ROW_GROUP_SIZE = 65536
+
+# Rows per csv writerows call
+WRITE_CHUNK_ROWS = 4096
+
+class LinkWriter:
+    """Base class: binary output file plus the column names"""
+
+    def __init__(self, path, columns, part=False, raw=None):
+        self.path = path
+        self.columns = list(columns)
+        self.part = part
+        self.row_count = 0
+        self.raw = raw if raw is not None else open(path, 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_rows(self, rows):
+        """Write an iterable of row tuples; returns the number written"""
+        raise NotImplementedError
+
+    def flush(self):
+        self.raw.flush()
+
+    def append_part(self, part_path):
+        """Copy a part file written with part=True onto the end of this output"""
+        self.flush()
+        with open(part_path, 'rb') as part:
+            shutil.copyfileobj(part, self.raw)
+
+    def close(self):
+        if not self.raw.closed:
+            self.flush()
+            self.raw.close()
+
+class CSVLinkWriter(LinkWriter):
+    """SerialCode,DynamicLink,... CSV, the layout every existing tool produces"""
+
+    def __init__(self, path, columns, part=False, raw=None):
+        super().__init__(path, columns, part, raw)
+        self.text = io.TextIOWrapper(self.raw, encoding='utf-8', newline='', write_through=False)
+        self.writer = csv.writer(self.text)
+        if not part:
+            self.writer.writerow(self.columns)
+
+    def write_rows(self, rows):
+        start = self.row_count
+        rows = iter(rows)
+        while True:
+            # writerows in bounded chunks: far fewer calls than writerow per row
+            chunk = list(islice(rows, WRITE_CHUNK_ROWS))
+            if not chunk:
+                break
+            self.writer.writerows(chunk)
+            self.row_count += len(chunk)
+        return self.row_count - start
+
+    def flush(self):
+        self.text.flush()
+
+    def close(self):
+        if not self.raw.closed:
+            self.text.close()
+
+class JSONLinesLinkWriter(LinkWriter):
+    """One JSON object per line, keyed by column name"""
+
+    def write_rows(self, rows):
+        columns = self.columns
+        write = self.raw.write
+        start = self.row_count
+        for row in rows:
+            write(json.dumps(dict(zip(columns, row)), ensure_ascii=False).encode('utf-8'))
+            write(b'\n')
+            self.row_count += 1
+        return self.row_count - start
+
+class ColumnarLinkWriter(LinkWriter):
+    """Binary columnar format: row groups of offset arrays plus string data"""
+
+    def __init__(self, path, columns, part=False, raw=None):
+        super().__init__(path, columns, part, raw)
+        self.pending = []
+        if not part:
+            self.raw.write(COLUMNAR_HEADER.pack(COLUMNAR_MAGIC, COLUMNAR_VERSION, len(self.columns)))
+            for column in self.columns:
+                name = column.encode('utf-8')
+                self.raw.write(struct.pack('<H', len(name)))
+                self.raw.write(name)
+
+    def write_rows(self, rows):
+        start = self.row_count
+        for row in rows:
+            self.pending.append(row)
+            self.row_count += 1
+            if len(self.pending) >= ROW_GROUP_SIZE:
+                self.write_row_group()
+        return self.row_count - start
+
+    def write_row_group(self):
+        if not self.pending:
+            return
+        self.raw.write(struct.pack('<I', len(self.pending)))
+        for values in zip(*self.pending):
+            encoded = [value.encode('utf-8') for value in values]
+            offsets = array('I', [0])
+            total = 0
+            for value in encoded:
+                total += len(value)
+                offsets.append(total)
+            if sys.byteorder != 'little':
+                offsets.byteswap()
+            self.raw.write(offsets.tobytes())
+            self.raw.write(b''.join(encoded))
+        self.pending = []
+
+    def append_part(self, part_path):
+        """Add the rows of a part file to the pending row group
+
+        Copying a part's row groups would end a group at every part
+        boundary; regrouping keeps the output identical to one write_rows
+        call over all the rows.
+        """
+        self.write_rows(iter_part_rows('columnar', part_path, self.columns))
+
+    def flush(self):
+        self.write_row_group()
+        self.raw.flush()
+
+    def close(self):
+        if not self.raw.closed:
+            self.write_row_group()
+            if not self.part:
+                self.raw.write(struct.pack('<I', 0))
+            self.raw.close()
+
+WRITERS = {
+    'csv': CSVLinkWriter,
+    'jsonl': JSONLinesLinkWriter,
+    'columnar': ColumnarLinkWriter,
+}
+
+def open_writer(output_format, path, columns, part=False, raw=None):
+    """Open a writer for one of OUTPUT_FORMATS"""
+    if output_format not in WRITERS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    return WRITERS[output_format](path, columns, part, raw)
+
+def read_columnar_header(data, path):
+    """Column names of columnar data and the offset of its first row group"""
+    magic, version, column_count = COLUMNAR_HEADER.unpack_from(data, 0)
+    if magic != COLUMNAR_MAGIC or version != COLUMNAR_VERSION:
+        raise ValueError(f"Not a columnar link file: {path}")
+
+    pos = COLUMNAR_HEADER.size
+    columns = []
+    for _ in range(column_count):
+        (length,) = struct.unpack_from('<H', data, pos)
+        columns.append(bytes(data[pos + 2:pos + 2 + length]).decode('utf-8'))
+        pos += 2 + length
+    return columns, pos
+
+def iter_row_groups(data, pos, columns):
+    """Yield {column: [values]} per row group from pos until the end marker
+    (or the end of the data, for part files, which have none)"""
+    while pos < len(data):
+        (row_count,) = struct.unpack_from('<I', data, pos)
+        pos += 4
+        if row_count == 0:
+            break
+
+        group = {}
+        for column in columns:
+            offsets = array('I')
+            offsets.frombytes(data[pos:pos + 4 * (row_count + 1)])
+            if sys.byteorder != 'little':
+                offsets.byteswap()
+            pos += 4 * (row_count + 1)
+            raw = data[pos:pos + offsets[-1]]
+            pos += offsets[-1]
+            # Offsets are in bytes, so ASCII data can be decoded once and sliced
+            if raw.isascii():
+                text = raw.decode('ascii')
+                group[column] = [text[offsets[i]:offsets[i + 1]] for i in range(row_count)]
+            else:
+                group[column] = [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(row_count)]
+        yield group
+
+def read_columnar(path):
+    """Read a columnar file, yielding one {column: [values]} dict per row group"""
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        columns, pos = read_columnar_header(data, path)
+        yield from iter_row_groups(data, pos, columns)
+    finally:
+        data.close()
+
+def iter_columnar_rows(path):
+    """Read a columnar file row by row as tuples"""
+    for group in read_columnar(path):
+        yield from zip(*group.values())
+
+def detect_output_format(path):
+    """Work out which of OUTPUT_FORMATS a generator output file was written in"""
+    with open(path, 'rb') as f:
+        start = f.read(len(COLUMNAR_MAGIC))
+    if start == COLUMNAR_MAGIC:
+        return 'columnar'
+    if start.startswith(b'{'):
+        return 'jsonl'
+    return 'csv'
+
+def iter_stream_rows(output_format, stream, columns, path='', part=False):
+    """Yield tuples of the named columns from an open binary stream of output
+
+    With part=True the stream is a part file: no header, and its rows are in
+    the given column order.
+    """
+    if output_format == 'columnar':
+        data = stream.read()
+        if part:
+            file_columns, pos = list(columns), 0
+        else:
+            file_columns, pos = read_columnar_header(data, path)
+        for group in iter_row_groups(data, pos, file_columns):
+            yield from zip(*(group[column] for column in columns))
+    elif output_format == 'jsonl':
+        for line in stream:
+            if line.strip():
+                record = json.loads(line)
+                yield tuple(record[column] for column in columns)
+    else:
+        reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8', newline=''))
+        header = list(columns) if part else next(reader, [])
+        indexes = [header.index(column) for column in columns]
+        for row in reader:
+            if row:
+                yield tuple(row[i] for i in indexes)
+
+def iter_part_rows(output_format, part_path, columns):
+    """Yield the rows of a part file written with part=True"""
+    with open(part_path, 'rb') as f:
+        yield from iter_stream_rows(output_format, f, columns, part_path, part=True)
+
+def iter_link_rows(path, columns=('SerialCode', 'DynamicLink')):
+    """Yield tuples of the named columns from any generator output file,
+    or from every shard of a partitioned output directory"""
+    if os.path.isdir(path):
+        # Imported here: link_partitions builds on this module
+        from link_partitions import iter_partitioned_rows
+        yield from iter_partitioned_rows(path, columns)
+        return
+
+    output_format = detect_output_format(path)
+
+    if output_format == 'columnar':
+        for group in read_columnar(path):
+            yield from zip(*(group[column] for column in columns))
+    else:
+        with open(path, 'rb') as f:
+            yield from iter_stream_rows(output_format, f, columns, path)
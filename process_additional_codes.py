@@ -3,41 +3,40 @@
 Process additional serial codes and generate dynamic links
 """
 
-import csv
-from datetime import datetime
+import os
+import sys
 
-# Additional serial codes from the CSV file
-additional_codes = [
-    "E00378", "E00379", "E00380", "E00381", "E00382", "E00383", "E00384", "E00385", "E00386", "E00387",
-    "E00388", "E00389", "E00390", "E00391", "E00392", "E00393", "E00394", "E00395", "E00396", "E00397",
-    "E00398", "E00399", "E00400", "E00401", "E00402", "E00403", "E00404", "E00405", "E00406", "E00407",
-    "E00408", "E00409", "E00410", "E00411", "E00412", "E00413", "E00414", "E00415", "E00416", "E00417",
-    "E00418", "E00419", "E00420", "E00421", "E00422", "E00423", "E00424", "E00425", "E00426", "E00427",
-    "E00428"
-]
+from url_templates import DEFAULT_URL_TEMPLATE, compile_template
+from link_manifest import LinkManifest
+from serial_registry import read_serial_codes
+
+# Inputs and outputs live next to this script, wherever it is run from
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 def generate_additional_dynamic_links():
     """Generate dynamic links for additional serial codes"""
+    # Additional serial codes from the CSV file
+    additional_codes = list(read_serial_codes(os.path.join(SCRIPT_DIR, 'additional_serial_codes.csv')))
     print(f"Processing {len(additional_codes)} additional serial codes...")
     
-    # Generate dynamic links
+    # Only generate links for codes not already in the output manifest
+    output_file = os.path.join(SCRIPT_DIR, "additional_nft_dynamic_links.csv")
+    manifest = LinkManifest(output_file)
+    manifest.seed_from_output(DEFAULT_URL_TEMPLATE)
+    url_template = compile_template(DEFAULT_URL_TEMPLATE)
+    
     results = []
     for serial_code in additional_codes:
-        dynamic_link = f"https://{serial_code}/e3world.co.uk"
+        if manifest.is_emitted(serial_code, DEFAULT_URL_TEMPLATE):
+            continue
+        dynamic_link = url_template.render(serial_code)
         results.append((serial_code, dynamic_link))
     
-    # Write to CSV with timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = f"additional_nft_dynamic_links_{timestamp}.csv"
-    
-    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(['SerialCode', 'DynamicLink'])
-        
-        for serial_code, dynamic_link in results:
-            writer.writerow([serial_code, dynamic_link])
+    # Append new links to CSV
+    manifest.append(results, DEFAULT_URL_TEMPLATE)
     
-    print(f"Successfully generated {len(results)} additional dynamic links!")
+    print(f"Successfully generated {len(results)} new additional dynamic links!")
+    print(f"Already in manifest: {len(additional_codes) - len(results)} codes")
     print(f"Output saved to: {output_file}")
     
     # Show first 10 examples
@@ -57,6 +56,10 @@ def generate_additional_dynamic_links():
 if __name__ == "__main__":
     print("Additional NFT Dynamic Link Generator")
     print("=" * 50)
-    output_file = generate_additional_dynamic_links()
+    try:
+        output_file = generate_additional_dynamic_links()
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
     print(f"\n✅ Task completed successfully!")
     print(f"Generated file: {output_file}")
\ No newline at end of file
@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+QR code rendering stage for generated dynamic links.
+Reads any batch_link_generator.py output, encodes every link as a QR code
+across a process pool and writes either one PNG/SVG per serial code or
+print-ready sheets (a multi-page PDF, or one SVG per page) for the tags.
+
+Encoded QR matrices are cached in a SQLite file keyed by a hash of the
+link, so reruns only encode codes whose link changed. Rows are streamed
+and pages are written as they fill, so memory stays flat for 100k+ tags.
+QR encoding uses segno (pure Python), so everything runs offline.
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from batch_link_generator import SERIAL_CODE_PATTERN
+from batch_metrics import DEFAULT_INTERVAL, PROGRESS_MODES, BatchMetrics, progress_sinks
+from link_writers import iter_link_rows
+
+FILE_FORMATS = ['png', 'svg']
+SHEET_FORMATS = ['pdf', 'svg']
+ERROR_LEVELS = ['L', 'M', 'Q', 'H']
+
+CACHE_FILE_NAME = 'qr_cache.db'
+RENDER_BATCH_SIZE = 256
+
+# Page sizes in millimetres
+PAGE_SIZES = {
+    'a4': (210.0, 297.0),
+    'letter': (215.9, 279.4),
+}
+
+MM_TO_PT = 72 / 25.4
+LABEL_HEIGHT_MM = 4.0
+LABEL_FONT_PT = 7
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS qr_renders (
+    serial_code TEXT PRIMARY KEY,
+    render_key TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    modules BLOB NOT NULL,
+    file_key TEXT
+)
+"""
+
+def load_segno():
+    try:
+        import segno
+    except ImportError:
+        raise RuntimeError("segno is required for QR rendering (pip install segno)")
+    return segno
+
+def render_key(dynamic_link, error_level):
+    """Cache key for an encoded QR matrix: the link and the error correction level"""
+    return hashlib.sha256(f"{error_level}|{dynamic_link}".encode('utf-8')).hexdigest()[:16]
+
+def pack_modules(modules):
+    return zlib.compress(modules, 1)
+
+def unpack_modules(blob):
+    return zlib.decompress(blob)
+
+def dark_runs(size, modules):
+    """Yield (row, column, length) for each horizontal run of dark modules"""
+    for row in range(size):
+        line = modules[row * size:(row + 1) * size]
+        column = line.find(1)
+        while column != -1:
+            end = line.find(0, column)
+            if end == -1:
+                end = size
+            yield row, column, end - column
+            column = line.find(1, end)
+
+def _render_batch(task):
+    """Process pool entry point: encode a batch of links and write per-code files
+
+    Returns (serial_code, render_key, size, packed modules) per link.
+    """
+    links, error_level, output_dir, file_format, scale, border = task
+    segno = load_segno()
+    results = []
+    for serial_code, dynamic_link in links:
+        qr = segno.make(dynamic_link, error=error_level, micro=False)
+        if output_dir is not None:
+            qr.save(os.path.join(output_dir, f"{serial_code}.{file_format}"),
+                    kind=file_format, scale=scale, border=border)
+        modules = b''.join(bytes(row) for row in qr.matrix)
+        results.append((serial_code, render_key(dynamic_link, error_level), len(qr.matrix), pack_modules(modules)))
+    return results
+
+class QRCache:
+    """SQLite cache of encoded QR matrices keyed by serial code and link hash"""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(CACHE_SCHEMA)
+
+    def lookup(self, serial_codes):
+        """{serial_code: (render_key, size, packed modules, file_key)} for cached codes"""
+        placeholders = ','.join('?' * len(serial_codes))
+        rows = self.connection.execute(
+            f"SELECT serial_code, render_key, size, modules, file_key FROM qr_renders "
+            f"WHERE serial_code IN ({placeholders})", serial_codes)
+        return {row[0]: row[1:] for row in rows}
+
+    def store(self, renders, file_key=None):
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO qr_renders (serial_code, render_key, size, modules, file_key) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(serial_code, key, size, modules, file_key) for serial_code, key, size, modules in renders])
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+class SheetLayout:
+    """Grid of QR tiles with a serial code label under each, on fixed-size pages"""
+
+    def __init__(self, page_size='a4', tile_mm=30.0, margin_mm=10.0, gap_mm=4.0, border=4):
+        self.page_width, self.page_height = PAGE_SIZES[page_size]
+        self.tile = tile_mm
+        self.margin = margin_mm
+        self.gap = gap_mm
+        self.border = border
+        cell_height = tile_mm + LABEL_HEIGHT_MM
+        self.columns = int((self.page_width - 2 * margin_mm + gap_mm) // (tile_mm + gap_mm))
+        self.rows = int((self.page_height - 2 * margin_mm + gap_mm) // (cell_height + gap_mm))
+        if self.columns < 1 or self.rows < 1:
+            raise ValueError(f"A {tile_mm}mm tile does not fit on {page_size.upper()} pages with {margin_mm}mm margins")
+
+    @property
+    def per_page(self):
+        return self.columns * self.rows
+
+    def cell_origin(self, index):
+        """Top-left corner of the tile at a position on the page, in mm from the top-left"""
+        row, column = divmod(index, self.columns)
+        x = self.margin + column * (self.tile + self.gap)
+        y = self.margin + row * (self.tile + LABEL_HEIGHT_MM + self.gap)
+        return x, y
+
+    def module_size(self, size):
+        return self.tile / (size + 2 * self.border)
+
+def pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+class PDFSheetWriter:
+    """Multi-page PDF of QR tiles, written page by page with vector modules"""
+
+    def __init__(self, path, layout):
+        self.path = path
+        self.layout = layout
+        self.file = open(path, 'wb')
+        self.offsets = {}
+        self.page_ids = []
+        # Objects 1-3 are the catalog, the page tree and the label font;
+        # pages and their content streams follow from 4 on
+        self.next_id = 4
+        self.file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self.write_object(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+
+    def write_object(self, object_id, body):
+        self.offsets[object_id] = self.file.tell()
+        self.file.write(f'{object_id} 0 obj\n'.encode('ascii') + body + b'\nendobj\n')
+
+    def page_content(self, tiles):
+        layout = self.layout
+        height = layout.page_height
+        ops = ['0 g']
+        for index, (serial_code, size, modules) in enumerate(tiles):
+            x, y = layout.cell_origin(index)
+            module = layout.module_size(size)
+            left = x + layout.border * module
+            top = y + layout.border * module
+            for row, column, length in dark_runs(size, modules):
+                # PDF y runs up from the bottom of the page
+                ops.append(f"{(left + column * module) * MM_TO_PT:.3f} "
+                           f"{(height - top - (row + 1) * module) * MM_TO_PT:.3f} "
+                           f"{length * module * MM_TO_PT:.3f} {module * MM_TO_PT:.3f} re")
+            ops.append('f')
+            label_y = height - y - layout.tile - LABEL_HEIGHT_MM + 1.2
+            ops.append(f"BT /F1 {LABEL_FONT_PT} Tf {(x + layout.border * module) * MM_TO_PT:.3f} "
+                       f"{label_y * MM_TO_PT:.3f} Td ({pdf_escape(serial_code)}) Tj ET")
+        return '\n'.join(ops).encode('latin-1', 'replace')
+
+    def write_page(self, tiles):
+        page_id, content_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        stream = zlib.compress(self.page_content(tiles))
+        self.write_object(content_id, f'<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n'.encode('ascii')
+                          + stream + b'\nendstream')
+        width = self.layout.page_width * MM_TO_PT
+        height = self.layout.page_height * MM_TO_PT
+        self.write_object(page_id, (f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width:.2f} {height:.2f}] '
+                                    f'/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>').encode('ascii'))
+        self.page_ids.append(page_id)
+        return self.path
+
+    def close(self):
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self.page_ids)
+        self.write_object(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>'.encode('ascii'))
+        self.write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+
+        xref_offset = self.file.tell()
+        count = self.next_id
+        self.file.write(f'xref\n0 {count}\n0000000000 65535 f \n'.encode('ascii'))
+        for object_id in range(1, count):
+            self.file.write(f'{self.offsets[object_id]:010d} 00000 n \n'.encode('ascii'))
+        self.file.write(f'trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n'.encode('ascii'))
+        self.file.close()
+
+class SVGSheetWriter:
+    """One SVG file per page of QR tiles"""
+
+    def __init__(self, path, layout):
+        root, _ = os.path.splitext(path)
+        self.path_pattern = f"{root}_{{page:04d}}.svg"
+        self.layout = layout
+        self.page_count = 0
+
+    def write_page(self, tiles):
+        layout = self.layout
+        self.page_count += 1
+        path = self.path_pattern.format(page=self.page_count)
+        parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{layout.page_width}mm" '
+                 f'height="{layout.page_height}mm" viewBox="0 0 {layout.page_width} {layout.page_height}">',
+                 f'<g font-family="Helvetica, Arial, sans-serif" font-size="{LABEL_FONT_PT * 25.4 / 72:.2f}">']
+        for index, (serial_code, size, modules) in enumerate(tiles):
+            x, y = layout.cell_origin(index)
+            module = layout.module_size(size)
+            path_data = ''.join(f"M{column} {row}h{length}v1h-{length}z"
+                                for row, column, length in dark_runs(size, modules))
+            parts.append(f'<path transform="translate({x + layout.border * module:.3f} {y + layout.border * module:.3f}) '
+                         f'scale({module:.4f})" d="{path_data}"/>')
+            parts.append(f'<text x="{x + layout.border * module:.3f}" y="{y + layout.tile + LABEL_HEIGHT_MM - 1.2:.3f}">'
+                         f'{serial_code}</text>')
+        parts.append('</g></svg>\n')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(parts))
+        return path
+
+    def close(self):
+        pass
+
+SHEET_WRITERS = {
+    'pdf': PDFSheetWriter,
+    'svg': SVGSheetWriter,
+}
+
+class QRRenderer:
+    """Renders QR codes for every link in a generator output file"""
+
+    def __init__(self, input_file, output, file_format='png', sheets=None, layout=None, error_level='M',
+                 scale=10, border=4, workers=None, cache_file=None, metrics=None):
+        self.input_file = input_file
+        self.output = output
+        self.file_format = file_format
+        self.sheets = sheets
+        self.layout = layout
+        self.error_level = error_level
+        self.scale = scale
+        self.border = border
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_file = cache_file
+        self.metrics = metrics if metrics is not None else BatchMetrics()
+        # Per-code files are only reused when written with the same settings
+        self.file_key = None if sheets else f"{file_format}:{scale}:{border}"
+
+        self.read_count = 0
+        self.rendered_count = 0
+        self.cached_count = 0
+        self.page_count = 0
+        self.errors = []
+
+    def iter_links(self):
+        """Yield (serial_code, dynamic_link) for each distinct, file-name-safe serial code"""
+        seen = set()
+        for row_num, (serial_code, dynamic_link) in enumerate(iter_link_rows(self.input_file), 1):
+            self.read_count += 1
+            if not SERIAL_CODE_PATTERN.match(serial_code) or not dynamic_link:
+                self.errors.append(f"Row {row_num}: cannot render '{serial_code}'")
+                continue
+            if serial_code in seen:
+                continue
+            seen.add(serial_code)
+            yield serial_code, dynamic_link
+
+    def split_cached(self, cache, batch):
+        """Split a batch into cached renders (serial_code, size, modules) and links to encode"""
+        cached = {}
+        misses = []
+        entries = cache.lookup([serial_code for serial_code, _ in batch])
+        for serial_code, dynamic_link in batch:
+            entry = entries.get(serial_code)
+            if entry is not None and entry[0] == render_key(dynamic_link, self.error_level):
+                if self.sheets:
+                    cached[serial_code] = (entry[1], unpack_modules(entry[2]))
+                    continue
+                path = os.path.join(self.output, f"{serial_code}.{self.file_format}")
+                if entry[3] == self.file_key and os.path.exists(path):
+                    cached[serial_code] = None
+                    continue
+            misses.append((serial_code, dynamic_link))
+        return cached, misses
+
+    def render_task(self, links):
+        output_dir = None if self.sheets else self.output
+        return links, self.error_level, output_dir, self.file_format, self.scale, self.border
+
+    def iter_rendered(self, cache):
+        """Yield (serial_code, size, modules) per link in input order
+
+        At most two batches per worker are in flight, so memory stays
+        bounded however large the input is.
+        """
+        links = self.iter_links()
+        pending = deque()
+        executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+
+        def submit(batch):
+            cached, misses = self.split_cached(cache, batch)
+            if not misses:
+                future = None
+            elif executor is None:
+                future = _render_batch(self.render_task(misses))
+            else:
+                future = executor.submit(_render_batch, self.render_task(misses))
+            pending.append((batch, cached, future))
+
+        try:
+            while True:
+                while len(pending) < self.workers * 2:
+                    batch = list(islice(links, RENDER_BATCH_SIZE))
+                    if not batch:
+                        break
+                    submit(batch)
+                if not pending:
+                    return
+
+                batch, cached, future = pending.popleft()
+                rendered = {}
+                if future is not None:
+                    renders = future if executor is None else future.result()
+                    cache.store(renders, self.file_key)
+                    rendered = {serial_code: (size, modules) for serial_code, _, size, modules in renders}
+                self.rendered_count += len(rendered)
+                self.cached_count += len(cached)
+
+                for serial_code, _ in batch:
+                    if serial_code in rendered:
+                        size, modules = rendered[serial_code]
+                        yield serial_code, size, unpack_modules(modules)
+                    else:
+                        yield serial_code, *(cached[serial_code] or (None, None))
+
+                cache.commit()
+                self.report_progress()
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    def report_progress(self):
+        self.metrics.update(read=self.read_count, processed=self.rendered_count,
+                            errors=len(self.errors), skipped=self.cached_count)
+        self.metrics.maybe_emit()
+
+    def run(self):
+        """Render every link; returns the sheet files written (empty for per-code files)"""
+        load_segno()
+        output_dir = os.path.dirname(self.output) if self.sheets else self.output
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        cache = QRCache(self.cache_file or os.path.join(output_dir or '.', CACHE_FILE_NAME))
+        sheet_files = []
+
+        try:
+            renders = self.iter_rendered(cache)
+            if not self.sheets:
+                for _ in renders:
+                    pass
+                return sheet_files
+
+            writer = SHEET_WRITERS[self.sheets](self.output, self.layout)
+            try:
+                while True:
+                    tiles = list(islice(renders, self.layout.per_page))
+                    if not tiles:
+                        break
+                    with self.metrics.stage('layout'):
+                        path = writer.write_page(tiles)
+                    self.page_count += 1
+                    if path not in sheet_files:
+                        sheet_files.append(path)
+            finally:
+                writer.close()
+            return sheet_files
+        finally:
+            cache.close()
+            self.report_progress()
+            self.metrics.close()
+
+    def print_summary(self, sheet_files):
+        print("\n" + "=" * 60)
+        print("QR RENDER SUMMARY")
+        print("=" * 60)
+        print(f"Input file: {self.input_file}")
+        print(f"Links read: {self.read_count}")
+        print(f"QR codes encoded: {self.rendered_count}")
+        print(f"Unchanged (from cache): {self.cached_count}")
+        print(f"Errors encountered: {len(self.errors)}")
+        if self.sheets:
+            print(f"Pages: {self.page_count} ({self.layout.columns} x {self.layout.rows} tags per page)")
+            for path in sheet_files[:5]:
+                print(f"  {path}")
+            if len(sheet_files) > 5:
+                print(f"  ... and {len(sheet_files) - 5} more files")
+        else:
+            print(f"Output directory: {self.output}")
+
+        snapshot = self.metrics.snapshot()
+        if snapshot['elapsed'] > 0:
+            print(f"Elapsed: {snapshot['elapsed']:.2f}s ({snapshot['rows_per_s']:,.0f} links/s)")
+
+        if self.errors:
+            print(f"\nErrors:")
+            for error in self.errors[:10]:
+                print(f"  - {error}")
+            if len(self.errors) > 10:
+                print(f"  ... and {len(self.errors) - 10} more errors")
+
+def main():
+    parser = argparse.ArgumentParser(description='Render QR codes for generated dynamic links')
+    parser.add_argument('input_file', help='batch_link_generator.py output (CSV, JSONL or columnar)')
+    parser.add_argument('-o', '--output', default='qr_codes',
+                        help='Directory for per-code files, or the sheet file with --sheets (default: qr_codes)')
+    parser.add_argument('-f', '--format', choices=FILE_FORMATS, default='png',
+                        help='Per-code file format (default: png)')
+    parser.add_argument('-s', '--sheets', choices=SHEET_FORMATS,
+                        help='Write print sheets instead: one multi-page PDF, or one SVG per page')
+    parser.add_argument('--page-size', choices=list(PAGE_SIZES), default='a4', help='Sheet page size (default: a4)')
+    parser.add_argument('--tile-mm', type=float, default=30.0,
+                        help='QR tile size on sheets including the quiet zone, in mm (default: 30)')
+    parser.add_argument('--margin-mm', type=float, default=10.0, help='Sheet page margin in mm (default: 10)')
+    parser.add_argument('--gap-mm', type=float, default=4.0, help='Space between sheet tiles in mm (default: 4)')
+    parser.add_argument('-e', '--error-level', choices=ERROR_LEVELS, default='M',
+                        help='QR error correction level (default: M)')
+    parser.add_argument('--scale', type=int, default=10, help='Pixels (PNG) or units (SVG) per module (default: 10)')
+    parser.add_argument('--border', type=int, default=4, help='Quiet zone in modules (default: 4)')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='Rendering processes (default: CPU count)')
+    parser.add_argument('--cache', help=f'Render cache file (default: {CACHE_FILE_NAME} in the output directory)')
+    parser.add_argument('--progress', choices=PROGRESS_MODES, default='auto',
+                        help='Progress display: bar on a terminal, plain lines otherwise (default: auto)')
+    parser.add_argument('--progress-interval', type=float, default=DEFAULT_INTERVAL,
+                        help=f'Seconds between progress updates (default: {DEFAULT_INTERVAL})')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input_file):
+        print(f"Input file not found: {args.input_file}")
+        sys.exit(1)
+    if args.workers < 1 or args.scale < 1 or args.border < 0:
+        print("--workers and --scale must be at least 1 and --border at least 0")
+        sys.exit(1)
+
+    layout = None
+    output = args.output
+    if args.sheets:
+        try:
+            layout = SheetLayout(args.page_size, args.tile_mm, args.margin_mm, args.gap_mm, args.border)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        if args.output == parser.get_default('output'):
+            output = f"qr_sheets.{args.sheets}"
+
+    metrics = BatchMetrics(progress_sinks(args.progress), interval=args.progress_interval, name='qr_render')
+    renderer = QRRenderer(args.input_file, output, args.format, args.sheets, layout, args.error_level,
+                          args.scale, args.border, args.workers, args.cache, metrics)
+
+    print(f"Rendering QR codes for: {args.input_file}")
+    try:
+        sheet_files = renderer.run()
+    except (RuntimeError, sqlite3.Error, ValueError, OSError) as e:
+        print(f"❌ QR rendering failed: {e}")
+        sys.exit(1)
+
+    renderer.print_summary(sheet_files)
+    print(f"\n✅ QR rendering completed successfully!")
+
+if __name__ == "__main__":
+    main()
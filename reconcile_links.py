@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Reconcile issued dynamic links against the registered profiles table.
+Streams any number of generator output files (the issued side) and a
+profiles export or database (the registered side) through an external
+sort and a sort-merge join, and reports codes issued but not registered,
+registered but not issued, registered more than once, and codes whose
+registered dynamic_link differs from the issued one.
+
+Both sides are sorted in bounded runs spilled to disk, so tens of millions
+of rows reconcile in flat memory.
+"""
+
+import argparse
+import asyncio
+import csv
+import heapq
+import os
+import sqlite3
+import sys
+import tempfile
+from itertools import groupby, islice
+from operator import itemgetter
+
+from bulk_loader import is_sqlite_url, sqlite_path
+from link_writers import iter_link_rows
+
+REPORT_HEADER = ['Type', 'SerialCode', 'IssuedLink', 'IssuedFile', 'RegisteredLink']
+
+ISSUED_NOT_REGISTERED = 'issued_not_registered'
+REGISTERED_NOT_ISSUED = 'registered_not_issued'
+LINK_MISMATCH = 'link_mismatch'
+DUPLICATE_REGISTRATION = 'duplicate_registration'
+
+# Rows sorted in memory before a run is spilled to disk
+DEFAULT_RUN_SIZE = 1_000_000
+
+# Rows bulk_loader.py pre-issued keep an empty e_number until someone
+# registers the serial, so they do not count as registered
+PROFILES_QUERY = "SELECT serial_code, dynamic_link FROM profiles WHERE e_number <> ''"
+
+EXPORT_CODE_COLUMNS = ['serial_code', 'SerialCode']
+EXPORT_LINK_COLUMNS = ['dynamic_link', 'DynamicLink']
+
+class ExternalSorter:
+    """Sorts (serial_code, dynamic_link, source) rows in runs of run_size
+
+    Each full run is sorted in memory and written to a temporary CSV;
+    iterating merges the runs with heapq.merge. Input that fits in one run
+    never touches the disk.
+    """
+
+    def __init__(self, run_size=DEFAULT_RUN_SIZE, tmp_dir=None):
+        self.run_size = run_size
+        self.tmp_dir = tmp_dir
+        self.rows = []
+        self.run_files = []
+        self.count = 0
+
+    def add(self, serial_code, dynamic_link, source):
+        self.rows.append((serial_code, dynamic_link, source))
+        self.count += 1
+        if len(self.rows) >= self.run_size:
+            self.spill()
+
+    def add_rows(self, rows):
+        """add() for an iterable of rows, taken a run's worth at a time"""
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.run_size - len(self.rows)))
+            if not chunk:
+                return
+            self.rows += chunk
+            self.count += len(chunk)
+            if len(self.rows) >= self.run_size:
+                self.spill()
+
+    def spill(self):
+        self.rows.sort()
+        fd, path = tempfile.mkstemp(prefix='reconcile_run_', suffix='.csv', dir=self.tmp_dir)
+        self.run_files.append(path)
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(self.rows)
+        self.rows = []
+
+    @staticmethod
+    def read_run(path):
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            for serial_code, dynamic_link, source in csv.reader(f):
+                yield serial_code, dynamic_link, int(source)
+
+    def __iter__(self):
+        self.rows.sort()
+        if not self.run_files:
+            return iter(self.rows)
+        return heapq.merge(*(self.read_run(path) for path in self.run_files), self.rows)
+
+    def close(self):
+        for path in self.run_files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.run_files = []
+        self.rows = []
+
+def iter_export_rows(path):
+    """(serial_code, dynamic_link) from a profiles export CSV with a header row"""
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        try:
+            code_index = next(header.index(name) for name in EXPORT_CODE_COLUMNS if name in header)
+            link_index = next(header.index(name) for name in EXPORT_LINK_COLUMNS if name in header)
+        except StopIteration:
+            raise ValueError(f"{path} needs serial_code and dynamic_link columns in its header")
+        e_number_index = header.index('e_number') if 'e_number' in header else None
+        for row in reader:
+            if row and (e_number_index is None or row[e_number_index]):
+                yield row[code_index], row[link_index]
+
+def iter_sqlite_rows(path):
+    if not os.path.exists(path):
+        raise ValueError(f"SQLite database not found: {path}")
+    connection = sqlite3.connect(path)
+    try:
+        yield from connection.execute(PROFILES_QUERY)
+    finally:
+        connection.close()
+
+async def add_postgres_rows(database_url, sorter):
+    """Stream the profiles table from Postgres into the sorter through a server-side cursor"""
+    try:
+        import asyncpg
+    except ImportError:
+        raise RuntimeError("asyncpg is required to read profiles from Postgres (pip install asyncpg)")
+
+    connection = await asyncpg.connect(database_url)
+    try:
+        async with connection.transaction():
+            async for record in connection.cursor(PROFILES_QUERY, prefetch=10000):
+                sorter.add(record[0].strip(), record[1], 0)
+    finally:
+        await connection.close()
+
+class LinkReconciler:
+    """Sort-merge join of issued links against registered profiles"""
+
+    def __init__(self, report_writer=None, run_size=DEFAULT_RUN_SIZE, tmp_dir=None):
+        self.report_writer = report_writer
+        self.issued = ExternalSorter(run_size, tmp_dir)
+        self.registered = ExternalSorter(run_size, tmp_dir)
+        self.files = []
+        self.matched_count = 0
+        self.counts = {ISSUED_NOT_REGISTERED: 0, REGISTERED_NOT_ISSUED: 0,
+                       LINK_MISMATCH: 0, DUPLICATE_REGISTRATION: 0}
+
+    def add_issued_file(self, path):
+        source = len(self.files)
+        self.files.append(path)
+        self.issued.add_rows((serial_code.strip(), dynamic_link, source)
+                             for serial_code, dynamic_link in iter_link_rows(path) if serial_code.strip())
+
+    def add_registered_rows(self, rows):
+        self.registered.add_rows((serial_code.strip(), dynamic_link, 0)
+                                 for serial_code, dynamic_link in rows if serial_code.strip())
+
+    def add_registered_database(self, database_url):
+        if is_sqlite_url(database_url):
+            self.add_registered_rows(iter_sqlite_rows(sqlite_path(database_url)))
+        else:
+            asyncio.run(add_postgres_rows(database_url, self.registered))
+
+    def report(self, kind, serial_code, issued_link='', issued_file='', registered_link=''):
+        self.counts[kind] += 1
+        if self.report_writer is not None:
+            self.report_writer.writerow([kind, serial_code, issued_link, issued_file, registered_link])
+
+    def compare(self, serial_code, issued, registered):
+        """Compare one code's issued rows with its registered rows (either may be empty)"""
+        # First file each distinct issued link was seen in
+        issued_links = {}
+        for _, dynamic_link, source in issued:
+            issued_links.setdefault(dynamic_link, source)
+        registered_links = [dynamic_link for _, dynamic_link, _ in registered]
+
+        if not registered_links:
+            for dynamic_link, source in issued_links.items():
+                self.report(ISSUED_NOT_REGISTERED, serial_code, dynamic_link, self.files[source])
+            return
+        if not issued_links:
+            for dynamic_link in registered_links:
+                self.report(REGISTERED_NOT_ISSUED, serial_code, registered_link=dynamic_link)
+            return
+
+        if len(registered_links) > 1:
+            self.report(DUPLICATE_REGISTRATION, serial_code, registered_link=' '.join(registered_links))
+        mismatched = False
+        for registered_link in dict.fromkeys(registered_links):
+            if registered_link not in issued_links:
+                mismatched = True
+                for dynamic_link, source in issued_links.items():
+                    self.report(LINK_MISMATCH, serial_code, dynamic_link, self.files[source], registered_link)
+        if not mismatched:
+            self.matched_count += 1
+
+    def run(self):
+        """Merge the two sorted sides; returns the number of discrepancies reported"""
+        try:
+            issued_groups = groupby(self.issued, key=itemgetter(0))
+            registered_groups = groupby(self.registered, key=itemgetter(0))
+            issued = next(issued_groups, None)
+            registered = next(registered_groups, None)
+
+            while issued is not None or registered is not None:
+                if registered is None or (issued is not None and issued[0] < registered[0]):
+                    self.compare(issued[0], issued[1], ())
+                    issued = next(issued_groups, None)
+                elif issued is None or registered[0] < issued[0]:
+                    self.compare(registered[0], (), registered[1])
+                    registered = next(registered_groups, None)
+                else:
+                    self.compare(issued[0], list(issued[1]), list(registered[1]))
+                    issued = next(issued_groups, None)
+                    registered = next(registered_groups, None)
+        finally:
+            self.issued.close()
+            self.registered.close()
+
+        return sum(self.counts.values())
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconcile issued dynamic links against the registered profiles table')
+    parser.add_argument('files', nargs='+', help='Issued link files: generator output (CSV, JSONL or columnar)')
+    registered_source = parser.add_mutually_exclusive_group()
+    registered_source.add_argument('-e', '--export', help='profiles export CSV with serial_code and dynamic_link columns')
+    registered_source.add_argument('-d', '--database', default=os.environ.get('DATABASE_URL'),
+                        help='Postgres URL or SQLite file to read profiles from (default: $DATABASE_URL)')
+    parser.add_argument('-o', '--output', help='Write the reconciliation report to this CSV (default: stdout)')
+    parser.add_argument('--run-size', type=int, default=DEFAULT_RUN_SIZE,
+                        help=f'Rows sorted in memory before spilling a run to disk (default: {DEFAULT_RUN_SIZE})')
+    parser.add_argument('--tmp-dir', help='Directory for sorted runs (default: system temp directory)')
+
+    args = parser.parse_args()
+
+    if not args.export and not args.database:
+        print("No registered profiles given: pass --export, --database or set DATABASE_URL", file=sys.stderr)
+        sys.exit(2)
+    if args.run_size < 1:
+        print("--run-size must be at least 1", file=sys.stderr)
+        sys.exit(2)
+    missing = [path for path in args.files + ([args.export] if args.export else []) if not os.path.exists(path)]
+    if missing:
+        print(f"Input file not found: {', '.join(missing)}", file=sys.stderr)
+        sys.exit(2)
+
+    output = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        writer = csv.writer(output)
+        writer.writerow(REPORT_HEADER)
+        reconciler = LinkReconciler(writer, args.run_size, args.tmp_dir)
+        try:
+            for path in args.files:
+                reconciler.add_issued_file(path)
+            if args.export:
+                reconciler.add_registered_rows(iter_export_rows(args.export))
+            else:
+                reconciler.add_registered_database(args.database)
+        except (RuntimeError, ValueError, sqlite3.Error, OSError) as e:
+            reconciler.issued.close()
+            reconciler.registered.close()
+            print(f"❌ Reconciliation failed: {e}", file=sys.stderr)
+            sys.exit(2)
+        spilled_runs = len(reconciler.issued.run_files) + len(reconciler.registered.run_files)
+        total = reconciler.run()
+    finally:
+        if args.output:
+            output.close()
+
+    # Summary goes to stderr so the report can be piped
+    summary = sys.stderr
+    print("=" * 60, file=summary)
+    print("RECONCILIATION SUMMARY", file=summary)
+    print("=" * 60, file=summary)
+    print(f"Issued files: {len(reconciler.files)}", file=summary)
+    print(f"Issued rows: {reconciler.issued.count}", file=summary)
+    print(f"Registered rows: {reconciler.registered.count}", file=summary)
+    print(f"Sorted runs spilled to disk: {spilled_runs}", file=summary)
+    print(f"Matched codes: {reconciler.matched_count}", file=summary)
+    print(f"Issued but not registered: {reconciler.counts[ISSUED_NOT_REGISTERED]}", file=summary)
+    print(f"Registered but not issued: {reconciler.counts[REGISTERED_NOT_ISSUED]}", file=summary)
+    print(f"Link mismatches: {reconciler.counts[LINK_MISMATCH]}", file=summary)
+    print(f"Registered more than once: {reconciler.counts[DUPLICATE_REGISTRATION]}", file=summary)
+    if args.output:
+        print(f"Report saved to: {args.output}", file=summary)
+
+    sys.exit(1 if total else 0)
+
+if __name__ == "__main__":
+    main()
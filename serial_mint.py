@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+"""
+Mint new serial codes in bulk from a format spec (prefix, length, alphabet,
+check character).
+Codes are a keyed permutation of a counter: the Nth code is the Nth counter
+value run through a format-preserving Feistel cipher and written in the
+spec's alphabet. Distinct counters always give distinct codes, so batches of
+millions are collision-free without keeping the issued codes in memory, and
+the sequence cannot be guessed without the key.
+"""
+
+import argparse
+import fcntl
+import json
+import math
+import os
+import secrets
+import string
+import sys
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from hashlib import blake2b
+
+from bloom_filter import RegistryFilter
+from check_digit import CHECK_ALPHABET, append_check_char, append_check_chars, has_valid_check_char
+from link_writers import OUTPUT_FORMATS, open_writer
+from serial_registry import DEFAULT_INDEX_FILE
+from serial_store import pack_code, unpack_code
+from url_templates import DEFAULT_URL_TEMPLATE, compile_template
+
+DEFAULT_PREFIX = 'E'
+DEFAULT_LENGTH = 5
+DEFAULT_ALPHABET = string.digits + string.ascii_uppercase
+DEFAULT_KEY_FILE = 'serial_mint.key'
+DEFAULT_STATE_FILE = 'serial_mint_state.json'
+MINT_KEY_ENV = 'SERIAL_MINT_KEY'
+MIN_KEY_BYTES = 16
+
+FEISTEL_ROUNDS = 10
+MINT_BATCH_SIZE = 4096
+
+# Codes spread across the domain that 'check' mints and round-trips
+CHECK_SAMPLES = 1000
+
+# Round functions over inputs up to this size are precomputed into tables
+ROUND_TABLE_LIMIT = 1 << 18
+
+# check_char appends a Luhn mod 36 check character (check_digit.py) after
+# the length characters
+MintSpec = namedtuple('MintSpec', ['prefix', 'length', 'alphabet', 'check_char'], defaults=[True])
+
+def spec_domain(spec):
+    """Number of distinct codes the spec can produce"""
+    return len(spec.alphabet) ** spec.length
+
+def spec_id(spec):
+    """Stable text form of a spec, used as the state key and the cipher tweak"""
+    text = f"{spec.prefix}|{spec.length}|{spec.alphabet}"
+    return f"{text}|luhn36" if spec.check_char else text
+
+def validate_spec(spec):
+    """Raise ValueError if a spec cannot produce valid serial codes"""
+    if spec.length < 1:
+        raise ValueError("Code length must be at least 1")
+    if len(spec.alphabet) < 2 or len(set(spec.alphabet)) != len(spec.alphabet):
+        raise ValueError("Alphabet needs at least two distinct characters")
+    allowed = set(string.ascii_uppercase + string.digits + '-_')
+    if not set(spec.prefix + spec.alphabet) <= allowed:
+        # The registry and isValidSerialCode compare upper-cased codes
+        raise ValueError("Prefix and alphabet may only use A-Z, 0-9, '-' and '_'")
+    if spec.check_char and not set(spec.prefix + spec.alphabet) <= set(CHECK_ALPHABET):
+        raise ValueError("Check characters need a prefix and alphabet within 0-9 and A-Z")
+
+def key_fingerprint(key):
+    return blake2b(key, digest_size=8, person=b'e3mintfp').hexdigest()
+
+def load_key(key_file=None):
+    """Read the minting key from a key file or the SERIAL_MINT_KEY variable"""
+    if key_file is None and os.environ.get(MINT_KEY_ENV):
+        key = os.environ[MINT_KEY_ENV].encode('utf-8')
+    else:
+        key_file = key_file or DEFAULT_KEY_FILE
+        if not os.path.exists(key_file):
+            raise ValueError(f"No minting key: create one with 'serial_mint.py keygen' or set {MINT_KEY_ENV}")
+        with open(key_file, 'rb') as f:
+            key = f.read().strip()
+
+    if len(key) < MIN_KEY_BYTES:
+        raise ValueError(f"Minting key must be at least {MIN_KEY_BYTES} bytes")
+    # blake2b keys are capped at 64 bytes
+    return blake2b(key, digest_size=32).digest() if len(key) > 64 else key
+
+class KeyedPermutation:
+    """Format-preserving keyed permutation of range(domain)
+
+    An alternating Feistel network over Z_a x Z_b with a * b >= domain
+    (the construction used by FF1), keyed with blake2b round functions.
+    Values that land outside the domain are encrypted again ("cycle
+    walking"); with a and b near sqrt(domain) that is rare.
+    """
+
+    def __init__(self, key, domain, tweak=b'', rounds=FEISTEL_ROUNDS):
+        if rounds % 2:
+            raise ValueError("Feistel rounds must be even")
+        self.key = key
+        self.domain = domain
+        self.tweak = tweak
+        self.rounds = rounds
+        self.a = max(math.isqrt(domain - 1) + 1, 1)
+        self.b = max(-(-domain // self.a), 1)
+
+        # Round i maps an input in Z_b (even i) or Z_a (odd i) to an offset
+        # mod a or mod b; small sides are tabulated once up front
+        self.tables = None
+        if max(self.a, self.b) <= ROUND_TABLE_LIMIT:
+            self.tables = [[self.round_value(i, value) % modulus for value in range(size)]
+                           for i, (size, modulus) in enumerate(self.round_sizes())]
+
+    def round_sizes(self):
+        """(input size, output modulus) for each round"""
+        return [(self.b, self.a) if i % 2 == 0 else (self.a, self.b) for i in range(self.rounds)]
+
+    def round_value(self, i, value):
+        digest = blake2b(self.tweak + bytes([i]) + value.to_bytes(8, 'little'),
+                         key=self.key, digest_size=8).digest()
+        return int.from_bytes(digest, 'little')
+
+    def _encrypt(self, x):
+        a, b = self.a, self.b
+        left, right = divmod(x, b)
+        left_size, right_size = a, b
+        tables = self.tables
+        for i in range(self.rounds):
+            offset = tables[i][right] if tables is not None else self.round_value(i, right) % left_size
+            left, right = right, (left + offset) % left_size
+            left_size, right_size = right_size, left_size
+        return left * b + right
+
+    def _decrypt(self, y):
+        a, b = self.a, self.b
+        left, right = divmod(y, b)
+        left_size, right_size = a, b
+        tables = self.tables
+        for i in reversed(range(self.rounds)):
+            offset = tables[i][left] if tables is not None else self.round_value(i, left) % right_size
+            left, right = (right - offset) % right_size, left
+            left_size, right_size = right_size, left_size
+        return left * b + right
+
+    def permute(self, x):
+        """Map a counter value in range(domain) to its permuted value"""
+        if not 0 <= x < self.domain:
+            raise ValueError(f"Counter {x} is outside the domain of {self.domain} codes")
+        y = self._encrypt(x)
+        while y >= self.domain:
+            y = self._encrypt(y)
+        return y
+
+    def permute_many(self, start, stop):
+        """permute() over range(start, stop), one round at a time across the batch"""
+        if not 0 <= start <= stop <= self.domain:
+            raise ValueError(f"Counters {start}-{stop} are outside the domain of {self.domain} codes")
+        if self.tables is None:
+            return [self.permute(x) for x in range(start, stop)]
+
+        b = self.b
+        lefts = [x // b for x in range(start, stop)]
+        rights = [x % b for x in range(start, stop)]
+        left_size, right_size = self.a, b
+        for table in self.tables:
+            lefts, rights = rights, [(left + table[right]) % left_size for left, right in zip(lefts, rights)]
+            left_size, right_size = right_size, left_size
+
+        domain = self.domain
+        values = [left * b + right for left, right in zip(lefts, rights)]
+        # Cycle-walk the few values that fell outside the domain
+        if max(values, default=0) >= domain:
+            encrypt = self._encrypt
+            for i, y in enumerate(values):
+                while y >= domain:
+                    y = encrypt(y)
+                values[i] = y
+        return values
+
+    def invert(self, y):
+        """Inverse of permute()"""
+        if not 0 <= y < self.domain:
+            raise ValueError(f"Value {y} is outside the domain of {self.domain} codes")
+        x = self._decrypt(y)
+        while x >= self.domain:
+            x = self._decrypt(x)
+        return x
+
+class CodeEncoder:
+    """Fixed-length encoding of integers in the spec's alphabet
+
+    Digits are emitted several at a time from a table of every digit group
+    that fits in 64K entries, instead of one divmod per character.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.base = len(spec.alphabet)
+        self.group_digits = max(1, int(math.log(65536, self.base)))
+        self.group_size = self.base ** self.group_digits
+        self.groups = [self._encode_digits(n, self.group_digits) for n in range(self.group_size)]
+
+    def _encode_digits(self, n, digits):
+        chars = []
+        for _ in range(digits):
+            n, digit = divmod(n, self.base)
+            chars.append(self.spec.alphabet[digit])
+        return ''.join(reversed(chars))
+
+    def encode(self, n):
+        remaining = self.spec.length
+        parts = []
+        while remaining >= self.group_digits:
+            n, group = divmod(n, self.group_size)
+            parts.append(self.groups[group])
+            remaining -= self.group_digits
+        if remaining:
+            parts.append(self._encode_digits(n, remaining))
+        serial_code = self.spec.prefix + ''.join(reversed(parts))
+        return append_check_char(serial_code) if self.spec.check_char else serial_code
+
+    def encode_many(self, numbers):
+        """encode() for a list of integers, one digit group at a time"""
+        columns = []
+        remaining = self.spec.length
+        while remaining > 0:
+            digits = min(self.group_digits, remaining)
+            size = self.base ** digits
+            table = self.groups if digits == self.group_digits else [
+                self._encode_digits(n, digits) for n in range(size)]
+            columns.append([table[n % size] for n in numbers])
+            numbers = [n // size for n in numbers]
+            remaining -= digits
+
+        prefix = self.spec.prefix
+        if len(columns) == 1:
+            codes = [prefix + low for low in columns[0]]
+        elif len(columns) == 2:
+            codes = [prefix + high + low for low, high in zip(*columns)]
+        else:
+            codes = [prefix + ''.join(reversed(parts)) for parts in zip(*columns)]
+        return append_check_chars(codes) if self.spec.check_char else codes
+
+    def decode(self, serial_code):
+        """Inverse of encode(); raises ValueError for codes outside the spec"""
+        spec = self.spec
+        if spec.check_char:
+            if not has_valid_check_char(serial_code):
+                raise ValueError(f"{serial_code} has an invalid check character")
+            serial_code = serial_code[:-1]
+        if not serial_code.startswith(spec.prefix) or len(serial_code) != len(spec.prefix) + spec.length:
+            raise ValueError(f"{serial_code} does not match the mint spec")
+        n = 0
+        for char in serial_code[len(spec.prefix):]:
+            digit = spec.alphabet.find(char)
+            if digit < 0:
+                raise ValueError(f"{serial_code} does not match the mint spec")
+            n = n * self.base + digit
+        return n
+
+class SerialMinter:
+    """Mints codes for one spec, continuing from the counter in the state file
+
+    The state file records, per spec, the next counter value and a
+    fingerprint of the key, so a later run never reissues a counter and
+    refuses to continue the sequence under a different key. mint() reserves
+    each range of counters in the state file before any of its codes are
+    handed out, under an exclusive lock on <state file>.lock, so concurrent
+    runs get disjoint ranges and a run that dies mid-write leaves a gap in
+    the sequence, never a reissue.
+    """
+
+    def __init__(self, spec, key, state_file=DEFAULT_STATE_FILE, registry=None):
+        validate_spec(spec)
+        self.spec = spec
+        self.key = key
+        self.state_file = state_file
+        self.registry = registry
+        self.domain = spec_domain(spec)
+        self.permutation = KeyedPermutation(key, self.domain, spec_id(spec).encode('utf-8'))
+        self.encoder = CodeEncoder(spec)
+        self.state = self.load_state()
+        self.start_index = self.state.get('next_index', 0)
+        self.next_index = self.start_index
+        self.reserved_index = self.start_index
+        self.minted_count = 0
+        self.skipped_count = 0
+
+    def read_states(self):
+        if not (self.state_file and os.path.exists(self.state_file)):
+            return {}
+        with open(self.state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def spec_state(self, states):
+        """This spec's entry in the state file; raises ValueError if it belongs to another key"""
+        state = states.get(spec_id(self.spec), {})
+        fingerprint = key_fingerprint(self.key)
+        if state and state.get('key') != fingerprint:
+            raise ValueError(f"{self.state_file} was minted with a different key for this spec")
+        return {'key': fingerprint, 'next_index': state.get('next_index', 0)}
+
+    def load_state(self):
+        return self.spec_state(self.read_states())
+
+    @contextmanager
+    def state_lock(self):
+        """Exclusive lock held across a read-advance-write of the state file
+
+        The lock is on a separate file because the state file itself is
+        replaced by rename on every write.
+        """
+        fd = os.open(f"{self.state_file}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def reserve(self, count):
+        """Reserve up to count counters; returns the (start, stop) range now owned by this minter
+
+        The range starts where the state file says the sequence is, which
+        may be past this minter's own counter if another run minted since.
+        """
+        if not self.state_file:
+            start = self.next_index
+            stop = min(start + count, self.domain)
+        else:
+            with self.state_lock():
+                states = self.read_states()
+                start = max(self.spec_state(states)['next_index'], self.next_index)
+                stop = min(start + count, self.domain)
+                if stop > start:
+                    states[spec_id(self.spec)] = {'key': self.state['key'], 'next_index': stop}
+                    tmp_file = f"{self.state_file}.tmp"
+                    with open(tmp_file, 'w', encoding='utf-8') as f:
+                        json.dump(states, f, indent=2, sort_keys=True)
+                        f.write('\n')
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_file, self.state_file)
+        if stop <= start:
+            raise ValueError(f"Mint spec exhausted: no codes left of {self.domain}")
+        return start, stop
+
+    @property
+    def remaining(self):
+        return self.domain - self.next_index
+
+    def code_at(self, index):
+        return self.encoder.encode(self.permutation.permute(index))
+
+    def index_of(self, serial_code):
+        """Counter value a code was minted from (raises ValueError if outside the spec)"""
+        return self.permutation.invert(self.encoder.decode(serial_code))
+
+    def mint(self, count):
+        """Yield lists of newly minted codes until count codes have been produced
+
+        Codes that are already in the registry (e.g. legacy sequential codes
+        that fall inside the spec) are skipped, and their counters consumed.
+        Counters are reserved in the state file before their codes are
+        yielded: all count of them up front, and more only when registry
+        skips use some up.
+        """
+        while self.minted_count < count:
+            if self.next_index >= self.reserved_index:
+                self.next_index, self.reserved_index = self.reserve(count - self.minted_count)
+            start = self.next_index
+            wanted = min(MINT_BATCH_SIZE, count - self.minted_count, self.reserved_index - start)
+            codes = self.encoder.encode_many(self.permutation.permute_many(start, start + wanted))
+            self.next_index += wanted
+
+            if self.registry is not None:
+                registered = self.registry.contains_many(codes)
+                if any(registered):
+                    codes = [code for code, taken in zip(codes, registered) if not taken]
+                    self.skipped_count += wanted - len(codes)
+
+            self.minted_count += len(codes)
+            yield codes
+
+def write_minted_links(minter, count, output_file, url_template=None, output_format='csv'):
+    """Mint count codes straight into a SerialCode,DynamicLink output file"""
+    template = compile_template(url_template or DEFAULT_URL_TEMPLATE)
+    with open_writer(output_format, output_file, ['SerialCode', 'DynamicLink']) as writer:
+        for codes in minter.mint(count):
+            writer.write_rows(zip(codes, template.render_many(codes)))
+
+def check_round_trip(minter, samples=CHECK_SAMPLES):
+    """Problems found round-tripping codes spread across the spec's domain
+
+    Each code must decode back to its counter, carry a valid check character
+    and pack into a serial store (serial_store.py) and back unchanged. No
+    counters are consumed.
+    """
+    problems = []
+    step = max(minter.domain // samples, 1)
+    indexes = sorted(set(range(0, minter.domain, step)[:samples]) | {minter.domain - 1})
+    codes = minter.encoder.encode_many([minter.permutation.permute(index) for index in indexes])
+    for index, serial_code in zip(indexes, codes):
+        if serial_code != minter.code_at(index):
+            problems.append(f"{serial_code}: bulk and single encoding differ")
+        try:
+            if minter.index_of(serial_code) != index:
+                problems.append(f"{serial_code}: decodes to the wrong counter")
+        except ValueError as e:
+            problems.append(str(e))
+        if minter.spec.check_char and not has_valid_check_char(serial_code):
+            problems.append(f"{serial_code}: invalid check character")
+        try:
+            if unpack_code(pack_code(serial_code)) != serial_code:
+                problems.append(f"{serial_code}: does not unpack to the same code")
+        except ValueError as e:
+            problems.append(str(e))
+    return len(indexes), problems
+
+def keygen(key_file):
+    if os.path.exists(key_file):
+        print(f"❌ {key_file} already exists; refusing to overwrite a minting key")
+        sys.exit(1)
+    fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(secrets.token_hex(32) + '\n')
+    print(f"Minting key written to: {key_file}")
+    print("Keep it secret and backed up: the same key is needed to continue the sequence.")
+
+def main():
+    parser = argparse.ArgumentParser(description='Mint new serial codes from a keyed format-preserving permutation')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    keygen_parser = subparsers.add_parser('keygen', help='Create a new random minting key')
+    keygen_parser.add_argument('-k', '--key-file', default=DEFAULT_KEY_FILE, help=f'Key file (default: {DEFAULT_KEY_FILE})')
+
+    def add_spec_arguments(subparser):
+        subparser.add_argument('--prefix', default=DEFAULT_PREFIX, help=f'Code prefix (default: {DEFAULT_PREFIX})')
+        subparser.add_argument('--length', type=int, default=DEFAULT_LENGTH,
+                               help=f'Characters after the prefix (default: {DEFAULT_LENGTH})')
+        subparser.add_argument('--alphabet', default=DEFAULT_ALPHABET, help='Code alphabet (default: 0-9A-Z)')
+        subparser.add_argument('--no-check-char', action='store_true',
+                               help='Do not append a Luhn mod 36 check character')
+        subparser.add_argument('-k', '--key-file', help=f'Key file (default: ${MINT_KEY_ENV} or {DEFAULT_KEY_FILE})')
+        subparser.add_argument('--state', default=DEFAULT_STATE_FILE, help=f'Counter state file (default: {DEFAULT_STATE_FILE})')
+
+    mint_parser = subparsers.add_parser('mint', help='Mint codes into a SerialCode,DynamicLink file')
+    mint_parser.add_argument('-n', '--count', type=int, required=True, help='Number of codes to mint')
+    mint_parser.add_argument('-o', '--output', help='Output file (default: minted_links_TIMESTAMP.csv)')
+    mint_parser.add_argument('-t', '--template', help='URL template (default: https://{serial_code}/e3world.co.uk)')
+    mint_parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS, default='csv', help='Output format (default: csv)')
+    mint_parser.add_argument('-r', '--registry', default=DEFAULT_INDEX_FILE,
+                             help=f'Skip codes already in this registry index (default: {DEFAULT_INDEX_FILE} if present)')
+    mint_parser.add_argument('--bloom', help='Bloom filter in front of the registry index')
+    add_spec_arguments(mint_parser)
+
+    info_parser = subparsers.add_parser('info', help='Show the spec state, or the counter a code was minted from')
+    info_parser.add_argument('codes', nargs='*', help='Minted codes to look up')
+    add_spec_arguments(info_parser)
+
+    check_parser = subparsers.add_parser('check', help='Round-trip sample codes of the spec through decoding and the serial store')
+    add_spec_arguments(check_parser)
+
+    args = parser.parse_args()
+
+    if args.command == 'keygen':
+        keygen(args.key_file)
+        return
+
+    spec = MintSpec(args.prefix.upper(), args.length, args.alphabet.upper(), not args.no_check_char)
+    registry = None
+    try:
+        key = load_key(args.key_file)
+        if args.command == 'mint' and os.path.exists(args.registry):
+            registry = RegistryFilter.open(args.registry, args.bloom)
+        minter = SerialMinter(spec, key, args.state, registry)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    try:
+        if args.command == 'info':
+            print(f"Spec: prefix={spec.prefix} length={spec.length} alphabet={spec.alphabet} "
+                  f"check character={'yes' if spec.check_char else 'no'}")
+            print(f"Domain: {minter.domain:,} codes")
+            print(f"Minted so far: {minter.start_index:,} ({minter.remaining:,} remaining)")
+            for serial_code in args.codes:
+                try:
+                    index = minter.index_of(serial_code.strip().upper())
+                    status = "minted" if index < minter.start_index else "not minted yet"
+                    print(f"  {serial_code}: counter {index:,} ({status})")
+                except ValueError as e:
+                    print(f"  {serial_code}: {e}")
+            return
+
+        if args.command == 'check':
+            checked, problems = check_round_trip(minter)
+            if problems:
+                print(f"❌ {len(problems)} problems in {checked:,} sample codes:")
+                for problem in problems[:10]:
+                    print(f"  - {problem}")
+                if len(problems) > 10:
+                    print(f"  ... and {len(problems) - 10} more")
+                sys.exit(1)
+            print(f"✅ {checked:,} sample codes decode, pass the check character and round-trip through the serial store")
+            return
+
+        if args.count < 1:
+            print("❌ --count must be at least 1")
+            sys.exit(1)
+        if args.count > minter.remaining:
+            print(f"❌ Only {minter.remaining:,} codes left in this spec")
+            sys.exit(1)
+
+        output_file = args.output
+        if not output_file:
+            output_file = f"minted_links_{time.strftime('%Y%m%d_%H%M%S')}.{'csv' if args.format == 'csv' else args.format}"
+
+        check_note = " + check character" if spec.check_char else ""
+        print(f"Minting {args.count:,} codes ({spec.prefix} + {spec.length} of {len(spec.alphabet)} characters{check_note})")
+        print(f"Starting at counter: {minter.start_index:,}")
+        if registry is not None:
+            print(f"Skipping codes in registry: {args.registry}")
+        try:
+            pack_code(minter.code_at(minter.start_index))
+        except ValueError:
+            print("⚠️ Codes of this spec cannot be packed into a serial store (serial_store.py)")
+
+        start = time.perf_counter()
+        try:
+            write_minted_links(minter, args.count, output_file, args.template, args.format)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        elapsed = time.perf_counter() - start
+
+        print("\n" + "=" * 60)
+        print("MINTING SUMMARY")
+        print("=" * 60)
+        print(f"Codes minted: {minter.minted_count:,}")
+        print(f"Registered codes skipped: {minter.skipped_count:,}")
+        print(f"Next counter: {minter.next_index:,} ({minter.remaining:,} remaining)")
+        print(f"Elapsed: {elapsed:.2f}s ({minter.minted_count / elapsed:,.0f} codes/s)")
+        print(f"Output file: {output_file}")
+    finally:
+        if registry is not None:
+            registry.close()
+
+if __name__ == "__main__":
+    main()
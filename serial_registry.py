@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Serial code registry: one source of truth for every issued NFT serial code.
+Loads codes from the CSV sources into an on-disk hash index that is
+memory-mapped for O(1) membership checks, and exports the lookup list
+used by the TypeScript side (shared/serialCodes.ts).
+"""
+
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+
+import csv_ingest
+
+# CSV files holding the issued serial codes, in issue order
+REGISTRY_SOURCES = ['serial_codes.csv', 'additional_serial_codes.csv']
+DEFAULT_INDEX_FILE = 'serial_registry.idx'
+DEFAULT_TS_EXPORT = os.path.join('shared', 'serialCodeRegistry.generated.ts')
+
+# Index layout: header, open-addressing hash table of fixed-width slots,
+# then the same codes sorted, each zero-padded to the slot width
+INDEX_MAGIC = b'E3SR'
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct('<4sHHII')  # magic, version, width, count, table size
+
+FNV_OFFSET = 0x811C9DC5
+FNV_PRIME = 0x01000193
+
+def normalize_serial_code(serial_code):
+    """Normalize a code the same way isValidSerialCode does (trim + upper case)"""
+    return serial_code.strip().upper()
+
+def fnv1a(data):
+    """32-bit FNV-1a hash used to place codes in the index table"""
+    h = FNV_OFFSET
+    for byte in data:
+        h = ((h ^ byte) * FNV_PRIME) & 0xFFFFFFFF
+    return h
+
+def sorted_section(codes):
+    """Normalized, de-duplicated codes as the index stores them: sorted, zero-padded to one width"""
+    encoded = sorted({normalize_serial_code(code).encode('ascii') for code in codes})
+    width = max((len(code) for code in encoded), default=1)
+    return encoded, width
+
+def section_fingerprint(data):
+    """Digest of an index's sorted section, identifying the set of codes it holds"""
+    return hashlib.blake2b(data, digest_size=16, person=b'e3registry').digest()
+
+def codes_fingerprint(codes):
+    """The fingerprint an index built from these codes will have"""
+    encoded, width = sorted_section(codes)
+    return section_fingerprint(b''.join(code.ljust(width, b'\0') for code in encoded))
+
+def read_serial_code_rows(path):
+    """Stream (row_number, serial_code) from the first column of a CSV file
+
+    Codes are stripped but otherwise left as written. Rows are read by
+    csv_ingest.read_serial_codes, so a header row such as "SerialCode" is
+    recognized as the generators recognize it; row numbers count it.
+    """
+    if os.path.getsize(path) == 0:
+        return
+    for serial_code, row_num in csv_ingest.read_serial_codes(path):
+        yield row_num, serial_code
+
+def read_serial_codes(path):
+    """Stream normalized serial codes from the first column of a CSV file"""
+    for _, serial_code in read_serial_code_rows(path):
+        yield normalize_serial_code(serial_code)
+
+def load_source_codes(sources=None):
+    """Read every code from the registry sources, in order, without duplicates"""
+    seen = set()
+    codes = []
+    for path in sources or REGISTRY_SOURCES:
+        for serial_code in read_serial_codes(path):
+            if serial_code not in seen:
+                seen.add(serial_code)
+                codes.append(serial_code)
+    return codes
+
+def build_index(codes, index_file=DEFAULT_INDEX_FILE):
+    """Write a registry index for the given codes and return the code count"""
+    encoded, width = sorted_section(codes)
+
+    # Power-of-two table at most half full keeps probe sequences short
+    table_size = 2
+    while table_size < len(encoded) * 2:
+        table_size *= 2
+    mask = table_size - 1
+
+    table = bytearray(table_size * width)
+    for code in encoded:
+        slot = fnv1a(code) & mask
+        while table[slot * width]:
+            slot = (slot + 1) & mask
+        table[slot * width:slot * width + len(code)] = code
+
+    tmp_file = f"{index_file}.tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, width, len(encoded), table_size))
+        f.write(table)
+        for code in encoded:
+            f.write(code.ljust(width, b'\0'))
+    os.replace(tmp_file, index_file)
+
+    return len(encoded)
+
+class SerialRegistry:
+    """Memory-mapped view of a registry index
+
+    Opening the index only maps the file, so start-up cost does not grow
+    with the number of codes. Membership is a hash probe into the mapping.
+    """
+
+    def __init__(self, index_file=DEFAULT_INDEX_FILE):
+        self.index_file = index_file
+        self._file = open(index_file, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, width, count, table_size = INDEX_HEADER.unpack_from(self._map, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            self.close()
+            raise ValueError(f"Not a serial registry index: {index_file}")
+
+        self.width = width
+        self.count = count
+        self.table_size = table_size
+        self._mask = table_size - 1
+        self._table_offset = INDEX_HEADER.size
+        self._sorted_offset = self._table_offset + table_size * width
+
+    @classmethod
+    def build(cls, sources=None, index_file=DEFAULT_INDEX_FILE):
+        """Build the index from CSV sources and open it"""
+        build_index(load_source_codes(sources), index_file)
+        return cls(index_file)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, serial_code):
+        code = normalize_serial_code(serial_code).encode('ascii', 'replace')
+        if not code or len(code) > self.width:
+            return False
+
+        padded = code.ljust(self.width, b'\0')
+        width = self.width
+        slot = fnv1a(code) & self._mask
+        while True:
+            offset = self._table_offset + slot * width
+            entry = self._map[offset:offset + width]
+            if entry == padded:
+                return True
+            if not entry[0]:
+                return False
+            slot = (slot + 1) & self._mask
+
+    def __iter__(self):
+        """Iterate codes in sorted order"""
+        width = self.width
+        for i in range(self.count):
+            offset = self._sorted_offset + i * width
+            yield self._map[offset:offset + width].rstrip(b'\0').decode('ascii')
+
+    def contains_many(self, serial_codes):
+        """Membership check for a batch of codes, returning a list of booleans"""
+        return [serial_code in self for serial_code in serial_codes]
+
+    def fingerprint(self):
+        """codes_fingerprint() of the indexed codes, hashed straight from the mapping"""
+        with memoryview(self._map) as view:
+            return section_fingerprint(view[self._sorted_offset:self._sorted_offset + self.count * self.width])
+
+def export_typescript(registry, output_file=DEFAULT_TS_EXPORT):
+    """Write the sorted code list as a TypeScript module for shared/serialCodes.ts"""
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write("// Generated by serial_registry.py from the serial code CSVs - do not edit by hand.\n")
+        f.write(f"// Total: {len(registry)} codes\n\n")
+        f.write("export const SERIAL_CODE_REGISTRY: readonly string[] = [\n")
+        codes = list(registry)
+        for i in range(0, len(codes), 10):
+            f.write("  " + ", ".join(f'"{code}"' for code in codes[i:i + 10]) + ",\n")
+        f.write("];\n")
+    os.replace(tmp_file, output_file)
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and query the serial code registry')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Build the registry index from CSV sources')
+    build_parser.add_argument('sources', nargs='*', help=f"CSV sources (default: {', '.join(REGISTRY_SOURCES)})")
+    build_parser.add_argument('-o', '--index', default=DEFAULT_INDEX_FILE, help=f'Index file (default: {DEFAULT_INDEX_FILE})')
+    build_parser.add_argument('--ts', default=DEFAULT_TS_EXPORT, help=f'TypeScript export (default: {DEFAULT_TS_EXPORT})')
+    build_parser.add_argument('--no-ts', action='store_true', help='Skip the TypeScript export')
+
+    check_parser = subparsers.add_parser('check', help='Check serial codes against the registry')
+    check_parser.add_argument('codes', nargs='+', help='Serial codes to check')
+    check_parser.add_argument('-i', '--index', default=DEFAULT_INDEX_FILE, help=f'Index file (default: {DEFAULT_INDEX_FILE})')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        with SerialRegistry.build(args.sources or None, args.index) as registry:
+            print(f"Registry index: {args.index} ({len(registry)} codes)")
+            if not args.no_ts:
+                export_typescript(registry, args.ts)
+                print(f"TypeScript export: {args.ts}")
+    else:
+        with SerialRegistry(args.index) as registry:
+            for serial_code in args.codes:
+                status = "registered" if serial_code in registry else "NOT registered"
+                print(f"  {serial_code}: {status}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Compact binary serial store: every code packed into one integer, sorted,
+behind a 16-byte header. Opening a store only memory-maps it, so
+50M codes are ready in milliseconds instead of minutes of CSV parsing,
+with zero-copy array views, binary-search membership and slicing.
+
+Codes are 1-12 characters of 0-9A-Z. Each length gets its own range of
+integers (base-36 value plus the count of all shorter codes), so legacy
+truncated codes such as EAVO5 never collide with EAVO50, and the sorted
+order is shortlex: shorter codes first, then alphabetical. Stores of codes
+up to 6 characters use 32-bit values; longer codes (e.g. minted codes with
+a check character) widen the whole store to 64-bit values.
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from heapq import merge
+
+import csv_ingest
+from link_writers import open_writer
+from serial_registry import normalize_serial_code
+from url_templates import DEFAULT_URL_TEMPLATE, compile_template
+
+STORE_MAGIC = b'E3SS'
+STORE_VERSION = 1
+STORE_HEADER = struct.Struct('<4sHHQ')  # magic, version, value width in bytes, count
+
+PACK_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+PACK_BASE = len(PACK_ALPHABET)
+MAX_PACKED_LENGTH = 12
+
+# LENGTH_OFFSETS[n - 1] is the first packed value of an n-character code
+LENGTH_OFFSETS = [sum(PACK_BASE ** k for k in range(1, n)) for n in range(1, MAX_PACKED_LENGTH + 2)]
+MAX_PACKED_VALUE = LENGTH_OFFSETS[-1] - 1
+
+# Array typecode for each value width a store header can declare
+VALUE_TYPECODES = {4: 'I', 8: 'Q'}
+MAX_NARROW_VALUE = (1 << 32) - 1
+
+# Two characters per lookup when unpacking
+PAIRS = [a + b for a in PACK_ALPHABET for b in PACK_ALPHABET]
+PAIR_BASE = PACK_BASE * PACK_BASE
+
+# Values sorted per chunk when writing, before the chunks are merged
+SORT_CHUNK_SIZE = 4_000_000
+
+# mmap views are cast to the native byte order; the file is little-endian
+NATIVE_LITTLE_ENDIAN = sys.byteorder == 'little'
+
+def pack_code(serial_code):
+    """Packed value of a code; raises ValueError if it cannot be packed"""
+    code = normalize_serial_code(serial_code)
+    length = len(code)
+    if not 0 < length <= MAX_PACKED_LENGTH or not (code.isascii() and code.isalnum()):
+        raise ValueError(f"Cannot pack {serial_code!r}: codes must be 1-{MAX_PACKED_LENGTH} characters of 0-9A-Z")
+    return LENGTH_OFFSETS[length - 1] + int(code, PACK_BASE)
+
+def unpack_code(value):
+    """Code for a packed value"""
+    length = bisect_right(LENGTH_OFFSETS, value)
+    number = value - LENGTH_OFFSETS[length - 1]
+    if length <= 6:
+        high, rest = divmod(number, PAIR_BASE * PAIR_BASE)
+        middle, low = divmod(rest, PAIR_BASE)
+        return (PAIRS[high] + PAIRS[middle] + PAIRS[low])[-length:]
+    pairs = []
+    for _ in range((length + 1) // 2):
+        number, pair = divmod(number, PAIR_BASE)
+        pairs.append(PAIRS[pair])
+    return ''.join(reversed(pairs))[-length:]
+
+def pack_many(serial_codes, rejected=None):
+    """Packed values for a list of codes; codes that cannot be packed are
+    appended to rejected (or raise ValueError when rejected is None)"""
+    values = array('Q')
+    append = values.append
+    for serial_code in serial_codes:
+        code = serial_code.strip().upper()
+        length = len(code)
+        if 0 < length <= MAX_PACKED_LENGTH and code.isascii() and code.isalnum():
+            append(LENGTH_OFFSETS[length - 1] + int(code, PACK_BASE))
+        elif rejected is None:
+            pack_code(serial_code)
+        else:
+            rejected.append(serial_code)
+    return values
+
+def write_store(values, store_file):
+    """Write packed values (any iterable of ints) as a sorted, de-duplicated store
+
+    Returns the number of codes written. Every value is held in memory at
+    8 bytes while the sorted chunks are merged, alongside the de-duplicated
+    result; sorting a chunk also briefly needs a list of SORT_CHUNK_SIZE
+    Python ints. The file uses 4-byte values when every value fits.
+    """
+    chunks = []
+    pending = array('Q')
+    for value in values:
+        pending.append(value)
+        if len(pending) >= SORT_CHUNK_SIZE:
+            chunks.append(array('Q', sorted(pending)))
+            pending = array('Q')
+    if pending or not chunks:
+        chunks.append(array('Q', sorted(pending)))
+
+    ordered = chunks[0] if len(chunks) == 1 else merge(*chunks)
+    unique = array('Q')
+    previous = -1
+    for value in ordered:
+        if value != previous:
+            unique.append(value)
+            previous = value
+    del chunks
+    if unique and unique[-1] > MAX_PACKED_VALUE:
+        raise ValueError(f"Value {unique[-1]} is outside the packed code range")
+    if not unique or unique[-1] <= MAX_NARROW_VALUE:
+        unique = array('I', unique)
+
+    if not NATIVE_LITTLE_ENDIAN:
+        unique.byteswap()
+    tmp_file = f"{store_file}.tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(STORE_HEADER.pack(STORE_MAGIC, STORE_VERSION, unique.itemsize, len(unique)))
+        unique.tofile(f)
+    os.replace(tmp_file, store_file)
+    return len(unique)
+
+class SerialStore:
+    """Memory-mapped view of a serial store
+
+    values is a zero-copy memoryview of the sorted packed codes, 32 or
+    64-bit per the header (an array copy on big-endian machines). Indexing and slicing return
+    codes; membership and index() are binary searches over values.
+    """
+
+    def __init__(self, store_file):
+        self.store_file = store_file
+        self._file = open(store_file, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap refuses empty files
+            self._file.close()
+            raise ValueError(f"Not a serial store: {store_file}")
+        self.values = None
+
+        valid = len(self._map) >= STORE_HEADER.size
+        if valid:
+            magic, version, width, count = STORE_HEADER.unpack_from(self._map, 0)
+            valid = (magic == STORE_MAGIC and version == STORE_VERSION and width in VALUE_TYPECODES
+                     and len(self._map) >= STORE_HEADER.size + count * width)
+        if not valid:
+            self.close()
+            raise ValueError(f"Not a serial store: {store_file}")
+
+        self.count = count
+        body = memoryview(self._map)[STORE_HEADER.size:STORE_HEADER.size + count * width]
+        typecode = VALUE_TYPECODES[width]
+        if NATIVE_LITTLE_ENDIAN:
+            self.values = body.cast(typecode)
+        else:
+            self.values = array(typecode, body.tobytes())
+            self.values.byteswap()
+            body.release()
+
+    def close(self):
+        # The mapping cannot close while a memoryview of it is alive
+        if isinstance(self.values, memoryview):
+            self.values.release()
+        self.values = None
+        if not self._map.closed:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [unpack_code(value) for value in self.values[index]]
+        return unpack_code(self.values[index])
+
+    def __iter__(self):
+        """Iterate codes in shortlex order"""
+        return map(unpack_code, self.values)
+
+    def __contains__(self, serial_code):
+        try:
+            value = pack_code(serial_code)
+        except ValueError:
+            return False
+        position = bisect_left(self.values, value)
+        return position < self.count and self.values[position] == value
+
+    def index(self, serial_code):
+        """Position of a code in the store; raises ValueError if it is missing"""
+        value = pack_code(serial_code)
+        position = bisect_left(self.values, value)
+        if position < self.count and self.values[position] == value:
+            return position
+        raise ValueError(f"{serial_code} is not in {self.store_file}")
+
+    def contains_many(self, serial_codes):
+        """Membership check for a batch of codes, returning a list of booleans"""
+        values = self.values
+        count = self.count
+        results = []
+        for serial_code in serial_codes:
+            try:
+                value = pack_code(serial_code)
+            except ValueError:
+                results.append(False)
+                continue
+            position = bisect_left(values, value)
+            results.append(position < count and values[position] == value)
+        return results
+
+    def value_range(self, first_code, last_code):
+        """Zero-copy view of the packed values from first_code to last_code inclusive
+
+        Release the view before closing the store.
+        """
+        start = bisect_left(self.values, pack_code(first_code))
+        stop = bisect_right(self.values, pack_code(last_code))
+        return self.values[start:stop]
+
+def iter_csv_values(paths, rejected):
+    """Packed values of every code in the first column of the CSV files"""
+    for path in paths:
+        batch = []
+        for serial_code, _ in csv_ingest.read_serial_codes(path):
+            batch.append(serial_code)
+            if len(batch) >= csv_ingest.CHUNK_ROWS:
+                yield from pack_many(batch, rejected)
+                batch = []
+        yield from pack_many(batch, rejected)
+
+def iter_code_chunks(store):
+    for start in range(0, len(store), csv_ingest.CHUNK_ROWS):
+        yield store[start:start + csv_ingest.CHUNK_ROWS]
+
+def write_csv(store, output_file, url_template=None):
+    """Write the store in the CSV layouts the other tools read
+
+    Without a template: one serial code per line, as in serial_codes.csv.
+    With a template: the SerialCode,DynamicLink CSV of the generators.
+    """
+    if url_template is None:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            for codes in iter_code_chunks(store):
+                f.write('\n'.join(codes) + '\n')
+        return
+
+    template = compile_template(url_template)
+    with open_writer('csv', output_file, ['SerialCode', 'DynamicLink']) as writer:
+        for codes in iter_code_chunks(store):
+            writer.write_rows(zip(codes, template.render_many(codes)))
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert serial codes to and from the packed binary store')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    pack_parser = subparsers.add_parser('pack', help='Pack the serial codes of CSV files into a store')
+    pack_parser.add_argument('files', nargs='+', help='CSV files with serial codes in the first column')
+    pack_parser.add_argument('-o', '--output', required=True, help='Store file to write (e.g. serials.e3ss)')
+
+    unpack_parser = subparsers.add_parser('unpack', help='Write a store back out as CSV')
+    unpack_parser.add_argument('store', help='Store file')
+    unpack_parser.add_argument('-o', '--output', required=True, help='CSV file to write')
+    unpack_parser.add_argument('--links', action='store_true',
+                               help='Write SerialCode,DynamicLink rows instead of bare codes')
+    unpack_parser.add_argument('-t', '--template', default=DEFAULT_URL_TEMPLATE,
+                               help=f'URL template for --links (default: {DEFAULT_URL_TEMPLATE})')
+
+    check_parser = subparsers.add_parser('check', help='Check serial codes against a store')
+    check_parser.add_argument('store', help='Store file')
+    check_parser.add_argument('codes', nargs='+', help='Serial codes to check')
+
+    info_parser = subparsers.add_parser('info', help='Show the size and range of a store')
+    info_parser.add_argument('store', help='Store file')
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'pack':
+            rejected = []
+            start = time.perf_counter()
+            count = write_store(iter_csv_values(args.files, rejected), args.output)
+            elapsed = time.perf_counter() - start
+            print(f"Packed {count} unique codes into {args.output} "
+                  f"({os.path.getsize(args.output):,} bytes, {elapsed:.2f}s)")
+            if rejected:
+                print(f"⚠️ {len(rejected)} codes could not be packed and were left out:")
+                for serial_code in rejected[:10]:
+                    print(f"  - {serial_code}")
+                if len(rejected) > 10:
+                    print(f"  ... and {len(rejected) - 10} more")
+                sys.exit(1)
+            return
+
+        start = time.perf_counter()
+        with SerialStore(args.store) as store:
+            open_time = time.perf_counter() - start
+            if args.command == 'unpack':
+                write_csv(store, args.output, args.template if args.links else None)
+                print(f"Wrote {len(store)} codes to {args.output}")
+            elif args.command == 'check':
+                for serial_code, found in zip(args.codes, store.contains_many(args.codes)):
+                    print(f"  {serial_code}: {'in store' if found else 'NOT in store'}")
+            else:
+                print(f"Store: {args.store}")
+                print(f"Codes: {len(store):,}")
+                print(f"Size: {os.path.getsize(args.store):,} bytes")
+                if len(store):
+                    print(f"First: {store[0]}  Last: {store[-1]}")
+                print(f"Opened in {open_time * 1000:.2f} ms")
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
-import { eq } from "drizzle-orm";
+import { and, eq, ne } from "drizzle-orm";
 import { db } from "./db";
-import { users, questions, submissions, profiles, type User, type InsertUser, type Question, type InsertQuestion, type Submission, type InsertSubmission, type Profile, type InsertProfile } from "@shared/schema";
+import { users, questions, submissions, profiles, UNCLAIMED_E_NUMBER, type User, type InsertUser, type Question, type InsertQuestion, type Submission, type InsertSubmission, type Profile, type InsertProfile } from "@shared/schema";
 import { IStorage } from "./storage";
 
 export class DatabaseStorage implements IStorage {
@@ -71,18 +71,30 @@ export class DatabaseStorage implements IStorage {
 
   async getProfileBySerialCode(serialCode: string): Promise<Profile | undefined> {
     console.log(`Database: Looking for serial code: ${serialCode}`);
-    const result = await db.select().from(profiles).where(eq(profiles.serialCode, serialCode));
+    const result = await db
+      .select()
+      .from(profiles)
+      .where(and(eq(profiles.serialCode, serialCode), ne(profiles.eNumber, UNCLAIMED_E_NUMBER)));
     console.log(`Database: Found ${result.length} profiles with serial code: ${serialCode}`);
     return result[0];
   }
 
+  async getUnclaimedProfile(serialCode: string): Promise<Profile | undefined> {
+    const result = await db
+      .select()
+      .from(profiles)
+      .where(and(eq(profiles.serialCode, serialCode), eq(profiles.eNumber, UNCLAIMED_E_NUMBER)))
+      .limit(1);
+    return result[0];
+  }
+
   async getProfileByENumber(eNumber: string): Promise<Profile | undefined> {
     const result = await db.select().from(profiles).where(eq(profiles.eNumber, eNumber));
     return result[0];
   }
 
   async getAllProfiles(): Promise<Profile[]> {
-    return await db.select().from(profiles);
+    return await db.select().from(profiles).where(ne(profiles.eNumber, UNCLAIMED_E_NUMBER));
   }
 
   async updateProfile(id: number, profileData: Partial<InsertProfile>): Promise<Profile | undefined> {
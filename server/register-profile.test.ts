@@ -0,0 +1,87 @@
+import { test } from "node:test";
+import assert from "node:assert/strict";
+import type { InsertProfile } from "@shared/schema";
+
+// storage.ts pulls in db.ts, which refuses to load without a database URL;
+// the tests below only use MemStorage, so no connection is ever made
+process.env.DATABASE_URL ??= "postgres://localhost/unused";
+const { MemStorage } = await import("./storage");
+const { registerProfile } = await import("./register-profile");
+
+const SERIAL = "E7K2QX";
+const DYNAMIC_LINK = `https://${SERIAL}.e3world.co.uk`;
+
+// What bulk_loader.py writes for a serial nobody has registered yet
+const placeholder: InsertProfile = {
+  eNumber: "",
+  name: "",
+  bio: "",
+  profileImage: "",
+  relationshipStatus: "",
+  jobTitle: "",
+  area: "",
+  email: "",
+  links: [],
+  serialCode: SERIAL,
+  dynamicLink: DYNAMIC_LINK,
+};
+
+function registration(overrides: Partial<InsertProfile> = {}): InsertProfile {
+  return {
+    ...placeholder,
+    eNumber: SERIAL,
+    name: "Ada",
+    bio: "Hello",
+    profileImage: "https://example.com/ada.jpg",
+    relationshipStatus: "Single",
+    jobTitle: "Engineer",
+    area: "London",
+    email: "ada@example.com",
+    acceptedTerms: true,
+    ...overrides,
+  };
+}
+
+test("bulk-loaded serials are not served as profiles", async () => {
+  const storage = new MemStorage();
+  await storage.createProfile(placeholder);
+
+  assert.equal(await storage.getProfileBySerialCode(SERIAL), undefined);
+  assert.deepEqual(await storage.getAllProfiles(), []);
+});
+
+test("registering a bulk-loaded serial claims its row", async () => {
+  const storage = new MemStorage();
+  const loaded = await storage.createProfile(placeholder);
+
+  const profile = await registerProfile(storage, registration());
+
+  assert.equal(profile.id, loaded.id);
+  assert.equal(profile.name, "Ada");
+  assert.equal((await storage.getProfileBySerialCode(SERIAL))?.id, loaded.id);
+  assert.equal(await storage.getUnclaimedProfile(SERIAL), undefined);
+  assert.equal((await storage.getAllProfiles()).length, 1);
+});
+
+test("the pre-issued serial and link survive a client-generated serial code", async () => {
+  const storage = new MemStorage();
+  const loaded = await storage.createProfile(placeholder);
+
+  const profile = await registerProfile(
+    storage,
+    registration({ serialCode: "ADAmb2x9", dynamicLink: "https://ADAmb2x9.e3world.co.uk" }),
+  );
+
+  assert.equal(profile.id, loaded.id);
+  assert.equal(profile.serialCode, SERIAL);
+  assert.equal(profile.dynamicLink, DYNAMIC_LINK);
+});
+
+test("serials that were never bulk-loaded still get a new row", async () => {
+  const storage = new MemStorage();
+
+  const profile = await registerProfile(storage, registration());
+
+  assert.equal((await storage.getProfileBySerialCode(SERIAL))?.id, profile.id);
+  assert.equal((await storage.getAllProfiles()).length, 1);
+});
@@ -0,0 +1,24 @@
+import type { InsertProfile, Profile } from "@shared/schema";
+import type { IStorage } from "./storage";
+
+// A serial loaded by bulk_loader.py already has an unclaimed profiles row:
+// registering fills that row in, keeping its pre-issued serial code and
+// dynamic link, instead of adding a second row for the same serial.
+export async function registerProfile(storage: IStorage, profileData: InsertProfile): Promise<Profile> {
+  const placeholder =
+    (await storage.getUnclaimedProfile(profileData.serialCode)) ??
+    (await storage.getUnclaimedProfile(profileData.eNumber));
+  if (!placeholder) {
+    return storage.createProfile(profileData);
+  }
+
+  const profile = await storage.updateProfile(placeholder.id, {
+    ...profileData,
+    serialCode: placeholder.serialCode,
+    dynamicLink: placeholder.dynamicLink,
+  });
+  if (!profile) {
+    throw new Error(`Profile ${placeholder.id} disappeared while registering ${profileData.eNumber}`);
+  }
+  return profile;
+}
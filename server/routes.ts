@@ -5,6 +5,7 @@ import { insertSubmissionSchema, insertProfileSchema } from "@shared/schema";
 import { z } from "zod";
 import { sendEmail, formatAnswerEmail, sendWelcomeEmail } from "./email";
 import { isValidSerialCode } from "@shared/serialCodes";
+import { registerProfile } from "./register-profile";
 
 export async function registerRoutes(app: Express): Promise<Server> {
   // Validate E serial code
@@ -142,7 +143,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
         });
       }
       
-      const profile = await storage.createProfile(validatedData);
+      const profile = await registerProfile(storage, validatedData);
       console.log("Profile created successfully:", profile.id);
       
       res.status(201).json(profile);
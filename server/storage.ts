@@ -1,4 +1,4 @@
-import { users, questions, submissions, profiles, type User, type InsertUser, type Question, type InsertQuestion, type Submission, type InsertSubmission, type Profile, type InsertProfile } from "@shared/schema";
+import { users, questions, submissions, profiles, isUnclaimedProfile, type User, type InsertUser, type Question, type InsertQuestion, type Submission, type InsertSubmission, type Profile, type InsertProfile } from "@shared/schema";
 
 export interface IStorage {
   getUser(id: number): Promise<User | undefined>;
@@ -18,6 +18,7 @@ export interface IStorage {
   createProfile(profile: InsertProfile): Promise<Profile>;
   getProfile(id: number): Promise<Profile | undefined>;
   getProfileBySerialCode(serialCode: string): Promise<Profile | undefined>;
+  getUnclaimedProfile(serialCode: string): Promise<Profile | undefined>;
   getProfileByENumber(eNumber: string): Promise<Profile | undefined>;
   getAllProfiles(): Promise<Profile[]>;
   updateProfile(id: number, profile: Partial<InsertProfile>): Promise<Profile | undefined>;
@@ -194,7 +195,7 @@ export class MemStorage implements IStorage {
     
     for (const profile of this.profiles.values()) {
       console.log(`Comparing: "${profile.serialCode}" === "${serialCode}"`);
-      if (profile.serialCode === serialCode) {
+      if (profile.serialCode === serialCode && !isUnclaimedProfile(profile)) {
         console.log(`Found matching profile: ${profile.name}`);
         return profile;
       }
@@ -203,12 +204,18 @@ export class MemStorage implements IStorage {
     return undefined;
   }
 
+  async getUnclaimedProfile(serialCode: string): Promise<Profile | undefined> {
+    return Array.from(this.profiles.values()).find(
+      profile => profile.serialCode === serialCode && isUnclaimedProfile(profile)
+    );
+  }
+
   async getProfileByENumber(eNumber: string): Promise<Profile | undefined> {
     return Array.from(this.profiles.values()).find(profile => profile.eNumber === eNumber);
   }
 
   async getAllProfiles(): Promise<Profile[]> {
-    return Array.from(this.profiles.values());
+    return Array.from(this.profiles.values()).filter(profile => !isUnclaimedProfile(profile));
   }
 
   async updateProfile(id: number, profileData: Partial<InsertProfile>): Promise<Profile | undefined> {
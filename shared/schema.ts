@@ -73,6 +73,14 @@ export const insertProfileSchema = createInsertSchema(profiles).omit({
 export type InsertProfile = z.infer<typeof insertProfileSchema>;
 export type Profile = typeof profiles.$inferSelect;
 
+// bulk_loader.py pre-issues serials as profiles rows with an empty eNumber;
+// such a row stays unclaimed until someone registers with that serial
+export const UNCLAIMED_E_NUMBER = "";
+
+export function isUnclaimedProfile(profile: Profile): boolean {
+  return profile.eNumber === UNCLAIMED_E_NUMBER;
+}
+
 // Keep existing user schema for auth (if needed later)
 export const users = pgTable("users", {
   id: serial("id").primaryKey(),
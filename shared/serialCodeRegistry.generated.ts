@@ -0,0 +1,31 @@
+// Generated by serial_registry.py from the serial code CSVs - do not edit by hand.
+// Total: 251 codes
+
+export const SERIAL_CODE_REGISTRY: readonly string[] = [
+  "E00378", "E00379", "E00380", "E00381", "E00382", "E00383", "E00384", "E00385", "E00386", "E00387",
+  "E00388", "E00389", "E00390", "E00391", "E00392", "E00393", "E00394", "E00395", "E00396", "E00397",
+  "E00398", "E00399", "E00400", "E00401", "E00402", "E00403", "E00404", "E00405", "E00406", "E00407",
+  "E00408", "E00409", "E00410", "E00411", "E00412", "E00413", "E00414", "E00415", "E00416", "E00417",
+  "E00418", "E00419", "E00420", "E00421", "E00422", "E00423", "E00424", "E00425", "E00426", "E00427",
+  "E00428", "E00CT3", "E0RZL3", "E0U4O3", "E19E53", "E1E5P3", "E1H3X3", "E21LC3", "E2B8Y3", "E2HXD3",
+  "E2UT83", "E2XWI3", "E3BIC3", "E3BIQ3", "E3CPI3", "E3GSK3", "E3J1A3", "E3O9D3", "E41R73", "E44I13",
+  "E4F953", "E4FDG3", "E4FNR3", "E4GMQ3", "E4MSL3", "E4S8Y3", "E4V6H3", "E58IX3", "E5DG63", "E5HIH3",
+  "E5PMN3", "E5QPX3", "E5UR53", "E664S3", "E67023", "E6BMY3", "E6BZY3", "E6FZJ3", "E6HQH3", "E6K4F3",
+  "E6QU43", "E6RN03", "E70283", "E78IL3", "E7KRE3", "E7WW73", "E81I03", "E8RLF3", "E91OI3", "E9CNU3",
+  "E9IRN3", "E9P7G3", "E9PQY3", "E9RIU3", "EAD733", "EALY33", "EAVO53", "EB3HY3", "EBBTO3", "EBNL83",
+  "EBUE13", "EC3NP3", "EC8YA3", "ECE0M3", "ECM7A3", "ECTLB3", "ED3F03", "ED4ON3", "ED7GL3", "EDB523",
+  "EDF283", "EDLBI3", "EDQNV3", "EDTJB3", "EDXF63", "EE34G3", "EEAOT3", "EEMTA3", "EEOWM3", "EF6NA3",
+  "EFMVW3", "EG6DC3", "EGDXI3", "EGLYI3", "EGQUW3", "EGW2U3", "EH2DB3", "EH57D3", "EH5LZ3", "EH79O3",
+  "EHA2V3", "EHBUR3", "EHEEU3", "EHFFW3", "EHJI33", "EHLH33", "EHTOW3", "EI0QW3", "EI1OQ3", "EI9W33",
+  "EIFZE3", "EIFZU3", "EIKY23", "EIWRB3", "EJ2YV3", "EJCAG3", "EJQV33", "EJWMX3", "EK4R13", "EK65D3",
+  "EKAS13", "EKG5D3", "EKGYA3", "EKLQN3", "EKOGP3", "EKXOR3", "EL8033", "ELDN03", "ELDPA3", "ELDZP3",
+  "ELIIA3", "ELQQF3", "EM0IT3", "EM33B3", "EMBWP3", "EMDCS3", "EMGOW3", "END273", "ENK7Q3", "ENSDG3",
+  "ENVYH3", "EO19O3", "EO5HY3", "EO6EU3", "EO6RS3", "EO9MD3", "EOBQM3", "EOGOM3", "EOHES3", "EOOTY3",
+  "EOTEU3", "EOVVA3", "EOZPW3", "EP6HR3", "EPDCC3", "EPE1L3", "EPJ943", "EPKJP3", "EPOMY3", "EPT7F3",
+  "EPWBN3", "EQAZI3", "EQB713", "EQDUR3", "EQG573", "EQGSV3", "EQRL03", "EQVOM3", "EQW2F3", "ER0RV3",
+  "ERS2D3", "ERVBJ3", "ES6F33", "ES9X93", "ESM9P3", "ESQSR3", "ET0ZD3", "ET94M3", "ET9V23", "ETE3D3",
+  "ETKYU3", "ETLBK3", "ETNEC3", "EU5HM3", "EU6UB3", "EU7IN3", "EU9PP3", "EULVI3", "EUMPF3", "EUQD13",
+  "EUVFW3", "EV5HL3", "EVQ7T3", "EW95M3", "EWK553", "EWWT43", "EX67E3", "EXDFK3", "EXFUP3", "EXZCV3",
+  "EY0H63", "EYC543", "EYYD23", "EZ55G3", "EZC373", "EZF763", "EZGGL3", "EZIG13", "EZNBT3", "EZOMJ3",
+  "EZRXN3",
+];
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Checks that parallel and checkpointed runs write the same bytes as a
+single-process run. Run with: python3 -m pytest test_batch_link_generator.py
+"""
+
+import contextlib
+import io
+import os
+import random
+import string
+import tempfile
+import unittest
+
+from batch_checkpoint import BatchCheckpoint
+from batch_link_generator import DynamicLinkGenerator
+from link_writers import ROW_GROUP_SIZE
+
+# Enough rows for several row groups, so groups straddle the part boundaries
+ROW_COUNT = 2 * ROW_GROUP_SIZE + 1234
+
+def write_codes(path, count, seed=7):
+    rng = random.Random(seed)
+    alphabet = string.ascii_uppercase + string.digits
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('SerialCode\n')
+        for i in range(count):
+            # Every 500th code is invalid, so parts also hold rejected rows
+            code = 'E' + ''.join(rng.choice(alphabet) for _ in range(5))
+            f.write(f"{code[:3]}!{code[4:]}\n" if i % 500 == 0 else f"{code}\n")
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+class ColumnarMergeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_file = os.path.join(self.tmp_dir.name, 'codes.csv')
+        write_codes(self.input_file, ROW_COUNT)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_generator(self, name, workers, checkpoint=False):
+        output_file = os.path.join(self.tmp_dir.name, name)
+        generator = DynamicLinkGenerator(self.input_file, output_file, output_format='columnar')
+        with contextlib.redirect_stdout(io.StringIO()):
+            if checkpoint:
+                generator.process_batch_parallel(workers, BatchCheckpoint(output_file))
+            else:
+                generator.process_batch_parallel(workers)
+        return read_bytes(output_file)
+
+    def test_workers_match_single_worker(self):
+        single = self.run_generator('single.e3lc', 1)
+        self.assertEqual(self.run_generator('parallel.e3lc', 4), single)
+
+    def test_checkpointed_run_matches_single_worker(self):
+        single = self.run_generator('single.e3lc', 1)
+        self.assertEqual(self.run_generator('checkpointed.e3lc', 4, checkpoint=True), single)
+
+    def test_matches_process_batch(self):
+        output_file = os.path.join(self.tmp_dir.name, 'batch.e3lc')
+        with contextlib.redirect_stdout(io.StringIO()):
+            DynamicLinkGenerator(self.input_file, output_file, output_format='columnar').process_batch()
+        self.assertEqual(self.run_generator('parallel.e3lc', 4), read_bytes(output_file))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Checks that serials loaded by bulk_loader.py stay unclaimed until someone
+registers them, and that registering claims the loaded row instead of
+adding a second one. Run with: python3 -m pytest test_bulk_loader.py
+"""
+
+import asyncio
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from bulk_loader import BulkLoader, SQLiteTarget
+from reconcile_links import iter_sqlite_rows
+
+CODES = ['E7K2QX', 'EAB3CD', 'EZZ9Y1']
+
+# What server/register-profile.ts does on Postgres when the serial was
+# bulk-loaded: fill in the unclaimed row, keeping its serial and link
+CLAIM_PROFILE = (
+    "UPDATE profiles SET e_number = ?, name = ?, email = ? "
+    "WHERE serial_code = ? AND e_number = ''"
+)
+
+class RegisterAfterBulkLoadTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tmp_dir.name, 'profiles.db')
+        self.input_file = os.path.join(self.tmp_dir.name, 'links.csv')
+        with open(self.input_file, 'w', encoding='utf-8') as f:
+            f.write('SerialCode,DynamicLink\n')
+            for code in CODES:
+                f.write(f"{code},https://{code}.e3world.co.uk\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def bulk_load(self, init=False):
+        async def run():
+            target = SQLiteTarget(self.database)
+            await target.open(init=init)
+            try:
+                await BulkLoader(target, batch_size=2, pool_size=1).run(self.input_file)
+            finally:
+                await target.close()
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(run())
+
+    def query(self, sql, *params):
+        connection = sqlite3.connect(self.database)
+        try:
+            with connection:
+                return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def test_loaded_serials_are_unclaimed(self):
+        self.bulk_load(init=True)
+
+        rows = self.query("SELECT serial_code, e_number FROM profiles ORDER BY serial_code")
+        self.assertEqual(rows, [(code, '') for code in sorted(CODES)])
+        self.assertEqual(list(iter_sqlite_rows(self.database)), [])
+
+    def test_register_after_bulk_load_keeps_one_row(self):
+        self.bulk_load(init=True)
+        claimed = self.query(CLAIM_PROFILE, 'E7K2QX', 'Ada', 'ada@example.com', 'E7K2QX')
+        self.assertEqual(claimed, [])
+
+        # A rerun after registration must neither add a row nor reset the owner
+        self.bulk_load()
+
+        rows = self.query("SELECT e_number, name FROM profiles WHERE serial_code = ?", 'E7K2QX')
+        self.assertEqual(rows, [('E7K2QX', 'Ada')])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM profiles"), [(len(CODES),)])
+        self.assertEqual(list(iter_sqlite_rows(self.database)),
+                         [('E7K2QX', 'https://E7K2QX.e3world.co.uk')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Precompiled URL templates for dynamic link generation.
+A template such as "https://{serial_code}/e3world.co.uk" is parsed once into
+literal segments and slots instead of being re-parsed by str.format on
+every row, and several templates can be rendered over the same codes in one
+pass (e.g. the profile link plus a QR payload). Format specs and
+conversions ({serial_code:>8}, {serial_code!r}) are applied per slot, so
+every valid template compiles.
+"""
+
+from string import Formatter
+
+DEFAULT_URL_TEMPLATE = "https://{serial_code}/e3world.co.uk"
+
+# Fields a template may reference
+TEMPLATE_FIELDS = {
+    'serial_code': lambda serial_code: serial_code,
+    'serial_code_upper': str.upper,
+    'serial_code_lower': str.lower,
+}
+
+# Conversions as in str.format ({serial_code!r})
+CONVERSIONS = {'s': str, 'r': repr, 'a': ascii}
+
+def formatted_field(getter, conversion, format_spec):
+    """Slot for a field with a conversion and/or format spec, e.g. {serial_code:>8}"""
+    convert = CONVERSIONS[conversion] if conversion else None
+    if convert is None:
+        return lambda serial_code: format(getter(serial_code), format_spec)
+    return lambda serial_code: format(convert(getter(serial_code)), format_spec)
+
+class CompiledTemplate:
+    """A URL template split into literal segments and field slots"""
+
+    def __init__(self, template, name='DynamicLink'):
+        self.template = template
+        self.name = name
+        self.segments = []
+
+        # Parsing errors (unbalanced braces, unknown fields) surface here, once
+        for literal, field, format_spec, conversion in Formatter().parse(template):
+            if literal:
+                self.segments.append(literal)
+            if field is None:
+                continue
+            if field not in TEMPLATE_FIELDS:
+                raise ValueError(f"Unknown template field: {{{field}}} in {template}")
+            getter = TEMPLATE_FIELDS[field]
+            if format_spec or conversion:
+                if conversion and conversion not in CONVERSIONS:
+                    raise ValueError(f"Unknown conversion !{conversion} in {template}")
+                if '{' in format_spec:
+                    raise ValueError(f"Nested fields in format specs are not supported: {template}")
+                getter = formatted_field(getter, conversion, format_spec)
+                try:
+                    getter('E00000')
+                except ValueError as e:
+                    raise ValueError(f"Invalid format spec in {template}: {e}")
+            self.segments.append(getter)
+
+        # Common case: one serial_code slot between a prefix and a suffix
+        slots = [segment for segment in self.segments if callable(segment)]
+        self._simple = None
+        if len(slots) == 1 and slots[0] is TEMPLATE_FIELDS['serial_code']:
+            index = self.segments.index(slots[0])
+            self._simple = (''.join(self.segments[:index]), ''.join(self.segments[index + 1:]))
+
+    def __repr__(self):
+        return f"CompiledTemplate({self.template!r}, name={self.name!r})"
+
+    def render(self, serial_code):
+        """Render the template for one code"""
+        if self._simple is not None:
+            prefix, suffix = self._simple
+            return prefix + serial_code + suffix
+        return ''.join(segment(serial_code) if callable(segment) else segment
+                       for segment in self.segments)
+
+    def render_many(self, serial_codes):
+        """Render the template for a list of codes"""
+        if self._simple is not None:
+            prefix, suffix = self._simple
+            return [prefix + serial_code + suffix for serial_code in serial_codes]
+        return [self.render(serial_code) for serial_code in serial_codes]
+
+def compile_template(template, name='DynamicLink'):
+    """Compile a template string; raises ValueError if it is malformed"""
+    return CompiledTemplate(template, name)
+
+def parse_named_template(value):
+    """Parse a NAME=TEMPLATE command line value into (name, template)"""
+    name, sep, template = value.partition('=')
+    if not sep or not name or not template:
+        raise ValueError(f"Expected NAME=TEMPLATE, got: {value}")
+    return name, template
@@ -0,0 +1,557 @@
+#!/usr/bin/env python3
+"""
+Watch a drop directory for serial code CSVs and generate links for new rows
+as they arrive. New files and rows appended to files already seen are both
+picked up: the byte offset processed so far is kept per file in a state
+file, so only complete lines past it are read, and a restart carries on
+where the last run stopped. Changes are noticed through inotify on Linux,
+or by rescanning the directory every few seconds elsewhere (and with --poll).
+
+Each batch of new rows is written to its own file in the output directory,
+named <input stem>.<batch number>.<format>, with any rejected codes listed
+in a matching .errors.txt. At most --workers batches run at once; a file
+that changes while it is queued or being processed is queued once, and its
+new rows go into its next batch.
+"""
+
+import argparse
+import contextlib
+import ctypes
+import ctypes.util
+import fnmatch
+import hashlib
+import json
+import mmap
+import os
+import select
+import signal
+import sqlite3
+import struct
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import csv_ingest
+from batch_checkpoint import fsync_file, write_json_atomic
+from batch_link_generator import CHUNK_SIZE_LIMIT, _ChunkWorker
+from bloom_filter import DEFAULT_BLOOM_FILE, RegistryFilter
+from link_catalog import DEFAULT_CATALOG_FILE, LinkCatalog
+from link_partitions import FORMAT_EXTENSIONS
+from link_writers import OUTPUT_FORMATS, open_writer
+from serial_registry import DEFAULT_INDEX_FILE
+from url_templates import DEFAULT_URL_TEMPLATE, parse_named_template
+
+STATE_VERSION = 1
+DEFAULT_STATE_NAME = '.watch_state.json'
+DEFAULT_PATTERN = '*.csv'
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_SETTLE = 1.0
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_BATCH_MB = 64
+
+# How often the main loop checks for finished batches and stop requests
+TICK = 0.2
+# Full rescan while watching with inotify, in case an event was missed
+RESCAN_INTERVAL = 60.0
+# A last line without a newline is only taken once the file has been idle this long
+UNTERMINATED_LINE_AGE = 30.0
+# Names uploaders use while a file is still being written
+PARTIAL_SUFFIXES = ('.tmp', '.part', '.partial', '.crdownload')
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+INOTIFY_EVENT = struct.Struct('iIII')
+
+class InotifyWatcher:
+    """Change notifications for one directory through the Linux inotify API"""
+
+    name = 'inotify'
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        try:
+            inotify_init1 = libc.inotify_init1
+            inotify_add_watch = libc.inotify_add_watch
+        except AttributeError:
+            raise OSError("inotify is not available on this system")
+        self.fd = inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1: {os.strerror(errno)}")
+        if inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch: {os.strerror(errno)}")
+
+    def wait(self, timeout):
+        """Names of files changed within timeout seconds; None means rescan everything"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        names = set()
+        overflow = False
+        while ready:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos < len(data):
+                _, mask, _, length = INOTIFY_EVENT.unpack_from(data, pos)
+                pos += INOTIFY_EVENT.size
+                name = data[pos:pos + length].rstrip(b'\0')
+                pos += length
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    raise OSError("The drop directory was removed or moved")
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif name:
+                    names.add(os.fsdecode(name))
+        return None if overflow else names
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Fallback that compares directory listings every interval seconds"""
+
+    name = 'polling'
+
+    def __init__(self, directory, interval=DEFAULT_POLL_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.listing = self.scan()
+        self.next_scan = time.monotonic() + interval
+
+    def scan(self):
+        listing = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    listing[entry.name] = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        return listing
+
+    def wait(self, timeout):
+        delay = self.next_scan - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(delay, 0))
+        self.next_scan = time.monotonic() + self.interval
+        listing = self.scan()
+        changed = {name for name, signature in listing.items() if self.listing.get(name) != signature}
+        self.listing = listing
+        return changed
+
+    def close(self):
+        pass
+
+def open_watcher(directory, poll=False, poll_interval=DEFAULT_POLL_INTERVAL):
+    """inotify where the system has it, otherwise (or with poll=True) polling"""
+    if not poll:
+        try:
+            return InotifyWatcher(directory)
+        except OSError as e:
+            print(f"⚠️  {e} - falling back to polling every {poll_interval:g}s")
+    return PollingWatcher(directory, poll_interval)
+
+def find_line_end(f, start, limit):
+    """Offset just past the last newline in [start, limit), or start if there is none"""
+    pos = limit
+    while pos > start:
+        block_start = max(start, pos - 64 * 1024)
+        f.seek(block_start)
+        newline = f.read(pos - block_start).rfind(b'\n')
+        if newline != -1:
+            return block_start + newline + 1
+        pos = block_start
+    return start
+
+def _ignore_sigint():
+    """Worker initializer: Ctrl-C stops the watcher, which lets running batches finish"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+def _process_drop_task(task):
+    """Process pool entry point: generate links for one byte range of a dropped file
+
+    The range is processed in CHUNK_SIZE_LIMIT pieces so memory stays
+    bounded, then written to output_file via a temp file. Returns
+    (rows, processed, total, errors, sha256) where errors holds (row,
+    serial_code, message) tuples numbered from 1 within the range and sha256
+    is the hash of the input bytes processed.
+    """
+    settings, registry_files, path, start, end, delimiter, output_file = task
+    columns = ['SerialCode', 'DynamicLink'] + [name for name, _ in settings['extra_templates']]
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            input_format = csv_ingest.InputFormat(delimiter, buf.find(b'"', start, end) != -1)
+            sha256 = hashlib.sha256(buf[start:end]).hexdigest()
+        chunks = []
+        while start < end:
+            f.seek(min(start + CHUNK_SIZE_LIMIT, end))
+            f.readline()
+            chunk_end = min(f.tell(), end)
+            chunks.append((start, chunk_end))
+            start = chunk_end
+
+    rows = processed = total = 0
+    errors = []
+    part_files = []
+    registry = RegistryFilter.open(*registry_files) if registry_files is not None else contextlib.nullcontext()
+    try:
+        with registry:
+            for i, (chunk_start, chunk_end) in enumerate(chunks):
+                part_file = f"{output_file}.part{i}"
+                part_files.append(part_file)
+                worker = _ChunkWorker(path, part_file, registry=registry if registry_files is not None else None,
+                                      **settings)
+                chunk_rows, chunk_processed, chunk_total, chunk_errors, _ = worker.process_chunk(
+                    chunk_start, chunk_end, input_format)
+                errors.extend((rows + row_num, serial_code, error) for row_num, serial_code, error in chunk_errors)
+                rows += chunk_rows
+                processed += chunk_processed
+                total += chunk_total
+
+        if processed:
+            tmp_file = f"{output_file}.tmp"
+            with open_writer(settings['output_format'], tmp_file, columns) as writer:
+                for part_file in part_files:
+                    writer.append_part(part_file)
+            fsync_file(tmp_file)
+            os.replace(tmp_file, output_file)
+    finally:
+        for part_file in part_files:
+            if os.path.exists(part_file):
+                os.remove(part_file)
+    return rows, processed, total, errors, sha256
+
+class DropFolderWatcher:
+    """Feeds new rows of the CSVs in drop_dir through the generator into output_dir"""
+
+    def __init__(self, drop_dir, output_dir, settings, registry_files=None, workers=DEFAULT_WORKERS,
+                 pattern=DEFAULT_PATTERN, settle=DEFAULT_SETTLE, batch_bytes=DEFAULT_BATCH_MB * 1024 * 1024,
+                 state_file=None, catalog=None):
+        self.drop_dir = drop_dir
+        self.output_dir = output_dir
+        self.settings = settings
+        self.registry_files = registry_files
+        self.workers = workers
+        self.pattern = pattern
+        self.settle = settle
+        self.batch_bytes = batch_bytes
+        self.state_file = state_file or os.path.join(output_dir, DEFAULT_STATE_NAME)
+        # Optional LinkCatalog every batch with output is recorded in
+        self.catalog = catalog
+        self.files = self.load_state()
+        # name -> monotonic time of its last change, in the order files were queued
+        self.pending = {}
+        # name -> (future, batch) for batches handed to the pool
+        self.running = {}
+        self.stopping = False
+        self.final_line_age = UNTERMINATED_LINE_AGE
+        self.batch_count = 0
+        self.processed_count = 0
+        self.error_count = 0
+
+    def load_state(self):
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Cannot read watch state {self.state_file}: {e}")
+        if state.get('version') != STATE_VERSION:
+            raise ValueError(f"Unsupported watch state: {self.state_file}")
+        return state['files']
+
+    def save_state(self):
+        write_json_atomic(self.state_file, {'version': STATE_VERSION, 'files': self.files})
+
+    def matches(self, name):
+        return (fnmatch.fnmatch(name, self.pattern) and not name.startswith('.')
+                and not name.endswith(PARTIAL_SUFFIXES))
+
+    def catch_up(self):
+        """Queue every matching file with rows past its recorded offset"""
+        with os.scandir(self.drop_dir) as entries:
+            for entry in entries:
+                if not entry.is_file() or not self.matches(entry.name):
+                    continue
+                stat = entry.stat()
+                state = self.files.get(entry.name)
+                if (state is None or state['inode'] != stat.st_ino
+                        or (not state['skipped'] and stat.st_size != state['offset'])):
+                    self.pending.setdefault(entry.name, float('-inf'))
+
+    def plan_batch(self, name):
+        """Byte range of complete new lines to process next, or None if there are none
+
+        Also notices files that were replaced or truncated (they start again
+        from the beginning) and generator output dropped in by mistake.
+        """
+        path = os.path.join(self.drop_dir, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        state = self.files.get(name)
+        if state is not None and (state['inode'] != stat.st_ino or stat.st_size < state['offset']):
+            if not state['skipped'] or state['inode'] != stat.st_ino:
+                print(f"⚠️  {name} was replaced or truncated - processing it from the start")
+            state.update(inode=stat.st_ino, offset=0, rows=0, skipped=False)
+        if state is None:
+            state = self.files[name] = {'inode': stat.st_ino, 'offset': 0, 'rows': 0, 'delimiter': ',',
+                                        'skipped': False, 'batches': 0, 'links': 0, 'errors': 0}
+        if state['skipped'] or stat.st_size == state['offset']:
+            return None
+
+        start = state['offset']
+        rows = state['rows']
+        with open(path, 'rb') as f:
+            if start == 0:
+                if csv_ingest.is_link_output(path):
+                    print(f"⚠️  Skipping {name}: it is generator output, not serial codes")
+                    state['skipped'] = True
+                    self.save_state()
+                    return None
+                state['delimiter'] = csv_ingest.detect_format(path).delimiter
+                first_line = f.readline()
+                first = next(csv_ingest.iter_text_first_column(first_line.decode('utf-8', 'replace'),
+                                                               state['delimiter']), '')
+                # The first line is judged on its own: the rest of the file may not have arrived yet
+                if csv_ingest.is_header(first):
+                    print(f"{name}: detected header: {first}")
+                    start = len(first_line)
+                    rows = 1
+
+            limit = min(stat.st_size, start + self.batch_bytes)
+            if limit == stat.st_size and time.time() - stat.st_mtime >= self.final_line_age:
+                # A last line without a newline counts once the file has gone quiet
+                end = limit
+            else:
+                end = find_line_end(f, start, limit)
+                if end == start and limit < stat.st_size:
+                    end = find_line_end(f, start, stat.st_size)
+        if end == start:
+            if start != state['offset']:
+                state.update(offset=start, rows=rows)
+                self.save_state()
+            return None
+
+        batch = state['batches'] + 1
+        stem = Path(name).stem
+        output_file = os.path.join(self.output_dir, f"{stem}.{batch:05d}{FORMAT_EXTENSIONS[self.settings['output_format']]}")
+        return {
+            'name': name, 'start': start, 'end': end, 'rows': rows, 'batch': batch, 'output_file': output_file,
+            'started': time.perf_counter(),
+            'task': (self.settings, self.registry_files, path, start, end, state['delimiter'], output_file),
+        }
+
+    def schedule(self, executor):
+        """Hand queued files to the pool, at most one batch per file and workers in total"""
+        now = time.monotonic()
+        for name, changed_at in list(self.pending.items()):
+            if len(self.running) >= self.workers:
+                break
+            if name in self.running or now - changed_at < self.settle:
+                continue
+            del self.pending[name]
+            batch = self.plan_batch(name)
+            if batch is not None:
+                self.running[name] = (executor.submit(_process_drop_task, batch['task']), batch)
+
+    def collect(self):
+        """Commit finished batches: errors file first, then the state that moves past them"""
+        for name, (future, batch) in list(self.running.items()):
+            if not future.done():
+                continue
+            del self.running[name]
+            try:
+                rows, processed, total, errors, sha256 = future.result()
+            except Exception as e:
+                print(f"❌ {name}: batch {batch['batch']} failed: {e}")
+                continue
+            elapsed = time.perf_counter() - batch['started']
+
+            state = self.files[name]
+            if errors:
+                root, _ = os.path.splitext(batch['output_file'])
+                with open(f"{root}.errors.txt", 'w', encoding='utf-8') as f:
+                    f.writelines(f"Row {batch['rows'] + row_num}: {error}\n" for row_num, _, error in errors)
+                    f.flush()
+                    os.fsync(f.fileno())
+            if processed or errors:
+                state['batches'] = batch['batch']
+            state.update(offset=batch['end'], rows=batch['rows'] + rows, links=state['links'] + processed,
+                         errors=state['errors'] + len(errors))
+            self.save_state()
+            if self.catalog is not None and processed:
+                self.record(name, batch, total, len(errors), sha256)
+
+            self.batch_count += 1
+            self.processed_count += processed
+            self.error_count += len(errors)
+            target = os.path.basename(batch['output_file']) if processed else 'no output'
+            icon = '✅' if not errors else '⚠️ '
+            print(f"{icon} {name}: rows {batch['rows'] + 1}-{batch['rows'] + rows} -> {target} "
+                  f"({processed} links, {len(errors)} errors, {elapsed:.2f}s)")
+            # More may have arrived, or the batch stopped at --batch-mb
+            self.pending[name] = float('-inf')
+
+    def record(self, name, batch, total, error_count, sha256):
+        """Add a committed batch to the catalog; a failure here does not stop the watcher"""
+        try:
+            self.catalog.record_output(batch['output_file'], self.settings['url_template'], source='watch_folder',
+                                       input_file=os.path.join(self.drop_dir, name),
+                                       extra_templates=self.settings['extra_templates'],
+                                       total_rows=total, error_rows=error_count, input_sha256=sha256)
+        except (OSError, sqlite3.Error) as e:
+            print(f"❌ {name}: could not record batch {batch['batch']} in the catalog: {e}")
+
+    def stop(self):
+        if not self.stopping:
+            print("Stopping once the running batches are committed...")
+        self.stopping = True
+
+    def run(self, once=False, poll=False, poll_interval=DEFAULT_POLL_INTERVAL):
+        """Process what is already there, then keep watching until stop() (or, with once, until done)"""
+        if once:
+            self.final_line_age = 0
+        watcher = None if once else open_watcher(self.drop_dir, poll, poll_interval)
+        if watcher is not None:
+            print(f"Watching {self.drop_dir} for {self.pattern} ({watcher.name}), "
+                  f"writing links to {self.output_dir} with up to {self.workers} workers")
+        self.catch_up()
+        next_rescan = time.monotonic() + RESCAN_INTERVAL
+        executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_ignore_sigint)
+        try:
+            while True:
+                self.collect()
+                if self.stopping:
+                    if not self.running:
+                        break
+                else:
+                    self.schedule(executor)
+                    if once and not self.pending and not self.running:
+                        break
+
+                if watcher is None or self.stopping:
+                    futures = [future for future, _ in self.running.values()]
+                    if futures:
+                        wait(futures, timeout=TICK, return_when=FIRST_COMPLETED)
+                    else:
+                        time.sleep(TICK)
+                    continue
+
+                changed = watcher.wait(TICK)
+                if changed is None or time.monotonic() >= next_rescan:
+                    self.catch_up()
+                    next_rescan = time.monotonic() + RESCAN_INTERVAL
+                now = time.monotonic()
+                for name in changed or ():
+                    if self.matches(name):
+                        self.pending[name] = now
+        finally:
+            executor.shutdown(cancel_futures=True)
+            if watcher is not None:
+                watcher.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Watch a drop directory and generate links for new serial code rows')
+    parser.add_argument('drop_dir', help='Directory new or growing serial code CSVs are dropped into')
+    parser.add_argument('output_dir', help='Directory the generated link files are written to')
+    parser.add_argument('-t', '--template', help=f'URL template (default: {DEFAULT_URL_TEMPLATE})')
+    parser.add_argument('-x', '--extra-template', action='append', default=[], metavar='NAME=TEMPLATE',
+                        help='Extra output column rendered in the same pass (repeatable)')
+    parser.add_argument('-c', '--require-check-char', action='store_true',
+                        help='Reject codes without a valid check character (see check_digit.py)')
+    parser.add_argument('-r', '--registry', action='store_true',
+                        help=f'Reject codes missing from {DEFAULT_INDEX_FILE} (uses {DEFAULT_BLOOM_FILE} as a fast path if present)')
+    parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS, default='csv', help='Output format (default: csv)')
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Batches processed at once, one process each (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--pattern', default=DEFAULT_PATTERN, help=f'File names to pick up (default: {DEFAULT_PATTERN})')
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE,
+                        help=f'Seconds a file must be unchanged before a batch starts (default: {DEFAULT_SETTLE:g})')
+    parser.add_argument('--batch-mb', type=float, default=DEFAULT_BATCH_MB,
+                        help=f'Most input per batch, in MB; larger drops are split (default: {DEFAULT_BATCH_MB})')
+    parser.add_argument('--state', metavar='PATH',
+                        help=f'Per-file offsets kept between runs (default: <output_dir>/{DEFAULT_STATE_NAME})')
+    parser.add_argument('--poll', action='store_true', help='Poll the directory instead of using inotify')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f'Seconds between directory scans when polling (default: {DEFAULT_POLL_INTERVAL:g})')
+    parser.add_argument('--catalog', nargs='?', const=DEFAULT_CATALOG_FILE, metavar='PATH',
+                        help=f'Record every batch in a SQLite catalog (default path: {DEFAULT_CATALOG_FILE})')
+    parser.add_argument('--once', action='store_true', help='Process everything already dropped, then exit')
+
+    args = parser.parse_args()
+
+    if args.workers < 1 or args.batch_mb <= 0 or args.poll_interval <= 0 or args.settle < 0:
+        print("--workers must be at least 1, --batch-mb and --poll-interval greater than 0, --settle not negative")
+        sys.exit(2)
+    if not os.path.isdir(args.drop_dir):
+        print(f"Drop directory not found: {args.drop_dir}")
+        sys.exit(2)
+    if os.path.realpath(args.drop_dir) == os.path.realpath(args.output_dir):
+        print("The output directory must not be the drop directory")
+        sys.exit(2)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    try:
+        extra_templates = [parse_named_template(value) for value in args.extra_template]
+    except ValueError as e:
+        print(f"Invalid extra template: {e}")
+        sys.exit(2)
+
+    registry_files = None
+    if args.registry:
+        if not os.path.exists(DEFAULT_INDEX_FILE):
+            print(f"Registry index not found: {DEFAULT_INDEX_FILE} (run: python3 serial_registry.py build)")
+            sys.exit(2)
+        registry_files = (os.path.abspath(DEFAULT_INDEX_FILE),
+                          os.path.abspath(DEFAULT_BLOOM_FILE) if os.path.exists(DEFAULT_BLOOM_FILE) else None)
+
+    settings = {
+        'url_template': args.template or DEFAULT_URL_TEMPLATE,
+        'extra_templates': extra_templates,
+        'output_format': args.format,
+        'require_check_char': args.require_check_char,
+    }
+    try:
+        catalog = LinkCatalog(args.catalog) if args.catalog else None
+        watcher = DropFolderWatcher(args.drop_dir, args.output_dir, settings, registry_files, args.workers,
+                                    args.pattern, args.settle, int(args.batch_mb * 1024 * 1024), args.state, catalog)
+    except (ValueError, sqlite3.Error) as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+    print("NFT Dynamic Link Drop Folder")
+    print("=" * 60)
+    print(f"URL Template: {settings['url_template']}")
+    for name, template in extra_templates:
+        print(f"Extra Template ({name}): {template}")
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: watcher.stop())
+    try:
+        watcher.run(args.once, args.poll, args.poll_interval)
+    except OSError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        if catalog is not None:
+            catalog.close()
+
+    print(f"Processed {watcher.batch_count} batches: {watcher.processed_count} links, {watcher.error_count} errors")
+
+if __name__ == "__main__":
+    main()